@@ -0,0 +1,34 @@
+import numpy as np
+
+
+def forward_kinematics(joint_angles, segment_length=1.0, degrees=True):
+    """
+    Vectorized planar forward kinematics for the N-joint tail.
+
+    joint_angles is a (T, N) array of relative joint angles (one row per time
+    sample), or a single (N,) frame. Each joint rotates every segment after it,
+    so the absolute heading of segment i is the cumulative sum of angles 0..i.
+    segment_length can be a scalar or a length-N array of per-segment lengths.
+
+    Returns (T, N+1, 2) x,y positions with the head fixed at the origin
+    ((N+1, 2) for a single frame).
+    """
+    angles = np.asarray(joint_angles, dtype=float)
+    single_frame = angles.ndim == 1
+    angles = np.atleast_2d(angles)
+    num_frames, num_joints = angles.shape
+
+    if degrees:
+        angles = np.radians(angles)
+
+    # Absolute heading of every segment, for every frame at once
+    theta = np.cumsum(angles, axis=1)
+    lengths = np.broadcast_to(np.asarray(segment_length, dtype=float), (num_joints,))
+
+    # Positions are the running sum of the segment offsets; cos/sin keep each
+    # segment at exactly its length, so no renormalization is needed
+    positions = np.zeros((num_frames, num_joints + 1, 2))
+    np.cumsum(lengths * np.cos(theta), axis=1, out=positions[:, 1:, 0])
+    np.cumsum(lengths * np.sin(theta), axis=1, out=positions[:, 1:, 1])
+
+    return positions[0] if single_frame else positions
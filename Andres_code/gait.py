@@ -0,0 +1,82 @@
+import functools
+import numpy as np
+
+# Resolution of the precomputed gait cycle (table rows per cycle)
+SAMPLES_PER_CYCLE = 360
+
+# Wave sign conventions used by the visualizers and sketches:
+#   "wave_param" - sine_swim.py / Andres_code/Controllable_wave_param.ino: the
+#                  whole wave is scaled by the direction and head->tail joints
+#                  lag each other (sin(wt - i * phase_shift) for direction 1)
+#   "swim_vis"   - swim_vis.py: spatial phase is direction * i * phase_shift.
+#                  electronics/arduino.ino and debug/test.cpp run this one with
+#                  direction 1 (sin(wt + i * phase_shift)), the opposite sign
+CONVENTIONS = ("wave_param", "swim_vis")
+
+
+def joint_gains_and_phases(amplitude, phase_shift, joint_factors, direction, convention="wave_param"):
+    """Return per-joint amplitude (deg) and spatial phase (rad) for a gait."""
+    factors = np.asarray(joint_factors, dtype=float)
+    index = np.arange(len(factors))
+    phase_rad = np.radians(phase_shift)
+
+    if convention == "wave_param":
+        # Negative phase multiplier for head->tail propagation (matches Controllable_wave_param.ino)
+        phase_multiplier = -1 if direction == 1 else 1
+        gains = direction * amplitude * factors
+        spatial_phases = phase_multiplier * index * phase_rad
+    elif convention == "swim_vis":
+        gains = amplitude * factors
+        spatial_phases = direction * index * phase_rad
+    else:
+        raise ValueError(f"Unknown gait convention: {convention}")
+
+    return gains, spatial_phases
+
+
+@functools.lru_cache(maxsize=64)
+def cycle_table(amplitude, phase_shift, joint_factors, direction,
+                convention="wave_param", samples=SAMPLES_PER_CYCLE):
+    """
+    Precompute one full gait cycle as a (samples + 1, N) table of joint angles.
+
+    Row k holds the angles at cycle fraction k / samples; the extra last row
+    repeats row 0 so interpolation can wrap without a modulo on the index.
+    Frequency is not part of the key: it only maps time onto cycle fraction.
+    joint_factors must be hashable (pass a tuple).
+    """
+    gains, spatial_phases = joint_gains_and_phases(amplitude, phase_shift, joint_factors,
+                                                   direction, convention)
+    cycle_phase = 2 * np.pi * np.arange(samples + 1) / samples
+    table = gains * np.sin(cycle_phase[:, None] + spatial_phases)
+
+    # Shared between callers through the cache, so keep it read-only
+    table.flags.writeable = False
+    return table
+
+
+def angles_at_phase(cycle_fraction, amplitude, phase_shift, joint_factors, direction,
+                    convention="wave_param", samples=SAMPLES_PER_CYCLE):
+    """
+    Joint angles (deg) at a cycle fraction (0..1, wraps), by table lookup.
+
+    A scalar fraction returns an (N,) array, an array of T fractions
+    returns (T, N).
+    """
+    table = cycle_table(float(amplitude), float(phase_shift), tuple(joint_factors),
+                        direction, convention, samples)
+
+    # Fractional row index into the table, then linear interpolation
+    position = np.mod(cycle_fraction, 1.0) * samples
+    index = np.minimum(position.astype(int), samples - 1)
+    weight = (position - index)[..., None]
+
+    return table[index] + weight * (table[index + 1] - table[index])
+
+
+def gait_angles(t, amplitude, frequency, phase_shift, joint_factors, direction,
+                convention="wave_param", samples=SAMPLES_PER_CYCLE):
+    """Joint angles (deg) at time(s) t for a sinusoidal undulation gait."""
+    cycle_fraction = np.multiply(frequency, t)
+    return angles_at_phase(cycle_fraction, amplitude, phase_shift, joint_factors,
+                           direction, convention, samples)
@@ -0,0 +1,293 @@
+"""
+Search the sine_swim.py gait parameters for the fastest or most efficient gait.
+
+Candidates (amplitude, frequency, phase_shift, five joint_factors,
+wave_direction) are scored with the resistive-force swimmer of
+swimmer_model.py. The search is a cross-entropy method: sample a batch
+around the current best distribution, score it on a process pool, refit
+the distribution to the best tenth, repeat. Every score is cached on disk
+keyed by the (rounded) parameters, so reruns and overlapping searches are
+free. Gaits that exceed the servo limits are rejected.
+
+    python gait_optimizer.py --objective speed --out best_gait
+    python gait_optimizer.py --objective efficiency --uniform-factors   # for arduino.ino
+
+The winner is written as best_gait.json (the wave command controller_gui.py
+sends; "Load Gait..." there reads it) and best_gait.h (the USER-TUNABLE
+PARAMETERS and DIRECTION CONTROL constants of Controllable_wave_param.ino),
+and the electronics/gait_stream.py command line is printed.
+"""
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from swimmer_model import SwimmerModel
+
+# Same ranges as the sine_swim.py sliders
+BOUNDS = {
+    "amplitude": (0.0, 50.0),
+    "frequency": (0.1, 5.0),
+    "phase_shift": (0.0, 90.0),
+    "joint_factor": (0.0, 2.0),
+}
+NUM_JOINTS = 5
+
+# Servo limits (SG90-class hobby servos around centerPos = 90)
+MAX_DEFLECTION_DEG = 60.0       # per joint, either side of center
+MAX_SERVO_SPEED_DEG_S = 500.0   # peak angular speed, about 0.12 s / 60 deg
+
+CACHE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "gait_optimizer_cache.jsonl")
+CACHE_VERSION = 1               # bump when the model or the scoring changes
+DECIMALS = 2                    # parameter rounding: the cache key resolution
+
+DEFAULT_POPULATION = 128
+DEFAULT_ITERATIONS = 12
+ELITE_FRACTION = 0.1
+
+
+def pack(amplitude, frequency, phase_shift, joint_factors, direction):
+    return np.array([amplitude, frequency, phase_shift, *joint_factors, direction], dtype=float)
+
+
+def unpack(vector):
+    return {"amplitude": float(vector[0]), "frequency": float(vector[1]), "phase_shift": float(vector[2]),
+            "joint_factors": [float(v) for v in vector[3:3 + NUM_JOINTS]],
+            "direction": int(vector[3 + NUM_JOINTS])}
+
+
+def _bounds():
+    low = [BOUNDS["amplitude"][0], BOUNDS["frequency"][0], BOUNDS["phase_shift"][0]]
+    high = [BOUNDS["amplitude"][1], BOUNDS["frequency"][1], BOUNDS["phase_shift"][1]]
+    low += [BOUNDS["joint_factor"][0]] * NUM_JOINTS
+    high += [BOUNDS["joint_factor"][1]] * NUM_JOINTS
+    return np.array(low), np.array(high)
+
+
+def within_servo_limits(gait):
+    """Peak deflection and peak angular speed of every joint within the servo limits."""
+    peak = gait["amplitude"] * np.asarray(gait["joint_factors"])
+    peak_speed = 2 * np.pi * gait["frequency"] * peak
+    return bool(np.all(peak <= MAX_DEFLECTION_DEG) and np.all(peak_speed <= MAX_SERVO_SPEED_DEG_S))
+
+
+def score(gait, model=None):
+    """
+    Steady speed, mean power at that speed and efficiency of one gait;
+    infeasible gaits score zero. Efficiency is the power spent pushing the
+    head through the water over the power the tail spends, a Froude-style
+    ratio that does not simply favour the slowest gait.
+    """
+    if not within_servo_limits(gait) or gait["amplitude"] <= 0:
+        return {"speed": 0.0, "power": 0.0, "efficiency": 0.0, "feasible": False}
+
+    model = model or SwimmerModel()
+    args = (gait["amplitude"], gait["frequency"], gait["phase_shift"], gait["joint_factors"], gait["direction"])
+    speed = model.steady_speed(*args)
+    power = float(model.cycle_forces(*args, speed=speed)["mean_power"])
+    useful = model.head_drag * speed ** 2
+    return {"speed": speed, "power": power, "efficiency": useful / power if power > 0 else 0.0,
+            "feasible": True}
+
+
+def score_batch(vectors):
+    """Worker entry point: score a batch of packed parameter vectors."""
+    model = SwimmerModel()
+    return [score(unpack(vector), model) for vector in vectors]
+
+
+def cache_key(vector):
+    return json.dumps([CACHE_VERSION] + np.round(vector, DECIMALS).tolist())
+
+
+class ScoreCache:
+    """Scores keyed by rounded parameters, persisted as one JSON line per entry."""
+
+    def __init__(self, path=CACHE_FILE):
+        self.path = path
+        self.entries = {}
+        if path and os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                        self.entries[entry["key"]] = entry["score"]
+                    except (ValueError, KeyError):
+                        continue  # a line cut short by an interrupted run
+
+    def get(self, key):
+        return self.entries.get(key)
+
+    def add(self, items):
+        new = [(key, value) for key, value in items if key not in self.entries]
+        self.entries.update(new)
+        if self.path and new:
+            with open(self.path, "a") as f:
+                for key, value in new:
+                    f.write(json.dumps({"key": key, "score": value}) + "\n")
+
+
+class GaitOptimizer:
+    def __init__(self, objective="speed", population=DEFAULT_POPULATION, workers=None,
+                 uniform_factors=False, direction=None, cache=None, seed=None):
+        if objective not in ("speed", "efficiency"):
+            raise ValueError(f"Unknown objective: {objective}")
+        self.objective = objective
+        self.population = population
+        self.workers = workers
+        self.uniform_factors = uniform_factors
+        self.direction = direction
+        self.cache = cache if cache is not None else ScoreCache()
+        self.rng = np.random.default_rng(seed)
+        self.low, self.high = _bounds()
+        self.evaluated = 0
+        self.cache_hits = 0
+
+    def _sample(self, mean, std, direction_p):
+        count = self.population
+        continuous = np.clip(mean + std * self.rng.normal(size=(count, len(mean))), self.low, self.high)
+        if self.uniform_factors:
+            continuous[:, 3:] = 1.0
+        if self.direction is None:
+            directions = np.where(self.rng.random(count) < direction_p, 1.0, -1.0)
+        else:
+            directions = np.full(count, float(self.direction))
+        # Round before scoring so cached and fresh scores share the same keys
+        return np.round(np.column_stack((continuous, directions)), DECIMALS)
+
+    def evaluate(self, vectors, pool=None):
+        keys = [cache_key(v) for v in vectors]
+        scores = [self.cache.get(key) for key in keys]
+        missing = [i for i, s in enumerate(scores) if s is None]
+        self.cache_hits += len(vectors) - len(missing)
+
+        if missing:
+            todo = vectors[missing]
+            if pool is None:
+                fresh = score_batch(todo)
+            else:
+                # A few batches per worker: enough to balance the load, few enough to pickle cheaply
+                workers = self.workers or os.cpu_count() or 1
+                chunks = np.array_split(todo, min(len(todo), 4 * workers))
+                fresh = [s for batch in pool.map(score_batch, chunks) for s in batch]
+            for i, s in zip(missing, fresh):
+                scores[i] = s
+            self.cache.add([(keys[i], s) for i, s in zip(missing, fresh)])
+            self.evaluated += len(missing)
+
+        return np.array([s[self.objective] for s in scores]), scores
+
+    def run(self, iterations=DEFAULT_ITERATIONS, start=None, callback=None):
+        """Cross-entropy search; returns (best gait dict, its score dict)."""
+        start = start or {"amplitude": 20.0, "frequency": 1.0, "phase_shift": 45.0,
+                          "joint_factors": [0.6, 0.8, 1.2, 1.3, 1.4], "direction": 1}
+        mean = pack(**start)[:-1]
+        std = (self.high - self.low) / 4
+        direction_p = 0.5
+        elite_count = max(2, int(self.population * ELITE_FRACTION))
+        best_value, best_vector, best_score = -np.inf, None, None
+
+        pool = ProcessPoolExecutor(max_workers=self.workers) if self.workers != 1 else None
+        try:
+            for iteration in range(iterations):
+                vectors = self._sample(mean, std, direction_p)
+                values, scores = self.evaluate(vectors, pool)
+
+                elite = np.argsort(values)[-elite_count:]
+                mean = vectors[elite, :-1].mean(axis=0)
+                std = np.maximum(vectors[elite, :-1].std(axis=0), (self.high - self.low) * 0.01)
+                direction_p = float(np.mean(vectors[elite, -1] > 0))
+
+                top = elite[-1]
+                if values[top] > best_value:
+                    best_value, best_vector, best_score = values[top], vectors[top], scores[top]
+                if callback:
+                    callback(iteration, unpack(best_vector), best_score)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        return unpack(best_vector), best_score
+
+
+def signed_phase_shift(gait):
+    """
+    Phase shift with the wave direction folded into its sign: joint k lags
+    joint 0 by k times this. A direction -1 gait also mirrors the whole wave,
+    which only shifts it by half a period.
+    """
+    return gait["direction"] * gait["phase_shift"]
+
+
+def arduino_phase_shift(gait):
+    """
+    The phase_shift to send arduino.ino for a gait. The sketch leads joint k
+    by k * phase_shift (sin(wt + k * phase)), the opposite sign to the model,
+    so the phase is negated and wrapped into 0-360.
+    """
+    return (-signed_phase_shift(gait)) % 360.0
+
+
+def export_gait(gait, score, prefix):
+    """Write prefix.json (controller_gui.py wave command) and prefix.h (sketch constants)."""
+    command = {"command": "wave", "amplitude": round(gait["amplitude"], 2),
+               "frequency": round(gait["frequency"], 2), "phase_shift": round(arduino_phase_shift(gait), 2),
+               # The gait as optimized (gait.py "wave_param" convention), for gait_stream.py
+               # and the sketches; arduino.ino has no per-joint factors
+               "gait": {"phase_shift": gait["phase_shift"], "joint_factors": gait["joint_factors"],
+                        "direction": gait["direction"]},
+               "predicted": score}
+    with open(prefix + ".json", "w") as f:
+        json.dump(command, f, indent=2)
+
+    factors = list(gait["joint_factors"]) + [0.0]  # constant6 is the tail fin, not driven by the wave
+    lines = ["// Generated by gait_optimizer.py - paste over the matching constants",
+             "// of Controllable_wave_param.ino",
+             f"const float amplitude       = {gait['amplitude']:.2f};",
+             f"const float frequency       = {gait['frequency']:.2f};",
+             f"const float phaseShiftDeg   = {signed_phase_shift(gait):.2f};",
+             ""]
+    lines += [f"const float constant{i + 1}       = {factor:.2f};" for i, factor in enumerate(factors)]
+    # directionMultiplier only mirrors the envelope (the joints always lag by
+    # k * phaseShiftDeg), so the direction is carried by the phase sign instead
+    lines += ["", "const int directionMultiplier = 1;", ""]
+    with open(prefix + ".h", "w") as f:
+        f.write("\n".join(lines))
+
+    return ("python electronics/gait_stream.py --amplitude {amplitude:.2f} --frequency {frequency:.2f} "
+            "--phase-shift {phase_shift:.2f} --joint-factors {factors} --direction {direction}").format(
+        factors=" ".join(f"{v:.2f}" for v in gait["joint_factors"]), **gait)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Optimize the sinusoidal gait with the swimmer model")
+    parser.add_argument("--objective", choices=["speed", "efficiency"], default="speed")
+    parser.add_argument("--iterations", type=int, default=DEFAULT_ITERATIONS)
+    parser.add_argument("--population", type=int, default=DEFAULT_POPULATION)
+    parser.add_argument("--workers", type=int, default=None, help="process pool size (1 = no pool)")
+    parser.add_argument("--uniform-factors", action="store_true",
+                        help="keep all joint factors at 1 (arduino.ino has no per-joint factors)")
+    parser.add_argument("--direction", type=int, choices=[-1, 1], help="fix the wave direction")
+    parser.add_argument("--cache", default=CACHE_FILE, help="score cache file ('' to disable)")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--out", default="best_gait", help="output prefix for .json and .h")
+    args = parser.parse_args()
+
+    def report(iteration, gait, score):
+        print(f"iter {iteration + 1:2d}: speed {score['speed']:.3f}  efficiency {score['efficiency']:.5f}  "
+              f"A={gait['amplitude']:.1f} f={gait['frequency']:.2f} phase={gait['phase_shift']:.1f} "
+              f"factors={[round(v, 2) for v in gait['joint_factors']]} dir={gait['direction']}")
+
+    optimizer = GaitOptimizer(args.objective, args.population, args.workers, args.uniform_factors,
+                              args.direction, ScoreCache(args.cache or None), args.seed)
+    gait, score = optimizer.run(args.iterations, callback=report)
+    print(f"{optimizer.evaluated} gaits scored, {optimizer.cache_hits} from the cache")
+
+    stream_command = export_gait(gait, score, args.out)
+    print(f"Wrote {args.out}.json (controller_gui.py) and {args.out}.h (Controllable_wave_param.ino)")
+    print(f"Stream it: {stream_command}")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,8 +6,13 @@ import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 import matplotlib.patches as patches
 import math
+import os
 import sys
 
+# Servo calibration tables live with the serial tools in electronics/
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "electronics"))
+from servo_calibration import ServoCalibration
+
 # ------------------------- Simulation Parameters -------------------------
 dt = 0.1                        # Time step (seconds)
 num_steps = 200                 # Total time steps (increased to ensure path end is reached)
@@ -52,6 +57,10 @@ trajectory = np.zeros((2, num_steps))  # 2 x num_steps trajectory array
 servo_angle_log = np.zeros((6, num_steps))
 servo_pwm_log = np.zeros((6, num_steps))
 
+# Per-servo angle -> PWM tables (electronics/servo_calibration.json), or the
+# plain 1500 +- 500 us mapping if the servos have not been calibrated yet
+servo_calibration = ServoCalibration.load_or_linear(6)
+
 # ------------------------- PID Memory -------------------------
 integral_theta = 0
 integral_speed = 0
@@ -407,9 +416,8 @@ def simulation_step():
 
     # Store angles and PWM values
     if current_step < num_steps:
-        for i in range(6):
-            servo_angle_log[i, current_step] = angles_this_step[i]
-            servo_pwm_log[i, current_step] = 1500 + (angles_this_step[i] / 90.0) * 500
+        servo_angle_log[:, current_step] = angles_this_step
+        servo_pwm_log[:, current_step] = servo_calibration.to_pulse(angles_this_step)
 
     # Increment step counter
     globals()['current_step'] = (current_step + 1) % num_steps  # Use modulo to wrap around
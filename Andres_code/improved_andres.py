@@ -7,6 +7,8 @@ import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 import math
 import sys
+from waypoint_path import PathTracker, WaypointPath
+from swimmer_model import SwimmerModel
 
 # ------------------------- Simulation Parameters -------------------------
 dt = 0.05                       # Time step (seconds) - Faster simulation (half the time step)
@@ -17,6 +19,24 @@ max_steering = math.radians(30) # Max rudder deflection (radians)
 max_tail_amplitude = 1.5        # Max tail amplitude
 lookahead_distance = 1.5        # Lookahead distance for heading control
 
+# Thrust model: "swimmer" maps the tail amplitude onto the joint gait and uses
+# the steady speed of the resistive-force swimmer (swimmer_model.py);
+# "quadratic" is the original u_t = k_t * tail_amp**2
+thrust_model = "swimmer"
+max_speed = 1.5                 # Speed at full tail amplitude (the old clip)
+gait_max_amplitude = 30.0       # Joint amplitude (deg) at full tail amplitude, as the GUI slider
+gait_frequency = 0.8            # Hz, phase shift (deg) and joint factors of the default gait
+gait_phase_shift = 60.0
+gait_joint_factors = [1.0, 1.0, 1.0, 1.0]
+
+# Steady speed against tail amplitude, from whole gait cycles of the swimmer.
+# Scaled so full amplitude reaches max_speed, which keeps the PID gains tuned;
+# the shape (about amplitude^2, saturating) comes from the model
+speed_amplitudes = np.linspace(0, max_tail_amplitude, 31)
+speed_table = SwimmerModel().speed_table(speed_amplitudes / max_tail_amplitude * gait_max_amplitude,
+                                         gait_frequency, gait_phase_shift, gait_joint_factors)
+speed_table *= max_speed / speed_table[-1]
+
 # PID Gains (heading)
 Kp_theta = 3.0
 Ki_theta = 0.1
@@ -27,9 +47,12 @@ Kp_speed = 1.2
 Ki_speed = 0.1
 Kd_speed = 0.6
 
-# Desired path: from origin to (20,0)
+# Desired path: from origin to (20,0). Any polyline works here, e.g.
+# WaypointPath.from_spline([(0, 0), (8, 3), (14, -3), (20, 0)])
 origin = (0, 0)
 end = (20, 0)
+path = WaypointPath([origin, end])
+path_tracker = PathTracker(path, lookahead_distance)
 
 # ------------------------- Initial State & Trajectory -------------------------
 state = {
@@ -65,18 +88,19 @@ def compute_errors(state):
     lookahead_x1 = x + lookahead_distance * np.cos(theta)
     lookahead_y1 = y + lookahead_distance * np.sin(theta)
     
-    # Ray 2: same length, aimed directly horizontally (desired y = 0)
-    lookahead_x2 = x + lookahead_distance
-    lookahead_y2 = 0
+    # Ray 2: aimed at the path point lookahead_distance further along the path
+    # (for the straight default path this is (x + lookahead_distance, 0))
+    s, cross_track, (lookahead_x2, lookahead_y2), _ = path_tracker.update(x, y)
     
     theta_1 = np.arctan2(lookahead_y1 - y, lookahead_x1 - x)
     theta_2 = np.arctan2(lookahead_y2 - y, lookahead_x2 - x)
     
-    e_theta = theta_2 - theta_1
+    e_theta = np.arctan2(np.sin(theta_2 - theta_1), np.cos(theta_2 - theta_1))
     
+    # Speed error: scheduled progress along the path minus actual progress
     total_time = num_steps * dt
-    desired_x = origin[0] + (end[0] - origin[0]) * (time_elapsed / total_time)
-    e_v = desired_x - x
+    desired_s = path.length * (time_elapsed / total_time)
+    e_v = desired_s - s
     return e_theta, e_v, (lookahead_x1, lookahead_y1), (lookahead_x2, lookahead_y2)
 
 def run_pid_controllers(state):
@@ -106,8 +130,11 @@ def update_state(state, rudder, tail_amp):
     """
     Update the robot state using a bicycle model.
     """
-    u_t = k_t * tail_amp**2
-    state['v'] = np.clip(u_t, 0, 1.5)
+    if thrust_model == "swimmer":
+        state['v'] = np.interp(tail_amp, speed_amplitudes, speed_table)
+    else:
+        u_t = k_t * tail_amp**2
+        state['v'] = np.clip(u_t, 0, max_speed)
     state['x'] += state['v'] * np.cos(state['theta']) * dt
     state['y'] += state['v'] * np.sin(state['theta']) * dt
     state['theta'] += (state['v'] / L) * np.tan(rudder) * dt
@@ -135,7 +162,7 @@ ax.set_ylim(-5, 5)
 ax.set_title("Map View: Robot Trajectory")
 ax.set_xlabel("X Position")
 ax.set_ylabel("Y Position")
-ax.plot([origin[0], end[0]], [origin[1], end[1]], 'k--', linewidth=2, label="Ideal Path")
+ax.plot(path.points[:, 0], path.points[:, 1], 'k--', linewidth=2, label="Ideal Path")
 
 # Define robot shape with articulated segments
 head_size = 0.6
@@ -222,7 +249,7 @@ current_step = 0
 
 def simulation_step():
     global state, time_elapsed, current_step, trajectory, dt
-    if current_step < num_steps and state['x'] < end[0]:
+    if current_step < num_steps and not path_tracker.finished():
         rudder, tail_amp, ray1, ray2 = run_pid_controllers(state)
         state_updated = update_state(state, rudder, tail_amp)
         state.update(state_updated)
@@ -5,9 +5,11 @@ import matplotlib
 matplotlib.use("TkAgg")
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import math
 import time
 
+from fish_kinematics import forward_kinematics
+from gait import gait_angles
+
 # Simulation time settings
 dt = 0.05                    # Time step (seconds)
 t_max = 10                   # Total simulation time (seconds)
@@ -38,7 +40,7 @@ class FishTailSimulation:
         
         # Setup time array and storage for angle data over time
         self.time_data = np.arange(0, 2, dt)
-        self.angle_data = [np.zeros((len(self.time_data),)) for _ in range(self.num_joints)]
+        self.angle_data = np.zeros((self.num_joints, len(self.time_data)))
         
         # Frame counter for animation
         self.frame_count = 0
@@ -278,23 +280,16 @@ class FishTailSimulation:
         else:
             self.play_pause_button.config(text="Play")
     
+    def current_gait_angles(self, t):
+        """Look up joint angles at time t from the cached gait cycle table."""
+        return gait_angles(t, self.amplitude, self.frequency, self.phase_shift,
+                           self.joint_factors, self.wave_direction)
+    
     def calculate_joint_angles(self, current_time):
         """Calculate the current joint angles based on continuous time."""
-        # Compute angular position for each joint
-        omega = 2 * math.pi * self.frequency
-        
-        # Phase multiplier determines wave direction
-        # Negative for head→tail propagation (matches Arduino code)
-        phase_multiplier = -1 if self.wave_direction == 1 else 1
-        
-        # Calculate angles for each joint based on direction and phase shift
-        for i in range(self.num_joints):
-            # Calculate angle using sine wave with continuous time
-            spatial_phase = phase_multiplier * i * math.radians(self.phase_shift)
-            angle = self.wave_direction * self.amplitude * self.joint_factors[i] * math.sin(omega * current_time + spatial_phase)
-            
-            # Store the angle
-            self.joint_angles[i] = angle
+        # Table lookup instead of evaluating a sine per joint
+        # (direction sign convention matches Controllable_wave_param.ino)
+        self.joint_angles[:] = self.current_gait_angles(current_time)
     
     def calculate_angles_for_timeseries(self):
         """Calculate angles for the time-series plot."""
@@ -304,66 +299,15 @@ class FishTailSimulation:
         # Compute the time index for the circular buffer
         time_idx = int((time % 2) / dt)
         
-        # Get current parameter values to use for calculations
-        amplitude_deg = self.amplitude
-        frequency = self.frequency
-        phase_shift_rad = math.radians(self.phase_shift)
-        direction = self.wave_direction
-        
-        # Angular frequency
-        omega = 2 * math.pi * frequency
-        
-        # Phase multiplier for wave direction
-        phase_multiplier = -1 if direction == 1 else 1
-        
-        # Calculate the angle for each joint at this time point
-        for i in range(self.num_joints):
-            spatial_phase = phase_multiplier * i * phase_shift_rad
-            angle = direction * amplitude_deg * self.joint_factors[i] * math.sin(omega * time + spatial_phase)
-            self.angle_data[i][time_idx] = angle
+        # Fill this time slot for every joint from the same gait table
+        self.angle_data[:, time_idx] = self.current_gait_angles(time)
             
         return time_idx
     
     def calculate_fish_positions(self):
         """Calculate the current positions of the fish joints using forward kinematics."""
-        # Reset positions array
-        self.tail_positions = np.zeros((self.num_joints+1, 2))
-        
-        # Head position at the origin
-        self.tail_positions[0, 0] = 0  # Head x
-        self.tail_positions[0, 1] = 0  # Head y
-        
-        # Initialize cumulative angle
-        total_angle = 0
-        
-        # Calculate each joint position
-        for i in range(self.num_joints):
-            # Add this joint's angle to the cumulative angle
-            # The angles are already in degrees from the calculation
-            total_angle += self.joint_angles[i]
-            
-            # Convert to radians for trigonometric functions
-            theta_rad = math.radians(total_angle)
-            
-            # Calculate new position using exact segment length
-            self.tail_positions[i+1, 0] = self.tail_positions[i, 0] + self.segment_length * math.cos(theta_rad)
-            self.tail_positions[i+1, 1] = self.tail_positions[i, 1] + self.segment_length * math.sin(theta_rad)
-            
-            # Verify segment length and fix if necessary for perfect lengths
-            dx = self.tail_positions[i+1, 0] - self.tail_positions[i, 0]
-            dy = self.tail_positions[i+1, 1] - self.tail_positions[i, 1]
-            actual_length = math.sqrt(dx**2 + dy**2)
-            
-            # If the length is off by more than a tiny tolerance, fix it
-            if abs(actual_length - self.segment_length) > 1e-12:
-                # Normalize the direction vector to exact length
-                if actual_length > 0:  # Avoid division by zero
-                    dx = dx / actual_length * self.segment_length
-                    dy = dy / actual_length * self.segment_length
-                
-                # Update the position with fixed length
-                self.tail_positions[i+1, 0] = self.tail_positions[i, 0] + dx
-                self.tail_positions[i+1, 1] = self.tail_positions[i, 1] + dy
+        # Head at the origin, each segment rotated by the cumulative joint angle
+        self.tail_positions = forward_kinematics(self.joint_angles, self.segment_length)
     
     def update_simulation(self):
         """Update the simulation with current parameters."""
@@ -9,6 +9,9 @@ import matplotlib.patches as patches
 import math
 import time
 
+from fish_kinematics import forward_kinematics
+from gait import angles_at_phase, gait_angles
+
 class FishTailSimulation:
     def __init__(self, root):
         self.root = root
@@ -260,94 +263,32 @@ class FishTailSimulation:
     
     def calculate_joint_angles(self, current_time):
         """Calculate the current joint angles based on continuous time."""
-        for i in range(self.num_joints):
-            # Calculate phase based on joint position and direction
-            spatial_phase = self.wave_direction * i * math.radians(self.phase_shift)
-            
-            # Calculate angle using sine wave with continuous time
-            # This ensures no discontinuity at any point
-            time_phase = 2 * math.pi * self.frequency * current_time
-            angle = self.amplitude * self.joint_factors[i] * math.sin(time_phase + spatial_phase)
-            
-            # Store the angle
-            self.joint_angles[i] = angle
+        # Continuous time keeps the wave free of discontinuities; the values
+        # come from the cached gait cycle table
+        self.joint_angles[:] = gait_angles(current_time, self.amplitude, self.frequency,
+                                           self.phase_shift, self.joint_factors,
+                                           self.wave_direction, convention="swim_vis")
     
     def calculate_theoretical_angles(self):
         """Calculate theoretical angle curves for the plot (not actual angles)."""
         # Get current time
         current_time = time.time() - self.start_time
         
-        # Calculate where in the cycle we are (0 to 2π)
-        cycle_phase = 2 * math.pi * self.frequency * (current_time % (1/self.frequency))
+        # Fraction of the cycle we are currently in (0 to 1)
+        cycle_offset = (self.frequency * current_time) % 1.0
         
-        # For each joint, calculate a complete cycle of angles starting from current phase
-        angles = np.zeros((self.num_joints, len(self.time_points)))
-        for i in range(self.num_joints):
-            # Spatial phase for this joint
-            spatial_phase = self.wave_direction * i * math.radians(self.phase_shift)
-            
-            # Calculate one complete cycle of the sine wave
-            for t_idx, t in enumerate(self.time_points):
-                # Map time points to phase values (0 to 2π)
-                phase = 2 * math.pi * t / 2  # Map 0-2s to 0-2π
-                # Offset by current phase to make smooth scrolling
-                total_phase = phase + cycle_phase + spatial_phase
-                # Calculate angle
-                angles[i, t_idx] = self.amplitude * self.joint_factors[i] * math.sin(total_phase)
-        
-        return angles
+        # The 0-2s plot shows one complete cycle starting from the current phase,
+        # looked up for all joints and time points at once
+        cycle_fractions = self.time_points / 2 + cycle_offset
+        angles = angles_at_phase(cycle_fractions, self.amplitude, self.phase_shift,
+                                 self.joint_factors, self.wave_direction, convention="swim_vis")
+        
+        return angles.T
     
     def calculate_fish_positions(self):
         """Calculate the current positions of the fish joints."""
-        # Reset positions array
-        self.tail_positions = np.zeros((self.num_joints+1, 2))
-        
-        # Head position at the origin
-        self.tail_positions[0, 0] = 0  # Head x
-        self.tail_positions[0, 1] = 0  # Head y
-        
-        # Initialize cumulative angle (relative to horizontal)
-        theta = 0
-        
-        # Calculate each joint position
-        for i in range(self.num_joints):
-            if i == 0:
-                # First joint - use its angle directly
-                theta = self.joint_angles[i]
-            else:
-                # Add this joint's angle to get the new orientation
-                theta += self.joint_angles[i]
-            
-            # Convert angle to radians
-            theta_rad = math.radians(theta)
-            
-            # Get previous joint position
-            prev_x = self.tail_positions[i, 0]
-            prev_y = self.tail_positions[i, 1]
-            
-            # Calculate exact new position using polar coordinates
-            next_x = prev_x + self.segment_length * math.cos(theta_rad)
-            next_y = prev_y + self.segment_length * math.sin(theta_rad)
-            
-            # Store the new joint position
-            self.tail_positions[i+1, 0] = next_x
-            self.tail_positions[i+1, 1] = next_y
-            
-            # Verify segment length and fix if necessary
-            dx = self.tail_positions[i+1, 0] - self.tail_positions[i, 0]
-            dy = self.tail_positions[i+1, 1] - self.tail_positions[i, 1]
-            actual_length = math.sqrt(dx**2 + dy**2)
-            
-            # If the length is off by more than a tiny tolerance, fix it
-            if abs(actual_length - self.segment_length) > 1e-12:
-                # Normalize the direction vector
-                if actual_length > 0:  # Avoid division by zero
-                    dx = dx / actual_length * self.segment_length
-                    dy = dy / actual_length * self.segment_length
-                
-                # Update the position with fixed length
-                self.tail_positions[i+1, 0] = self.tail_positions[i, 0] + dx
-                self.tail_positions[i+1, 1] = self.tail_positions[i, 1] + dy
+        # Head at the origin, each segment rotated by the cumulative joint angle
+        self.tail_positions = forward_kinematics(self.joint_angles, self.segment_length)
     
     def update_simulation(self):
         """Update the simulation with current parameters for continuous motion."""
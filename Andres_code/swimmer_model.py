@@ -0,0 +1,100 @@
+import numpy as np
+
+from fish_kinematics import forward_kinematics
+from gait import gait_angles
+
+# Resistive force theory: a slender link moving through water feels drag
+# proportional to its velocity, about twice as strong sideways as lengthwise.
+# That anisotropy is what turns a travelling body wave into thrust.
+DEFAULT_TANGENTIAL_DRAG = 1.0
+DEFAULT_NORMAL_DRAG = 2.0
+DEFAULT_HEAD_DRAG = 2.0         # drag of the rigid head per unit forward speed
+SAMPLES_PER_CYCLE = 72
+
+
+class SwimmerModel:
+    """
+    Reduced-order swimmer: forward_kinematics tail + resistive force theory.
+
+    The tail is laid out by forward_kinematics (head at the origin, links
+    along +x when straight), so the robot swims towards -x and thrust is
+    the water force along -x. The head is held on a straight course at the
+    given forward speed (no recoil); velocities come from differencing the
+    link midpoints over time. Everything is evaluated for all time samples,
+    links and speeds in one pass.
+    """
+
+    def __init__(self, link_length=1.0, tangential_drag=DEFAULT_TANGENTIAL_DRAG,
+                 normal_drag=DEFAULT_NORMAL_DRAG, head_drag=DEFAULT_HEAD_DRAG):
+        self.link_length = link_length
+        self.tangential_drag = tangential_drag
+        self.normal_drag = normal_drag
+        self.head_drag = head_drag
+
+    def forces(self, joint_angles, dt, speed=0.0, periodic=True):
+        """
+        Thrust, lateral force, yaw moment (about the head) and the power the
+        tail puts into the water for a (T, N) joint-angle series in degrees
+        sampled every dt.
+
+        speed may be a scalar or an array of S forward speeds; results are
+        (T,) or (S, T) arrays in a dict. periodic=True treats the series as
+        whole gait cycles, so velocities wrap at the ends.
+        """
+        positions = forward_kinematics(joint_angles, self.link_length)       # (T, N+1, 2)
+        links = np.diff(positions, axis=1)                                   # (T, N, 2)
+        midpoints = 0.5 * (positions[:, 1:] + positions[:, :-1])
+        lengths = np.hypot(links[..., 0], links[..., 1])
+        tangents = links / lengths[..., None]
+        normals = np.stack((-tangents[..., 1], tangents[..., 0]), axis=-1)
+
+        if periodic:
+            velocity = (np.roll(midpoints, -1, axis=0) - np.roll(midpoints, 1, axis=0)) / (2 * dt)
+        else:
+            velocity = np.gradient(midpoints, dt, axis=0)
+
+        # Water-relative velocity: body moves at (-speed, 0) plus the tail motion
+        speed = np.asarray(speed, dtype=float)
+        relative = velocity + np.stack((-speed, np.zeros_like(speed)), axis=-1)[..., None, None, :]
+
+        along = np.einsum("...tnk,tnk->...tn", relative, tangents)
+        across = np.einsum("...tnk,tnk->...tn", relative, normals)
+        force = -lengths[..., None] * (self.tangential_drag * along[..., None] * tangents
+                                        + self.normal_drag * across[..., None] * normals)
+
+        head_force_x = self.head_drag * speed[..., None]                     # drag opposes -x motion
+        thrust = -force[..., 0].sum(axis=-1) - head_force_x
+        lateral = force[..., 1].sum(axis=-1)
+        yaw_moment = (midpoints[..., 0] * force[..., 1] - midpoints[..., 1] * force[..., 0]).sum(axis=-1)
+        power = -np.einsum("...tnk,...tnk->...t", force, relative)
+        return {"thrust": thrust, "lateral": lateral, "yaw_moment": yaw_moment, "power": power}
+
+    def cycle_forces(self, amplitude, frequency, phase_shift, joint_factors, direction=1,
+                     speed=0.0, convention="wave_param", samples=SAMPLES_PER_CYCLE):
+        """
+        Forces over one gait cycle of the sinusoidal gait model, plus their
+        cycle means ("mean_thrust", "mean_lateral", "mean_yaw_moment", "mean_power").
+        """
+        t = np.arange(samples) / (samples * frequency)
+        angles = gait_angles(t, amplitude, frequency, phase_shift, joint_factors, direction, convention)
+        result = self.forces(angles, 1.0 / (samples * frequency), speed)
+        result.update({f"mean_{name}": values.mean(axis=-1) for name, values in list(result.items())})
+        result["t"] = t
+        return result
+
+    def steady_speed(self, amplitude, frequency, phase_shift, joint_factors, direction=1,
+                     convention="wave_param", samples=SAMPLES_PER_CYCLE):
+        """
+        Forward speed at which the mean thrust balances the drag. Forces are
+        linear in speed under resistive force theory, so two speeds suffice.
+        """
+        thrust = self.cycle_forces(amplitude, frequency, phase_shift, joint_factors, direction,
+                                   np.array([0.0, 1.0]), convention, samples)["mean_thrust"]
+        slope = thrust[1] - thrust[0]
+        return max(0.0, float(-thrust[0] / slope)) if slope < 0 else 0.0
+
+    def speed_table(self, amplitudes, frequency, phase_shift, joint_factors, direction=1,
+                    convention="wave_param", samples=SAMPLES_PER_CYCLE):
+        """Steady speed for each gait amplitude (deg), e.g. for np.interp in a sim."""
+        return np.array([self.steady_speed(a, frequency, phase_shift, joint_factors, direction,
+                                           convention, samples) for a in amplitudes])
@@ -0,0 +1,208 @@
+import numpy as np
+
+# Grid cell size as a multiple of the median segment length
+CELL_FACTOR = 2.0
+
+
+def catmull_rom(points, samples_per_segment=10, closed=False):
+    """
+    Sample a Catmull-Rom spline through points (N, 2) as a dense polyline.
+    A closed curve wraps back to the first point.
+    """
+    points = np.asarray(points, dtype=float)
+    if closed:
+        padded = np.concatenate((points[-1:], points, points[:2]))
+    else:
+        padded = np.concatenate((2 * points[:1] - points[1:2], points, 2 * points[-1:] - points[-2:-1]))
+
+    t = np.linspace(0.0, 1.0, samples_per_segment, endpoint=False)[:, None]
+    p0, p1, p2, p3 = padded[:-3], padded[1:-2], padded[2:-1], padded[3:]
+    # (segments, samples, 2), every segment at once
+    curve = 0.5 * (2 * p1[:, None] + (p2 - p0)[:, None] * t
+                   + (2 * p0 - 5 * p1 + 4 * p2 - p3)[:, None] * t ** 2
+                   + (3 * p1 - p0 - 3 * p2 + p3)[:, None] * t ** 3)
+    curve = curve.reshape(-1, 2)
+    return np.concatenate((curve, curve[:1] if closed else points[-1:]))
+
+
+class WaypointPath:
+    """
+    Polyline path with an arc-length table and a uniform-grid segment index.
+
+    point_at(s) is a binary search in the arc-length table, and nearest()
+    only looks at the segments in the grid cells around the query point, so
+    both cost about the same for 2 waypoints or 20000 (a multi-lap course).
+    Far off the path nearest() is bounded by one projection onto every
+    candidate segment.
+    """
+
+    def __init__(self, points, cell_size=None):
+        self.points = np.asarray(points, dtype=float)
+        if len(self.points) < 2:
+            raise ValueError("A path needs at least two waypoints")
+
+        self.starts = self.points[:-1]
+        self.vectors = np.diff(self.points, axis=0)
+        self.lengths = np.hypot(self.vectors[:, 0], self.vectors[:, 1])
+        self.cumulative = np.concatenate(([0.0], np.cumsum(self.lengths)))
+        self.length = float(self.cumulative[-1])
+        self.headings = np.arctan2(self.vectors[:, 1], self.vectors[:, 0])
+
+        if cell_size is None:
+            cell_size = CELL_FACTOR * max(float(np.median(self.lengths)), 1e-9)
+        self.cell_size = cell_size
+        self._build_grid()
+
+    @classmethod
+    def from_spline(cls, control_points, samples_per_segment=10, closed=False, cell_size=None):
+        return cls(catmull_rom(control_points, samples_per_segment, closed), cell_size)
+
+    def _build_grid(self):
+        # Cells covered by each segment's bounding box, as CSR arrays sorted by cell
+        low = np.floor(np.minimum(self.starts, self.points[1:]) / self.cell_size).astype(np.int64)
+        high = np.floor(np.maximum(self.starts, self.points[1:]) / self.cell_size).astype(np.int64)
+        self._origin = low.min(axis=0)
+        self._shape = high.max(axis=0) - self._origin + 1
+
+        cells, segments = [], []
+        for segment, (lo, hi) in enumerate(zip(low - self._origin, high - self._origin)):
+            gx, gy = np.meshgrid(np.arange(lo[0], hi[0] + 1), np.arange(lo[1], hi[1] + 1), indexing="ij")
+            cells.append((gx * self._shape[1] + gy).ravel())
+            segments.append(np.full(gx.size, segment))
+        cells = np.concatenate(cells)
+        order = np.argsort(cells, kind="stable")
+        self._cell_keys, starts = np.unique(cells[order], return_index=True)
+        self._cell_starts = np.append(starts, len(order))
+        self._cell_segments = np.concatenate(segments)[order]
+
+    def _ring_keys(self, cell, radius):
+        """Keys of the grid cells on the square ring at Chebyshev radius around cell."""
+        cx, cy = cell
+        nx, ny = self._shape
+        if radius == 0:
+            xs, ys = np.array([cx]), np.array([cy])
+        else:
+            # Top and bottom rows, then the side columns without their corners, clipped to the grid
+            x = np.arange(max(cx - radius, 0), min(cx + radius, nx - 1) + 1)
+            y = np.arange(max(cy - radius + 1, 0), min(cy + radius - 1, ny - 1) + 1)
+            xs, ys = [], []
+            for edge in (cy - radius, cy + radius):
+                if 0 <= edge < ny:
+                    xs.append(x)
+                    ys.append(np.full(len(x), edge))
+            for edge in (cx - radius, cx + radius):
+                if 0 <= edge < nx:
+                    xs.append(np.full(len(y), edge))
+                    ys.append(y)
+            if not xs:
+                return np.empty(0, dtype=np.int64)
+            xs, ys = np.concatenate(xs), np.concatenate(ys)
+        inside = (xs >= 0) & (xs < nx) & (ys >= 0) & (ys < ny)
+        return (xs * ny + ys)[inside]
+
+    def _segments_in_cells(self, keys):
+        slots = np.searchsorted(self._cell_keys, keys)
+        slots = slots[(slots < len(self._cell_keys)) & (self._cell_keys[np.minimum(slots, len(self._cell_keys) - 1)] == keys)]
+        if not len(slots):
+            return np.empty(0, dtype=np.int64)
+        return np.unique(np.concatenate([self._cell_segments[self._cell_starts[k]:self._cell_starts[k + 1]]
+                                         for k in slots]))
+
+    def _window(self, s_range):
+        """First and one-past-last index of the segments overlapping s_range."""
+        if s_range is None:
+            return 0, len(self.lengths)
+        first = max(int(np.searchsorted(self.cumulative, s_range[0], side="left")) - 1, 0)
+        last = min(int(np.searchsorted(self.cumulative, s_range[1], side="right")), len(self.lengths))
+        return first, last
+
+    def project(self, point, segments):
+        """(distance, s, segment) of the closest point of the given segments."""
+        offset = np.asarray(point, dtype=float) - self.starts[segments]
+        lengths_sq = np.maximum(self.lengths[segments] ** 2, 1e-18)
+        fraction = np.clip(np.einsum("ij,ij->i", offset, self.vectors[segments]) / lengths_sq, 0.0, 1.0)
+        closest = self.starts[segments] + fraction[:, None] * self.vectors[segments]
+        distance = np.hypot(*(np.asarray(point) - closest).T)
+        i = int(np.argmin(distance))
+        return distance[i], self.cumulative[segments[i]] + fraction[i] * self.lengths[segments[i]], int(segments[i])
+
+    def nearest(self, point, s_range=None):
+        """
+        Closest point on the path: (distance, s, segment). s_range=(low, high)
+        restricts the search to that stretch of arc length, which keeps a
+        course that crosses itself from jumping between laps.
+        """
+        first, last = self._window(s_range)
+        if first >= last:
+            return None
+
+        cell = np.floor(np.asarray(point, dtype=float) / self.cell_size).astype(np.int64) - self._origin
+        # Rings closer than `near` miss the grid entirely; at `far` the whole grid has been covered
+        near = int(max(0, -cell.min(), (cell - self._shape + 1).max()))
+        far = int(np.maximum(cell, self._shape - 1 - cell).max())
+
+        # Grow the searched square ring by ring until nothing outside it can be closer.
+        # Far off the path that takes many rings: once the cells visited outnumber the
+        # candidate segments, projecting onto all of them is cheaper
+        best = None
+        visited = 0
+        for radius in range(near, far + 1):
+            visited += max(8 * radius, 1)
+            if visited > last - first:
+                return self.project(point, np.arange(first, last))
+            segments = self._segments_in_cells(self._ring_keys(cell, radius))
+            segments = segments[(segments >= first) & (segments < last)]
+            if len(segments):
+                found = self.project(point, segments)
+                if best is None or found[0] < best[0]:
+                    best = found
+            # Every segment within best distance lies in cells at most this far out
+            if best is not None and best[0] <= radius * self.cell_size:
+                break
+        return best
+
+    def point_at(self, s):
+        """Position and path heading at arc length s (clamped to the path)."""
+        s = min(max(s, 0.0), self.length)
+        segment = min(int(np.searchsorted(self.cumulative, s, side="right")) - 1, len(self.lengths) - 1)
+        fraction = (s - self.cumulative[segment]) / max(self.lengths[segment], 1e-18)
+        return self.starts[segment] + fraction * self.vectors[segment], float(self.headings[segment])
+
+    def cross_track(self, point, s, segment):
+        """Signed distance from the path at a located point (left of travel positive)."""
+        offset = np.asarray(point, dtype=float) - self.starts[segment]
+        direction = self.vectors[segment] / max(self.lengths[segment], 1e-18)
+        return float(direction[0] * offset[1] - direction[1] * offset[0])
+
+
+class PathTracker:
+    """
+    Per-tick progress along a WaypointPath: arc length s, cross-track error
+    and the lookahead point. Searches only a window of arc length around
+    the last s, so laps of a closed course are told apart.
+    """
+
+    def __init__(self, path, lookahead=1.5, search_back=2.0, search_ahead=5.0):
+        self.path = path
+        self.lookahead = lookahead
+        self.search_back = search_back
+        self.search_ahead = search_ahead
+        self.s = None
+
+    def update(self, x, y):
+        """Returns (s, cross_track_error, lookahead_point, path_heading)."""
+        point = (x, y)
+        located = None
+        if self.s is not None:
+            located = self.path.nearest(point, (self.s - self.search_back, self.s + self.search_ahead))
+        if located is None:
+            # First tick (or far off the window): global search
+            located = self.path.nearest(point)
+
+        _, s, segment = located
+        self.s = s
+        lookahead_point, _ = self.path.point_at(s + self.lookahead)
+        return s, self.path.cross_track(point, s, segment), lookahead_point, float(self.path.headings[segment])
+
+    def finished(self, tolerance=0.0):
+        return self.s is not None and self.s >= self.path.length - tolerance
@@ -0,0 +1,150 @@
+"""
+Non-blocking serial transport for the asyncio server.
+
+pyserial calls block, so every read and write runs in a worker thread and
+the event loop only ever awaits. A reader task splits the incoming stream
+into text lines (binary frames are skipped) and queues them; request()
+sends a command and awaits the first matching reply with a timeout.
+"""
+import asyncio
+import os
+import sys
+
+import serial
+
+# The frame decoder lives with the other serial tools in electronics/
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "electronics"))
+from snake_protocol import FrameDecoder
+
+READ_TIMEOUT = 0.1      # seconds a worker-thread read may block
+MAX_QUEUED_LINES = 200  # oldest unread lines are dropped beyond this
+
+
+def _close_opened(future):
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
+
+
+class AsyncSerialTransport:
+    def __init__(self, ser):
+        self.ser = ser
+        self.port = ser.port
+        self.lines = asyncio.Queue(maxsize=MAX_QUEUED_LINES)
+        self.dropped_lines = 0
+        self.decoder = FrameDecoder()
+        self.line_listeners = []    # called with every line; returning True consumes it
+        self.lost_listeners = []    # called with the transport when the port goes away
+        self.telemetry = None       # TelemetryStore of this port's TEL lines, if the owner keeps one
+        self._write_lock = asyncio.Lock()
+        self._request_lock = asyncio.Lock()
+        self._reader_task = None
+        self.closed = False
+
+    @classmethod
+    async def open(cls, port, baudrate, reset_delay=2.0):
+        """Open a port without blocking the loop and wait for the Arduino reset."""
+        loop = asyncio.get_running_loop()
+        opening = loop.run_in_executor(
+            None, lambda: serial.Serial(port, baudrate, timeout=READ_TIMEOUT, write_timeout=1))
+        try:
+            ser = await asyncio.shield(opening)
+        except asyncio.CancelledError:
+            # The worker thread still opens the port; close it once it has
+            opening.add_done_callback(_close_opened)
+            raise
+        transport = cls(ser)
+        transport.start()
+        try:
+            await asyncio.sleep(reset_delay)
+        except asyncio.CancelledError:
+            # e.g. a wait_for deadline during the reset: the caller never gets the transport
+            await transport.close()
+            raise
+        return transport
+
+    def start(self):
+        if self._reader_task is None:
+            self._reader_task = asyncio.create_task(self._read_loop())
+
+    def _read_blocking(self):
+        # Returns after READ_TIMEOUT at the latest, so close() is never held up long
+        return self.ser.read(max(1, self.ser.in_waiting))
+
+    def _queue_line(self, line):
+        if self.lines.full():
+            self.lines.get_nowait()
+            self.dropped_lines += 1
+        self.lines.put_nowait(line)
+
+    async def _read_loop(self):
+        loop = asyncio.get_running_loop()
+        while not self.closed:
+            try:
+                data = await loop.run_in_executor(None, self._read_blocking)
+            except (serial.SerialException, OSError):
+                # Unplugged or closed underneath us
+                if not self.closed:
+                    self.closed = True
+                    for listener in self.lost_listeners:
+                        listener(self)
+                break
+            if not data:
+                continue
+
+            self.decoder.feed(data)
+            for line in self.decoder.take_lines():
+                if not line:
+                    continue
+                # e.g. telemetry is handled by a listener and never queued
+                if any(listener(line) for listener in self.line_listeners):
+                    continue
+                self._queue_line(line)
+
+    async def write(self, data):
+        loop = asyncio.get_running_loop()
+        async with self._write_lock:
+            await loop.run_in_executor(None, self.ser.write, data)
+
+    def drain_lines(self):
+        """Return and clear the lines received so far, without waiting."""
+        lines = []
+        while not self.lines.empty():
+            lines.append(self.lines.get_nowait())
+        return lines
+
+    async def readline(self, timeout=1.0):
+        """Next received line, or None if nothing arrives within timeout."""
+        try:
+            return await asyncio.wait_for(self.lines.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def request(self, data, timeout=1.0, match=None):
+        """
+        Send data and return the first reply line accepted by match(line)
+        (any line if match is None), or None on timeout.
+
+        Requests are serialized so concurrent callers never take each
+        other's replies; lines received before the request are discarded.
+        """
+        loop = asyncio.get_running_loop()
+        async with self._request_lock:
+            self.drain_lines()
+            await self.write(data)
+
+            deadline = loop.time() + timeout
+            while True:
+                line = await self.readline(deadline - loop.time())
+                if line is None or match is None or match(line):
+                    return line
+
+    async def close(self):
+        self.closed = True
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+            try:
+                await self._reader_task
+            except asyncio.CancelledError:
+                pass
+            self._reader_task = None
+        await asyncio.get_running_loop().run_in_executor(None, self.ser.close)
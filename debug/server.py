@@ -11,13 +11,43 @@ from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
 import platform
 import time
+import os
+import sys
+from collections import deque
+
+# Binary serial protocol shared with the electronics/ tools
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "electronics"))
+from snake_protocol import encode_params
+from telemetry import TelemetryStore
+from async_serial import AsyncSerialTransport
+
+# Stage timing helpers shared with the vision scripts
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "utilities"))
+from latency import LatencyRecorder
 
 # FastAPI app
 app = FastAPI(title="Snake Robot Controller")
 
 # Serial connection parameters
 BAUD_RATE = 115200
-arduino_serial = None
+arduino_serial = None  # AsyncSerialTransport once connected
+
+# Handshake commands tried in order; any reply means an Arduino is listening
+PROBE_COMMANDS = [b"STATUS:1\n", b"STATUS\n", b"HELLO\n"]
+PROBE_TIMEOUT = 0.5
+PORT_DEADLINE = 4.0  # seconds per port for open + reset + handshake
+
+# Last port that answered the handshake, tried first on the next startup
+LAST_PORT_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "last_port.json")
+
+# Max rate of parameter updates sent to the Arduino; joystick messages
+# arriving faster than this are merged into the next update
+COMMAND_RATE_HZ = 25.0
+
+# Max rate of state pushes to each WebSocket client; a client whose send
+# takes longer than BROADCAST_SEND_TIMEOUT is too slow and gets dropped
+BROADCAST_RATE_HZ = 10.0
+BROADCAST_SEND_TIMEOUT = 2.0
 
 # Snake robot parameters
 class SnakeParams(BaseModel):
@@ -35,18 +65,204 @@ current_state = {
     "connected": False,
     "port": None,
     "last_error": None,
-    "debug_info": []
+    "commands_sent": 0,
+    "commands_coalesced": 0,
+    "debug_info": deque(maxlen=20)  # Keep only the last 20 debug messages
 }
 
+# Servo angles and loop timing streamed by the connected Arduino (TEL lines);
+# replaced by the kept port's own store on connect
+telemetry = TelemetryStore()
+
+# Command path timing: submit -> serial write start, and the write itself
+latency = LatencyRecorder()
+
+class ClientChannel:
+    """Pending state delta and sender task for one WebSocket client."""
+
+    def __init__(self, websocket):
+        self.websocket = websocket
+        self.state = {}       # latest value of every changed field not yet sent
+        self.debug = []       # debug lines not yet sent
+        self.replies = []     # messages for this client only, e.g. errors
+        self.dropped = 0      # field updates replaced before they were sent
+        self.wakeup = asyncio.Event()
+        self.task = None
+
+class StateBroadcaster:
+    """
+    Pushes state changes to every connected WebSocket client.
+
+    Each client has its own pending delta: changes are merged into it (a newer
+    value replaces an unsent older one) and a per-client task sends it at most
+    BROADCAST_RATE_HZ times per second. A slow client therefore only ever
+    holds one merged delta instead of a growing backlog, and one that stops
+    reading is disconnected without holding up the others.
+    """
+
+    def __init__(self, max_rate_hz=BROADCAST_RATE_HZ):
+        self.period = 1.0 / max_rate_hz
+        self.clients = {}
+
+    def publish(self, state=None, debug=None):
+        for channel in self.clients.values():
+            if state:
+                channel.dropped += len(channel.state.keys() & state.keys())
+                channel.state.update(state)
+            if debug:
+                channel.debug.extend(debug)
+                del channel.debug[:-current_state["debug_info"].maxlen]
+            channel.wakeup.set()
+
+    def reply(self, websocket, message):
+        """Queue a message for one client; its sender task is the only writer to the socket."""
+        channel = self.clients.get(websocket)
+        if channel:
+            channel.replies.append(message)
+            channel.wakeup.set()
+
+    def stats(self):
+        return {"clients": len(self.clients),
+                "dropped_updates": [channel.dropped for channel in self.clients.values()]}
+
+    async def register(self, websocket):
+        channel = ClientChannel(websocket)
+        self.clients[websocket] = channel
+        
+        # New clients start from a full snapshot, then only get deltas
+        snapshot = {key: value for key, value in current_state.items() if key != "debug_info"}
+        await websocket.send_json({"type": "snapshot", "state": snapshot,
+                                   "debug": list(current_state["debug_info"])})
+        channel.task = asyncio.create_task(self._sender(channel))
+
+    async def unregister(self, websocket):
+        channel = self.clients.pop(websocket, None)
+        if channel and channel.task:
+            channel.task.cancel()
+            try:
+                await channel.task
+            except asyncio.CancelledError:
+                pass
+
+    async def _sender(self, channel):
+        last_sent = 0.0
+        while True:
+            await channel.wakeup.wait()
+            
+            # Throttle: changes arriving while we wait are merged into this send
+            delay = last_sent + self.period - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            channel.wakeup.clear()
+            
+            messages = channel.replies
+            if channel.state or channel.debug:
+                messages.append({"type": "delta", "state": channel.state, "debug": channel.debug})
+            channel.state, channel.debug, channel.replies = {}, [], []
+            try:
+                for message in messages:
+                    await asyncio.wait_for(channel.websocket.send_json(message), BROADCAST_SEND_TIMEOUT)
+            except Exception:
+                # Slow or gone; closing ends the client's receive loop too
+                self.clients.pop(channel.websocket, None)
+                try:
+                    await channel.websocket.close()
+                except Exception:
+                    pass
+                return
+            last_sent = time.monotonic()
+
+broadcaster = StateBroadcaster()
+
+def update_state(**changes):
+    """Apply changes to current_state and push the fields that changed."""
+    changed = {key: value for key, value in changes.items() if current_state.get(key) != value}
+    if changed:
+        current_state.update(changed)
+        broadcaster.publish(state=changed)
+
 def add_debug_info(message):
     """Add debug information to the current state"""
     timestamp = time.strftime("%H:%M:%S")
     debug_message = f"[{timestamp}] {message}"
     print(debug_message)
     current_state["debug_info"].append(debug_message)
-    # Keep only the last 20 debug messages
-    if len(current_state["debug_info"]) > 20:
-        current_state["debug_info"] = current_state["debug_info"][-20:]
+    broadcaster.publish(debug=[debug_message])
+
+class SerialCommandWriter:
+    """
+    Single writer for parameter updates to the Arduino.
+
+    Callers submit the desired parameters; only the latest value of each is
+    kept and one merged MSG_PARAMS packet is written at most max_rate_hz times
+    per second. Values replaced before they were sent are counted as coalesced.
+    """
+
+    def __init__(self, max_rate_hz=COMMAND_RATE_HZ):
+        self.period = 1.0 / max_rate_hz
+        self.pending = {}
+        self.pending_since = None  # when the oldest unsent update was submitted
+        self.last_sent = 0.0
+        self._wakeup = asyncio.Event()
+        self._task = None
+
+    def submit(self, **updates):
+        if not self.pending:
+            self.pending_since = time.perf_counter()
+        elif any(name in self.pending for name in updates):
+            # A previous value never reached the wire; it is superseded
+            update_state(commands_coalesced=current_state["commands_coalesced"] + 1)
+        self.pending.update(updates)
+        update_state(**updates)
+        self._wakeup.set()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+
+            # Rate limit: anything submitted while we wait is merged in
+            delay = self.last_sent + self.period - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            if not self.pending:
+                self._wakeup.clear()
+                continue
+            if not arduino_serial or arduino_serial.closed or not current_state["connected"]:
+                # Keep the update (and the wakeup) until the Arduino is back
+                await asyncio.sleep(self.period)
+                continue
+
+            updates, self.pending = self.pending, {}
+            since = self.pending_since
+            self._wakeup.clear()
+            latency.record("command_queue", time.perf_counter() - since)
+            try:
+                with latency.span("serial_write"):
+                    await arduino_serial.write(encode_params(**updates))
+                update_state(commands_sent=current_state["commands_sent"] + 1)
+            except (serial.SerialException, OSError) as e:
+                add_debug_info(f"Serial write failed: {e}")
+                # Retry next period, under anything submitted since
+                self.pending = {**updates, **self.pending}
+                self.pending_since = since
+                self._wakeup.set()
+            self.last_sent = time.monotonic()
+
+command_writer = SerialCommandWriter()
 
 def force_close_port(port_name: str) -> Dict[str, Any]:
     """Attempt to forcibly close a port that might be in use by another process"""
@@ -76,64 +292,147 @@ def force_close_port(port_name: str) -> Dict[str, Any]:
     
     return result
 
+async def open_transport(device: str):
+    """
+    Open a port with its telemetry lines routed to a store of its own, so
+    ports that lose the probe never mix their lines into the served one.
+    """
+    transport = await AsyncSerialTransport.open(device, BAUD_RATE)
+    transport.telemetry = TelemetryStore()
+    transport.line_listeners.append(transport.telemetry.parse_line)
+    return transport
+
+def use_transport(transport, port: str):
+    """Make transport the Arduino connection and serve its telemetry."""
+    global arduino_serial, telemetry
+    arduino_serial = transport
+    telemetry = transport.telemetry
+    transport.lost_listeners.append(port_lost)
+    update_state(connected=True, port=port)
+
+def port_lost(transport):
+    """Reader task saw the port go away (e.g. unplugged)."""
+    if transport is arduino_serial:
+        add_debug_info(f"Lost connection to {transport.port}")
+        update_state(connected=False, last_error=f"Port {transport.port} disconnected")
+
+async def probe_port(transport):
+    """Send the handshake commands; return the first reply or None."""
+    # Clear any startup messages
+    startup_lines = transport.drain_lines()
+    if startup_lines:
+        add_debug_info(f"Cleared startup buffer: {' | '.join(startup_lines)}")
+    
+    for cmd in PROBE_COMMANDS:
+        add_debug_info(f"Sending command: {cmd.decode().strip()}")
+        response = await transport.request(cmd, timeout=PROBE_TIMEOUT)
+        if response:
+            add_debug_info(f"Received response: {response}")
+            return response
+        add_debug_info(f"No response to {cmd.decode().strip()}")
+    return None
+
+def load_last_port() -> Optional[Dict[str, Any]]:
+    try:
+        with open(LAST_PORT_FILE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def save_last_port(device: str):
+    """Remember the device name and USB VID/PID of a port that answered."""
+    info = {"device": device, "vid": None, "pid": None}
+    for port in serial.tools.list_ports.comports():
+        if port.device == device:
+            info["vid"], info["pid"] = port.vid, port.pid
+    try:
+        with open(LAST_PORT_FILE, "w") as f:
+            json.dump(info, f)
+    except OSError as e:
+        add_debug_info(f"Could not save last port: {e}")
+
+def is_last_port(port, last) -> bool:
+    # The device name can change between plug-ins, so also match by USB ID
+    if port.device == last.get("device"):
+        return True
+    return port.vid is not None and (port.vid, port.pid) == (last.get("vid"), last.get("pid"))
+
+async def try_port(device: str, force_reset: bool = False):
+    """Open and handshake one port within PORT_DEADLINE; return a transport or None."""
+    transport = None
+    try:
+        # If the port was previously giving a permission error and force_reset is True
+        if force_reset:
+            result = force_close_port(device)
+            add_debug_info(f"Port reset attempt: {result['message']}")
+            await asyncio.sleep(1)  # Wait after reset attempt
+        
+        async def open_and_probe():
+            nonlocal transport
+            add_debug_info(f"Trying to connect to {device}...")
+            transport = await open_transport(device)
+            return await probe_port(transport)
+        
+        response = await asyncio.wait_for(open_and_probe(), PORT_DEADLINE)
+        if response:
+            add_debug_info(f"Arduino found on {device}, response: {response}")
+            return transport
+        add_debug_info(f"No valid response from {device}, closing...")
+    
+    except asyncio.TimeoutError:
+        add_debug_info(f"No handshake from {device} within {PORT_DEADLINE}s")
+    except (serial.SerialException, OSError) as e:
+        error_msg = f"Error on {device}: {str(e)}"
+        add_debug_info(error_msg)
+        if "PermissionError" in str(e) or "Access is denied" in str(e):
+            update_state(last_error=f"Permission error on {device}: {str(e)}")
+    except asyncio.CancelledError:
+        # Another port won the race
+        if transport:
+            await transport.close()
+        raise
+    
+    if transport:
+        await transport.close()
+    return None
+
+async def probe_ports_concurrently(devices, force_reset: bool = False):
+    """Probe all devices at once; return (transport, device) for the first to answer."""
+    if not devices:
+        return None, None
+    
+    tasks = {asyncio.create_task(try_port(device, force_reset)): device for device in devices}
+    pending = set(tasks)
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                transport = task.result()
+                if transport:
+                    return transport, tasks[task]
+    finally:
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+    return None, None
+
 async def find_arduino(force_reset: bool = False):
-    """Find Arduino port by trying available ports"""
+    """Find Arduino port by probing the available ports in parallel"""
     add_debug_info("Searching for Arduino...")
     ports = list(serial.tools.list_ports.comports())
     add_debug_info(f"Found {len(ports)} ports: {', '.join([p.device for p in ports])}")
     
-    for port in ports:
-        try:
-            # If the port was previously giving a permission error and force_reset is True
-            if force_reset:
-                result = force_close_port(port.device)
-                add_debug_info(f"Port reset attempt: {result['message']}")
-                await asyncio.sleep(1)  # Wait after reset attempt
-            
-            add_debug_info(f"Trying to connect to {port.device}...")
-            ser = serial.Serial(port.device, BAUD_RATE, timeout=1)
-            await asyncio.sleep(2)  # Wait for Arduino to reset
-            
-            # Clear any startup messages
-            if ser.in_waiting:
-                startup_data = ser.read(ser.in_waiting).decode('utf-8', errors='ignore')
-                add_debug_info(f"Cleared startup buffer: {startup_data.strip()}")
-            ser.reset_input_buffer()
-            
-            # Try multiple commands to check if Arduino is responsive
-            test_commands = [
-                b"STATUS:1\n",
-                b"STATUS\n",
-                b"HELLO\n"
-            ]
-            
-            found = False
-            for cmd in test_commands:
-                add_debug_info(f"Sending command: {cmd.decode().strip()}")
-                ser.write(cmd)
-                await asyncio.sleep(0.5)  # Longer wait time
-                
-                response = ""
-                if ser.in_waiting:
-                    response = ser.read(ser.in_waiting).decode('utf-8', errors='ignore')
-                    add_debug_info(f"Received response: {response.strip()}")
-                    
-                    # More lenient check - any response is better than none
-                    if response:
-                        add_debug_info(f"Arduino found on {port.device}, response: {response.strip()}")
-                        return ser, port.device
-                else:
-                    add_debug_info(f"No response to {cmd.decode().strip()}")
-            
-            add_debug_info(f"No valid response from {port.device}, closing...")
-            ser.close()
-            
-        except (serial.SerialException, OSError) as e:
-            error_msg = f"Error on {port.device}: {str(e)}"
-            add_debug_info(error_msg)
-            if "PermissionError" in str(e) or "Access is denied" in str(e):
-                current_state["last_error"] = f"Permission error on {port.device}: {str(e)}"
-            continue
+    # Try the port that worked last time on its own first: opening a port
+    # resets whatever is attached, so avoid touching the others if possible
+    last = load_last_port()
+    preferred = [p.device for p in ports if last and is_last_port(p, last)]
+    others = [p.device for p in ports if p.device not in preferred]
+    
+    for devices in (preferred, others):
+        transport, device = await probe_ports_concurrently(devices, force_reset)
+        if transport:
+            save_last_port(device)
+            return transport, device
     
     add_debug_info("Arduino not found on any port")
     return None, None
@@ -142,18 +441,19 @@ async def find_arduino(force_reset: bool = False):
 async def startup_event():
     global arduino_serial, current_state
     add_debug_info("Server starting up")
-    arduino_serial, port = await find_arduino()
-    if arduino_serial:
-        current_state["connected"] = True
-        current_state["port"] = port
+    command_writer.start()
+    transport, port = await find_arduino()
+    if transport:
+        use_transport(transport, port)
         add_debug_info(f"Arduino automatically connected on {port}")
     else:
         add_debug_info("Arduino not found during startup. Please connect manually.")
 
 @app.on_event("shutdown")
 async def shutdown_event():
+    await command_writer.stop()
     if arduino_serial:
-        arduino_serial.close()
+        await arduino_serial.close()
         add_debug_info("Arduino disconnected during shutdown")
 
 @app.get("/api/ports", response_model=List[str])
@@ -171,50 +471,25 @@ async def connect_port(port: str):
     add_debug_info(f"Attempting to connect to {port}")
     
     if arduino_serial:
-        arduino_serial.close()
-        current_state["connected"] = False
+        await arduino_serial.close()
+        arduino_serial = None
+        update_state(connected=False)
         add_debug_info("Closed previous connection")
     
     try:
         add_debug_info(f"Opening serial port {port} at {BAUD_RATE} baud")
-        arduino_serial = serial.Serial(port, BAUD_RATE, timeout=1)
-        await asyncio.sleep(2)  # Wait for Arduino to reset
-        
-        # Clear buffer and log any initial data
-        if arduino_serial.in_waiting:
-            initial_data = arduino_serial.read(arduino_serial.in_waiting).decode('utf-8', errors='ignore')
-            add_debug_info(f"Initial data from Arduino: {initial_data.strip()}")
+        transport = await open_transport(port)
         
-        arduino_serial.reset_input_buffer()
-        
-        # Try multiple commands
-        test_commands = [
-            b"STATUS:1\n",
-            b"STATUS\n",
-            b"HELLO\n"
-        ]
-        
-        for cmd in test_commands:
-            add_debug_info(f"Sending command: {cmd.decode().strip()}")
-            arduino_serial.write(cmd)
-            await asyncio.sleep(0.5)
-            
-            response = ""
-            if arduino_serial.in_waiting:
-                response = arduino_serial.read(arduino_serial.in_waiting).decode('utf-8', errors='ignore')
-                add_debug_info(f"Received response: {response.strip()}")
-                
-                # More lenient check - any response might indicate success
-                if response:
-                    current_state["connected"] = True
-                    current_state["port"] = port
-                    add_debug_info(f"Connection successful to {port}")
-                    return {"status": "connected", "port": port, "response": response.strip()}
+        response = await probe_port(transport)
+        if response:
+            use_transport(transport, port)
+            save_last_port(port)
+            add_debug_info(f"Connection successful to {port}")
+            return {"status": "connected", "port": port, "response": response}
         
         # If we get here, connection failed despite getting a port
         add_debug_info(f"Device on {port} did not respond to any command")
-        arduino_serial.close()
-        arduino_serial = None
+        await transport.close()
         return {"status": "failed", "message": "Device did not respond to any command", "debug_info": current_state["debug_info"]}
         
     except serial.SerialException as e:
@@ -227,6 +502,27 @@ async def get_status():
     """Get current robot status"""
     return current_state
 
+@app.get("/api/telemetry")
+async def get_telemetry(signals: Optional[str] = None, seconds: float = 10.0, max_points: int = 500):
+    """Recent telemetry, downsampled for plotting (signals is a comma-separated list)"""
+    names = signals.split(",") if signals else None
+    return {
+        "fields": telemetry.fields,
+        "samples": telemetry.samples,
+        "malformed": telemetry.malformed,
+        "signals": telemetry.window(names, seconds, max_points)
+    }
+
+@app.get("/api/telemetry/latest")
+async def get_latest_telemetry():
+    """Most recent value of every telemetry signal"""
+    return telemetry.latest()
+
+@app.get("/metrics")
+async def get_metrics():
+    """Latency percentiles of the command path and WebSocket push backlog"""
+    return {"stages": latency.summary(), "websocket": broadcaster.stats()}
+
 @app.post("/api/control")
 async def control_robot(params: SnakeParams):
     """Send control commands to the robot"""
@@ -235,38 +531,16 @@ async def control_robot(params: SnakeParams):
     if not arduino_serial or not current_state["connected"]:
         raise HTTPException(status_code=400, detail="Arduino not connected")
     
-    # Update parameters that were specified
-    if params.steer is not None:
-        cmd = f"STEER:{params.steer}\n".encode()
-        add_debug_info(f"Sending: {cmd.decode().strip()}")
-        arduino_serial.write(cmd)
-        current_state["steer"] = params.steer
+    # All specified parameters go out in a single binary packet
+    updates = {name: value for name, value in params.dict().items() if value is not None}
+    if updates:
+        add_debug_info(f"Sending params: {updates}")
+        command_writer.submit(**updates)
     
-    if params.amplitude is not None:
-        cmd = f"AMP:{params.amplitude}\n".encode()
-        add_debug_info(f"Sending: {cmd.decode().strip()}")
-        arduino_serial.write(cmd)
-        current_state["amplitude"] = params.amplitude
-    
-    if params.frequency is not None:
-        cmd = f"FREQ:{params.frequency}\n".encode()
-        add_debug_info(f"Sending: {cmd.decode().strip()}")
-        arduino_serial.write(cmd)
-        current_state["frequency"] = params.frequency
-    
-    if params.phase_shift is not None:
-        cmd = f"PHASE:{params.phase_shift}\n".encode()
-        add_debug_info(f"Sending: {cmd.decode().strip()}")
-        arduino_serial.write(cmd)
-        current_state["phase_shift"] = params.phase_shift
-    
-    # Read response if available
-    await asyncio.sleep(0.02)  # Brief delay for Arduino to respond
-    response = ""
-    
-    if arduino_serial.in_waiting:
-        response = arduino_serial.read(arduino_serial.in_waiting).decode('utf-8', errors='ignore')
-        add_debug_info(f"Received response: {response.strip()}")
+    # Report anything the Arduino has said since the last request
+    response = "\n".join(arduino_serial.drain_lines())
+    if response:
+        add_debug_info(f"Received response: {response}")
     
     return {
         "status": "ok",
@@ -279,6 +553,7 @@ async def websocket_endpoint(websocket: WebSocket):
     """WebSocket for real-time control and updates"""
     await websocket.accept()
     add_debug_info("WebSocket client connected")
+    await broadcaster.register(websocket)
     
     try:
         while True:
@@ -294,8 +569,7 @@ async def websocket_endpoint(websocket: WebSocket):
                     
                     # Only update if Arduino is connected
                     if arduino_serial and current_state["connected"]:
-                        arduino_serial.write(f"STEER:{steer_value}\n".encode())
-                        current_state["steer"] = steer_value
+                        updates = {"steer": steer_value}
                         
                         # Also adjust frequency based on y position
                         if "y" in params:
@@ -304,22 +578,21 @@ async def websocket_endpoint(websocket: WebSocket):
                                 # Map y from -0.5..0.5 to frequency range 0.3..1.5
                                 freq = 0.8 + y_value * 1.4
                                 freq = max(0.3, min(1.5, freq))  # Clamp to safe range
-                                arduino_serial.write(f"FREQ:{freq}\n".encode())
-                                current_state["frequency"] = freq
-                    
-                    # Send updated state back to client
-                    await websocket.send_json({
-                        "status": "ok",
-                        "state": current_state
-                    })
+                                updates["frequency"] = freq
+                        
+                        # Steering and frequency in one packet; bursts are coalesced.
+                        # The new state reaches every client through the broadcaster
+                        command_writer.submit(**updates)
                 
             except json.JSONDecodeError:
                 add_debug_info(f"Invalid JSON received: {data}")
-                await websocket.send_json({"status": "error", "message": "Invalid JSON"})
+                broadcaster.reply(websocket, {"status": "error", "message": "Invalid JSON"})
             
     except Exception as e:
         error_msg = f"WebSocket error: {e}"
         add_debug_info(error_msg)
+    finally:
+        await broadcaster.unregister(websocket)
 
 # Serve the HTML interface with updated debug display
 @app.get("/", response_class=HTMLResponse)
@@ -478,6 +751,9 @@ async def get_html():
             let connected = false;
             let joystickActive = false;
             let wsConnection = null;
+            let robotState = {};  // kept up to date by the WebSocket pushes
+            const MAX_STATUS_LINES = 20;  // same as the server's debug_info
+            let statusLines = [];
             
             // Handle WebSocket connection
             function connectWebSocket() {
@@ -498,9 +774,19 @@ async def get_html():
                 
                 wsConnection.onmessage = function(event) {
                     const data = JSON.parse(event.data);
-                    if (data.state) {
-                        updateUIFromState(data.state);
+                    if (data.type === 'snapshot') {
+                        // Full state on connect, then only changed fields
+                        robotState = data.state;
+                        setStatus([]);
+                    } else if (data.type === 'delta') {
+                        Object.assign(robotState, data.state);
+                    } else {
+                        return;
                     }
+                    if (data.debug && data.debug.length > 0) {
+                        setStatus(statusLines.concat(data.debug));
+                    }
+                    updateUIFromState(robotState);
                 };
                 
                 wsConnection.onerror = function(error) {
@@ -522,6 +808,8 @@ async def get_html():
                          '<span class="disconnected">Disconnected</span>');
                 }
                 
+                if (state.amplitude === undefined) return;
+                
                 // Only update sliders if not being dragged
                 if (!amplitudeSlider.matches(':active')) {
                     amplitudeSlider.value = state.amplitude;
@@ -538,14 +826,6 @@ async def get_html():
                     phaseValue.textContent = state.phase_shift.toFixed(1);
                 }
                 
-                // Update debug info if available
-                if (state.debug_info && state.debug_info.length > 0) {
-                    // Only update if there's new info
-                    if (statusDisplay.innerHTML.split('<br>').length - 1 < state.debug_info.length) {
-                        statusDisplay.innerHTML = state.debug_info.join('<br>');
-                        statusDisplay.scrollTop = statusDisplay.scrollHeight;
-                    }
-                }
             }
             
             // Fetch available ports
@@ -593,18 +873,10 @@ async def get_html():
                         connectionStatus.innerHTML = `Status: <span class="status">Connected to ${port}</span>`;
                         addStatus(`Connected to ${port}`);
                         
-                        // Display debug info if available
-                        if (result.debug_info) {
-                            statusDisplay.innerHTML = result.debug_info.join('<br>');
-                            statusDisplay.scrollTop = statusDisplay.scrollHeight;
-                        }
-                        
-                        // Fetch current status
-                        fetchStatus();
+                        // State and debug info arrive over the WebSocket
                     } else {
                         if (result.debug_info) {
-                            statusDisplay.innerHTML = result.debug_info.join('<br>');
-                            statusDisplay.scrollTop = statusDisplay.scrollHeight;
+                            setStatus(result.debug_info);
                         }
                         addStatus(`Connection failed: ${result.message}`);
                     }
@@ -619,7 +891,11 @@ async def get_html():
                 try {
                     const response = await fetch('/api/status');
                     const status = await response.json();
-                    updateUIFromState(status);
+                    Object.assign(robotState, status);
+                    updateUIFromState(robotState);
+                    if (status.debug_info && status.debug_info.length > 0) {
+                        setStatus(status.debug_info);
+                    }
                 } catch (error) {
                     console.error('Error fetching status:', error);
                     addStatus('Error fetching status: ' + error.message);
@@ -707,12 +983,18 @@ async def get_html():
                 }
             }
             
+            // Show the last MAX_STATUS_LINES status lines
+            function setStatus(lines) {
+                statusLines = lines.slice(-MAX_STATUS_LINES);
+                statusDisplay.innerHTML = statusLines.map(line => line + '<br>').join('');
+                statusDisplay.scrollTop = statusDisplay.scrollHeight;
+            }
+            
             // Add status message
             function addStatus(message) {
                 const now = new Date();
                 const time = now.toLocaleTimeString();
-                statusDisplay.innerHTML += `[${time}] ${message}<br>`;
-                statusDisplay.scrollTop = statusDisplay.scrollHeight;
+                setStatus(statusLines.concat([`[${time}] ${message}`]));
             }
             
             // Event listeners
@@ -720,7 +1002,7 @@ async def get_html():
             connectButton.addEventListener('click', () => connectToPort(false));
             forceConnectButton.addEventListener('click', () => connectToPort(true));
             clearLogButton.addEventListener('click', () => {
-                statusDisplay.innerHTML = 'Log cleared.<br>';
+                setStatus(['Log cleared.']);
             });
             refreshStatusButton.addEventListener('click', fetchStatus);
             
@@ -765,12 +1047,8 @@ async def get_html():
                 sendControl({ phase_shift: value });
             });
             
-            // Initial setup
+            // Initial setup (state is pushed over the WebSocket, no polling)
             fetchPorts();
-            fetchStatus();
-            
-            // Regularly fetch status to update debug info
-            setInterval(fetchStatus, 2000);
             
             // Reconnect WebSocket if it closes
             setInterval(() => {
@@ -23,11 +23,36 @@ const float pi = 3.14159265;
 unsigned long previousMillis = 0;
 float timeSeconds = 0.0;
 
+// === TELEMETRY (electronics/telemetry.py) ===
+// One TEL line every TELEMETRY_EVERY servo updates (every 20 ms)
+const int NUM_SERVOS = 5;
+const int TELEMETRY_EVERY = 4;
+Servo *servos[NUM_SERVOS] = {&servo1, &servo2, &servo3, &servo4, &servo5};
+int updatesSinceTelemetry = 0;
+unsigned long maxLoopMicros = 0;  // longest loop() since the last TEL line
+
 // === SERIAL COMMUNICATION ===
 String inputString = "";         // String to hold incoming data
 boolean stringComplete = false;  // Whether the string is complete
 const long serialBaudRate = 115200;
 
+// === BINARY PROTOCOL (electronics/snake_protocol.py) ===
+// 0xAA 0x55 | type | length | payload | crc16 (little-endian).
+// 0xAA never appears in the ASCII commands, so both can share the port.
+const uint8_t MSG_PARAMS = 0x01;
+const uint8_t MSG_STATUS_REQUEST = 0x04;
+const uint8_t PARAM_STEER = 0x01;
+const uint8_t PARAM_AMP = 0x02;
+const uint8_t PARAM_FREQ = 0x04;
+const uint8_t PARAM_PHASE = 0x08;
+const uint8_t MAX_PAYLOAD = 64;
+enum ParserState { WAIT_SYNC1, WAIT_SYNC2, READ_TYPE, READ_LENGTH, READ_PAYLOAD, READ_CRC1, READ_CRC2 };
+ParserState parserState = WAIT_SYNC1;
+uint8_t frameBuffer[2 + MAX_PAYLOAD];  // type, length, payload
+uint8_t frameLength = 0;
+uint8_t frameReceived = 0;
+uint16_t frameCrc = 0;
+
 void setup() {
   // Initialize serial communication
   Serial.begin(serialBaudRate);
@@ -51,9 +76,12 @@ void setup() {
   delay(1000);  // Wait 1 second for serial to stabilize
   Serial.println("SNAKE_READY");
   Serial.println("STATUS:READY");  // Send a simple STATUS response that the Python script can recognize
+  sendTelemetryFields();
 }
 
 void loop() {
+  unsigned long loopStart = micros();
+  
   // Parse serial commands if available
   if (stringComplete) {
     processCommand(inputString);
@@ -63,11 +91,24 @@ void loop() {
   
   // Update servo positions - ALWAYS running for smooth motion
   updateServos();
+  
+  unsigned long loopMicros = micros() - loopStart;
+  if (loopMicros > maxLoopMicros) maxLoopMicros = loopMicros;
 }
 
 void serialEvent() {
   while (Serial.available()) {
-    char inChar = (char)Serial.read();
+    uint8_t inByte = Serial.read();
+    
+    // Binary frames start with 0xAA; everything else is an ASCII command
+    if (parserState != WAIT_SYNC1 || inByte == 0xAA) {
+      if (parseFrameByte(inByte)) {
+        processFrame();
+      }
+      continue;
+    }
+    
+    char inChar = (char)inByte;
     
     // Add character to input buffer
     if (inChar != '\n') {
@@ -80,6 +121,82 @@ void serialEvent() {
   }
 }
 
+uint16_t crc16(const uint8_t *data, uint8_t length) {
+  // CRC-16/CCITT-FALSE (same as crc16() in snake_protocol.py)
+  uint16_t crc = 0xFFFF;
+  for (uint8_t i = 0; i < length; i++) {
+    crc ^= (uint16_t)data[i] << 8;
+    for (uint8_t bit = 0; bit < 8; bit++) {
+      crc = (crc & 0x8000) ? (uint16_t)((crc << 1) ^ 0x1021) : (uint16_t)(crc << 1);
+    }
+  }
+  return crc;
+}
+
+// Feed one byte to the frame parser; returns true when a valid frame is complete
+bool parseFrameByte(uint8_t b) {
+  switch (parserState) {
+    case WAIT_SYNC1:
+      if (b == 0xAA) parserState = WAIT_SYNC2;
+      break;
+
+    case WAIT_SYNC2:
+      parserState = (b == 0x55) ? READ_TYPE : WAIT_SYNC1;
+      break;
+
+    case READ_TYPE:
+      frameBuffer[0] = b;
+      parserState = READ_LENGTH;
+      break;
+
+    case READ_LENGTH:
+      frameBuffer[1] = b;
+      frameLength = b;
+      frameReceived = 0;
+      if (b > MAX_PAYLOAD) parserState = WAIT_SYNC1;  // Not a real frame, resync
+      else parserState = (b == 0) ? READ_CRC1 : READ_PAYLOAD;
+      break;
+
+    case READ_PAYLOAD:
+      frameBuffer[2 + frameReceived++] = b;
+      if (frameReceived == frameLength) parserState = READ_CRC1;
+      break;
+
+    case READ_CRC1:
+      frameCrc = b;
+      parserState = READ_CRC2;
+      break;
+
+    case READ_CRC2:
+      frameCrc |= (uint16_t)b << 8;
+      parserState = WAIT_SYNC1;
+      if (frameCrc == crc16(frameBuffer, 2 + frameLength)) return true;
+      Serial.println("CRC_ERROR");
+      break;
+  }
+  return false;
+}
+
+void processFrame() {
+  uint8_t type = frameBuffer[0];
+  const uint8_t *payload = frameBuffer + 2;
+  
+  if (type == MSG_PARAMS && frameLength == 17) {
+    // All parameters in one packet: flags byte, then four float32 values
+    uint8_t flags = payload[0];
+    float values[4];
+    memcpy(values, payload + 1, sizeof(values));
+    
+    if (flags & PARAM_STEER) steeringAngle = values[0];
+    if (flags & PARAM_AMP) amplitude = values[1];
+    if (flags & PARAM_FREQ) frequency = values[2];
+    if (flags & PARAM_PHASE) phaseShiftDeg = values[3];
+  }
+  else if (type == MSG_STATUS_REQUEST) {
+    sendStatus();
+  }
+}
+
 void processCommand(String command) {
   // Debug echo - always respond to any command
   Serial.print("RECEIVED:");
@@ -141,6 +258,30 @@ void sendStatus() {
   statusMsg += "}";
   
   Serial.println(statusMsg);
+  sendTelemetryFields();
+}
+
+void sendTelemetryFields() {
+  // Column names for the TEL lines below
+  Serial.println("TEL_FIELDS:t_ms,loop_us,cmd1,cmd2,cmd3,cmd4,cmd5,act1,act2,act3,act4,act5");
+}
+
+void sendTelemetry(const float *commanded) {
+  // Commanded angles are before the safety limits, actual is what the servo was given
+  Serial.print("TEL:");
+  Serial.print(millis());
+  Serial.print(',');
+  Serial.print(maxLoopMicros);
+  for (int i = 0; i < NUM_SERVOS; i++) {
+    Serial.print(',');
+    Serial.print(commanded[i], 1);
+  }
+  for (int i = 0; i < NUM_SERVOS; i++) {
+    Serial.print(',');
+    Serial.print(servos[i]->read());
+  }
+  Serial.println();
+  maxLoopMicros = 0;
 }
 
 void updateServos() {
@@ -165,6 +306,7 @@ void updateServos() {
     float angle3 = centerPos + amplitude * sin(omega * timeSeconds + phaseShiftRad);
     float angle4 = centerPos + amplitude * sin(omega * timeSeconds + 2 * phaseShiftRad);
     float angle5 = centerPos + amplitude * sin(omega * timeSeconds + 3 * phaseShiftRad);
+    float commanded[NUM_SERVOS] = {angle1, angle2, angle3, angle4, angle5};
     
     // Safety limits
     angle1 = constrain(angle1, centerPos - 30, centerPos + 30);
@@ -179,5 +321,10 @@ void updateServos() {
     servo3.write(angle3);
     servo4.write(angle4);
     servo5.write(angle5);
+    
+    if (++updatesSinceTelemetry >= TELEMETRY_EVERY) {
+      updatesSinceTelemetry = 0;
+      sendTelemetry(commanded);
+    }
   }
 }
\ No newline at end of file
@@ -8,10 +8,10 @@ Servo servo3;
 Servo servo4;
 Servo servo5;  // New rudder servo
 
-// === USER-TUNABLE PARAMETERS ===
-const float amplitude = 15.0;        // Degrees (0-90 is safe range for most servos)
-const float frequency = 0.8;         // Hz (cycles per second)
-const float phaseShiftDeg = 60.0;    // Degrees phase shift between servos
+// === USER-TUNABLE PARAMETERS (defaults, can be updated over serial) ===
+float amplitude = 15.0;              // Degrees (0-90 is safe range for most servos)
+float frequency = 0.8;               // Hz (cycles per second)
+float phaseShiftDeg = 60.0;          // Degrees phase shift between servos
 
 // === INTERNAL SETTINGS ===
 const float centerPos = 90.0;        // Center position (neutral angle)
@@ -27,9 +27,37 @@ bool useSerialControl = false;
 int servo4Target = 90;  // Default position for servo4 when using serial
 int rudderPosition = 90; // Default center position for rudder (servo5)
 
+// ASCII command buffer (S90, R90, W)
+String inputString = "";
+
+// === TELEMETRY (telemetry.py) ===
+// At 9600 baud a TEL line takes ~50 ms to send, so only report every 10th update
+const int TELEMETRY_EVERY = 10;
+int updatesSinceTelemetry = 0;
+unsigned long maxLoopMicros = 0;  // longest loop() since the last TEL line
+
+// === BINARY PROTOCOL (snake_protocol.py) ===
+// 0xAA 0x55 | type | length | payload | crc16 (little-endian).
+// 0xAA never appears in the ASCII commands, so both can share the port.
+const uint8_t MSG_PARAMS = 0x01;
+const uint8_t MSG_SET_SERVO = 0x02;
+const uint8_t MSG_WAVE_MODE = 0x03;
+const uint8_t PARAM_STEER = 0x01;
+const uint8_t PARAM_AMP = 0x02;
+const uint8_t PARAM_FREQ = 0x04;
+const uint8_t PARAM_PHASE = 0x08;
+const uint8_t MAX_PAYLOAD = 64;
+enum ParserState { WAIT_SYNC1, WAIT_SYNC2, READ_TYPE, READ_LENGTH, READ_PAYLOAD, READ_CRC1, READ_CRC2 };
+ParserState parserState = WAIT_SYNC1;
+uint8_t frameBuffer[2 + MAX_PAYLOAD];  // type, length, payload
+uint8_t frameLength = 0;
+uint8_t frameReceived = 0;
+uint16_t frameCrc = 0;
+
 void setup() {
   // Initialize serial communication
   Serial.begin(9600);
+  inputString.reserve(32);
   
   // Attach servos to pins
   servo1.attach(3);
@@ -40,48 +68,183 @@ void setup() {
   
   // Initialize rudder to center position
   servo5.write(rudderPosition);
+
+  sendTelemetryFields();
 }
 
-void loop() {
-  // Check for serial commands
-  if (Serial.available() > 0) {
-    String input = Serial.readStringUntil('\n');
+uint16_t crc16(const uint8_t *data, uint8_t length) {
+  // CRC-16/CCITT-FALSE (same as crc16() in snake_protocol.py)
+  uint16_t crc = 0xFFFF;
+  for (uint8_t i = 0; i < length; i++) {
+    crc ^= (uint16_t)data[i] << 8;
+    for (uint8_t bit = 0; bit < 8; bit++) {
+      crc = (crc & 0x8000) ? (uint16_t)((crc << 1) ^ 0x1021) : (uint16_t)(crc << 1);
+    }
+  }
+  return crc;
+}
+
+// Feed one byte to the frame parser; returns true when a valid frame is complete
+bool parseFrameByte(uint8_t b) {
+  switch (parserState) {
+    case WAIT_SYNC1:
+      if (b == 0xAA) parserState = WAIT_SYNC2;
+      break;
+
+    case WAIT_SYNC2:
+      parserState = (b == 0x55) ? READ_TYPE : WAIT_SYNC1;
+      break;
+
+    case READ_TYPE:
+      frameBuffer[0] = b;
+      parserState = READ_LENGTH;
+      break;
+
+    case READ_LENGTH:
+      frameBuffer[1] = b;
+      frameLength = b;
+      frameReceived = 0;
+      if (b > MAX_PAYLOAD) parserState = WAIT_SYNC1;  // Not a real frame, resync
+      else parserState = (b == 0) ? READ_CRC1 : READ_PAYLOAD;
+      break;
+
+    case READ_PAYLOAD:
+      frameBuffer[2 + frameReceived++] = b;
+      if (frameReceived == frameLength) parserState = READ_CRC1;
+      break;
+
+    case READ_CRC1:
+      frameCrc = b;
+      parserState = READ_CRC2;
+      break;
+
+    case READ_CRC2:
+      frameCrc |= (uint16_t)b << 8;
+      parserState = WAIT_SYNC1;
+      if (frameCrc == crc16(frameBuffer, 2 + frameLength)) return true;
+      Serial.println("CRC_ERROR");
+      break;
+  }
+  return false;
+}
+
+void setServo4(int angle) {
+  // Manual servo4 control; switches servo4 out of the wave pattern
+  servo4Target = constrain(angle, 0, 180);
+  useSerialControl = true;
+}
+
+void setRudder(int angle) {
+  rudderPosition = constrain(angle, 0, 180);
+  servo5.write(rudderPosition);
+}
+
+void processFrame() {
+  uint8_t type = frameBuffer[0];
+  const uint8_t *payload = frameBuffer + 2;
+
+  if (type == MSG_PARAMS && frameLength == 17) {
+    // All wave parameters in one packet: flags byte, then four float32 values
+    uint8_t flags = payload[0];
+    float values[4];
+    memcpy(values, payload + 1, sizeof(values));
+
+    if (flags & PARAM_STEER) setRudder((int)(centerPos + values[0]));
+    if (flags & PARAM_AMP) amplitude = values[1];
+    if (flags & PARAM_FREQ) frequency = values[2];
+    if (flags & PARAM_PHASE) phaseShiftDeg = values[3];
+  }
+  else if (type == MSG_SET_SERVO && frameLength == 2) {
+    if (payload[0] == 4) setServo4(payload[1]);
+    else if (payload[0] == 5) setRudder(payload[1]);
+  }
+  else if (type == MSG_WAVE_MODE) {
+    useSerialControl = false;
+  }
+}
+
+void processAsciiCommand(String input) {
+  // Parse the command
+  if (input.startsWith("S")) {
+    // Manual servo4 control (S90 sets to 90 degrees)
+    setServo4(input.substring(1).toInt());
+    
+    // Acknowledge receipt
+    Serial.print("Servo4 set to: ");
+    Serial.println(servo4Target);
+  } 
+  else if (input.startsWith("R")) {
+    // Rudder control (R90 sets rudder to 90 degrees - center position)
+    setRudder(input.substring(1).toInt());
     
-    // Parse the command
-    if (input.startsWith("S")) {
-      // Manual servo4 control (S90 sets to 90 degrees)
-      servo4Target = input.substring(1).toInt();
-      
-      // Constrain to valid range
-      servo4Target = constrain(servo4Target, 0, 180);
-      
-      // Switch to serial control mode
-      useSerialControl = true;
-      
-      // Acknowledge receipt
-      Serial.print("Servo4 set to: ");
-      Serial.println(servo4Target);
-    } 
-    else if (input.startsWith("R")) {
-      // Rudder control (R90 sets rudder to 90 degrees - center position)
-      rudderPosition = input.substring(1).toInt();
-      
-      // Constrain to valid range
-      rudderPosition = constrain(rudderPosition, 0, 180);
-      
-      // Set the rudder position
-      servo5.write(rudderPosition);
-      
-      // Acknowledge receipt
-      Serial.print("Rudder set to: ");
-      Serial.println(rudderPosition);
+    // Acknowledge receipt
+    Serial.print("Rudder set to: ");
+    Serial.println(rudderPosition);
+  }
+  else if (input.startsWith("W")) {
+    // Switch back to wave mode
+    useSerialControl = false;
+    Serial.println("Wave mode activated");
+  }
+}
+
+void readSerialCommands() {
+  // Byte-at-a-time so the wave update never blocks waiting for a newline
+  while (Serial.available() > 0) {
+    uint8_t inByte = Serial.read();
+
+    // Binary frames start with 0xAA; everything else is an ASCII command
+    if (parserState != WAIT_SYNC1 || inByte == 0xAA) {
+      if (parseFrameByte(inByte)) processFrame();
+      continue;
     }
-    else if (input.startsWith("W")) {
-      // Switch back to wave mode
-      useSerialControl = false;
-      Serial.println("Wave mode activated");
+
+    if (inByte == '\n') {
+      processAsciiCommand(inputString);
+      inputString = "";
+    } else {
+      inputString += (char)inByte;
     }
   }
+}
+
+void sendTelemetryFields() {
+  // Column names for the TEL lines below
+  Serial.println("TEL_FIELDS:t_ms,loop_us,cmd1,cmd2,cmd3,cmd4,act1,act2,act3,act4,rudder");
+}
+
+void sendTelemetry(float cmd1, float cmd2, float cmd3, float cmd4) {
+  // Commanded angles from the wave, actual is what each servo was given
+  Serial.print("TEL:");
+  Serial.print(millis());
+  Serial.print(',');
+  Serial.print(maxLoopMicros);
+  Serial.print(',');
+  Serial.print(cmd1, 1);
+  Serial.print(',');
+  Serial.print(cmd2, 1);
+  Serial.print(',');
+  Serial.print(cmd3, 1);
+  Serial.print(',');
+  Serial.print(cmd4, 1);
+  Serial.print(',');
+  Serial.print(servo1.read());
+  Serial.print(',');
+  Serial.print(servo2.read());
+  Serial.print(',');
+  Serial.print(servo3.read());
+  Serial.print(',');
+  Serial.print(servo4.read());
+  Serial.print(',');
+  Serial.println(rudderPosition);
+  maxLoopMicros = 0;
+}
+
+void loop() {
+  unsigned long loopStart = micros();
+
+  // Check for serial commands
+  readSerialCommands();
 
   unsigned long currentMillis = millis();
 
@@ -117,5 +280,13 @@ void loop() {
     servo4.write((int)angle4);
     
     // Note: We don't need to set servo5 here as it's set when a command is received
+
+    if (++updatesSinceTelemetry >= TELEMETRY_EVERY) {
+      updatesSinceTelemetry = 0;
+      sendTelemetry(angle1, angle2, angle3, angle4);
+    }
   }
+
+  unsigned long loopMicros = micros() - loopStart;
+  if (loopMicros > maxLoopMicros) maxLoopMicros = loopMicros;
 }
\ No newline at end of file
@@ -1,11 +1,14 @@
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import ttk, messagebox, filedialog
 import serial
 import time
 import math
 import threading
 import json
 
+from snake_protocol import encode_params, encode_set_servo, encode_wave_mode
+from telemetry import TelemetryStore
+
 class RobotControlGUI:
     def __init__(self, root):
         self.root = root
@@ -18,6 +21,9 @@ class RobotControlGUI:
         self.connected = False
         self.lock = threading.Lock()
         
+        # Servo angles and loop timing streamed by the Arduino (TEL lines)
+        self.telemetry = TelemetryStore()
+        
         # Default servo parameters
         self.amplitude = 15.0
         self.frequency = 0.8
@@ -55,6 +61,11 @@ class RobotControlGUI:
         self.status_var = tk.StringVar(value="Disconnected")
         ttk.Label(conn_frame, text="Status:").grid(row=0, column=3, padx=5, pady=5)
         ttk.Label(conn_frame, textvariable=self.status_var).grid(row=0, column=4, padx=5, pady=5)
+        
+        # Arduino loop timing from telemetry
+        self.loop_time_var = tk.StringVar(value="-")
+        ttk.Label(conn_frame, text="Loop:").grid(row=0, column=5, padx=5, pady=5)
+        ttk.Label(conn_frame, textvariable=self.loop_time_var).grid(row=0, column=6, padx=5, pady=5)
     
     def create_wave_parameters_frame(self):
         # Frame for wave motion parameters
@@ -80,7 +91,7 @@ class RobotControlGUI:
         # Phase shift control
         ttk.Label(wave_frame, text="Phase Shift:").grid(row=2, column=0, padx=5, pady=5)
         self.phase_shift_var = tk.DoubleVar(value=self.phase_shift)
-        phase_shift_scale = ttk.Scale(wave_frame, from_=0, to=180, variable=self.phase_shift_var, 
+        phase_shift_scale = ttk.Scale(wave_frame, from_=0, to=360, variable=self.phase_shift_var, 
                                      orient="horizontal", length=200)
         phase_shift_scale.grid(row=2, column=1, padx=5, pady=5)
         ttk.Label(wave_frame, textvariable=self.phase_shift_var).grid(row=2, column=2, padx=5, pady=5)
@@ -90,6 +101,9 @@ class RobotControlGUI:
                                            command=self.apply_wave_settings)
         self.apply_wave_button.grid(row=3, column=1, padx=5, pady=10)
         
+        # Load a gait exported by Andres_code/gait_optimizer.py
+        ttk.Button(wave_frame, text="Load Gait...", command=self.load_gait_file).grid(row=3, column=2, padx=5, pady=10)
+        
         # Servo4 override controls
         servo4_frame = ttk.LabelFrame(wave_frame, text="Servo 4 Override")
         servo4_frame.grid(row=4, column=0, columnspan=3, padx=5, pady=5, sticky="ew")
@@ -236,7 +250,8 @@ class RobotControlGUI:
                 with self.lock:
                     if self.ser and self.ser.in_waiting:
                         line = self.ser.readline().decode('utf-8').strip()
-                        if line:
+                        # Telemetry goes to the ring buffers, everything else is printed
+                        if line and not self.telemetry.parse_line(line):
                             print(f"Arduino: {line}")
             except Exception as e:
                 print(f"Serial read error: {e}")
@@ -246,6 +261,10 @@ class RobotControlGUI:
         # Update servo position visualization
         self.update_servo_visualization()
         
+        latest = self.telemetry.latest()
+        if "loop_us" in latest:
+            self.loop_time_var.set(f"{latest['loop_us']:.0f} us")
+        
         # Schedule the next update
         self.root.after(100, self.update_ui)
     
@@ -311,6 +330,32 @@ class RobotControlGUI:
         
         self.send_command(command)
     
+    def load_gait_file(self):
+        path = filedialog.askopenfilename(title="Load gait", filetypes=[("Gait files", "*.json"), ("All files", "*.*")])
+        if not path:
+            return
+        try:
+            with open(path) as f:
+                gait = json.load(f)
+            amplitude = round(float(gait["amplitude"]), 2)
+            frequency = round(float(gait["frequency"]), 2)
+            phase_shift = round(float(gait["phase_shift"]), 2)
+            # phase_shift is already in arduino.ino's sign convention (gait_optimizer.py)
+            joint_factors = [float(v) for v in gait.get("gait", {}).get("joint_factors", [])]
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            messagebox.showerror("Load Gait", f"Could not read {path}: {e}")
+            return
+        
+        if any(abs(v - 1.0) > 1e-6 for v in joint_factors):
+            messagebox.showwarning("Load Gait", "arduino.ino has no per-joint factors; "
+                                   f"ignoring {[round(v, 2) for v in joint_factors]}")
+        
+        self.amplitude_var.set(amplitude)
+        self.frequency_var.set(frequency)
+        self.phase_shift_var.set(phase_shift)
+        if self.connected:
+            self.apply_wave_settings()
+    
     def toggle_servo4_mode(self):
         if not self.connected:
             messagebox.showwarning("Not Connected", "Connect to Arduino first")
@@ -426,26 +471,22 @@ class RobotControlGUI:
                 cmd_type = command["command"]
                 
                 if cmd_type == "wave":
-                    # Currently not implemented in Arduino code
-                    # Would require updating Arduino code to accept these parameters
-                    # For now, just print to console
-                    print(f"Wave settings: A={command['amplitude']}, F={command['frequency']}, P={command['phase_shift']}")
+                    # All wave parameters in one binary packet
+                    self.ser.write(encode_params(amplitude=command["amplitude"],
+                                                 frequency=command["frequency"],
+                                                 phase_shift=command["phase_shift"]))
                 
                 elif cmd_type == "S":
                     # Servo4 position
-                    angle = command["angle"]
-                    cmd_str = f"S{angle}\n"
-                    self.ser.write(cmd_str.encode())
+                    self.ser.write(encode_set_servo(4, command["angle"]))
                 
                 elif cmd_type == "R":
                     # Rudder position
-                    angle = command["angle"]
-                    cmd_str = f"R{angle}\n"
-                    self.ser.write(cmd_str.encode())
+                    self.ser.write(encode_set_servo(5, command["angle"]))
                 
                 elif cmd_type == "W":
                     # Switch to wave mode
-                    self.ser.write(b"W\n")
+                    self.ser.write(encode_wave_mode())
                 
         except Exception as e:
             print(f"Error sending command: {e}")
@@ -0,0 +1,202 @@
+#include <Servo.h>
+
+// Plays back joint-angle frames streamed by gait_stream.py at a fixed rate.
+// The host does all the gait math, so any waveform can be used without
+// reflashing. Frames use the binary protocol from snake_protocol.py:
+//   0xAA 0x55 | type | length | payload | crc16 (little-endian)
+// with a MSG_GAIT_FRAME payload of seq uint16 | numJoints uint8 | int16 centidegrees,
+// or a MSG_GAIT_PULSES payload of seq uint16 | numJoints uint8 | uint16 microseconds
+// (gait_stream.py --calibration: the host applies the per-servo calibration)
+
+// --- SERVOS ---
+const int NUM_SERVOS = 6;
+const int servoPins[NUM_SERVOS] = {5, 6, 9, 10, 11, 3};
+Servo servos[NUM_SERVOS];
+
+// === SETTINGS ===
+const long serialBaudRate = 115200;
+const float centerPos = 90.0;                // neutral servo angle
+const unsigned long playbackPeriodMs = 20;   // one frame per 20 ms (gait_stream.py PLAYBACK_RATE_HZ)
+const int BUFFER_FRAMES = 16;                // lookahead buffer size
+const int PREFILL_FRAMES = 4;                // frames buffered before playback starts
+const int ACK_EVERY = 5;                     // report playback position every N frames
+
+// === FRAME BUFFER (ring) ===
+int16_t bufferAngles[BUFFER_FRAMES][NUM_SERVOS];   // centidegrees, or microseconds if bufferPulses
+bool bufferPulses[BUFFER_FRAMES];
+uint8_t bufferJoints[BUFFER_FRAMES];
+uint16_t bufferSeq[BUFFER_FRAMES];
+uint8_t bufferHead = 0;    // next frame to play
+uint8_t bufferCount = 0;
+bool playing = false;
+
+// === BINARY PROTOCOL (snake_protocol.py) ===
+const uint8_t MSG_GAIT_FRAME = 0x10;
+const uint8_t MSG_GAIT_PULSES = 0x11;
+const uint8_t MAX_PAYLOAD = 64;
+enum ParserState { WAIT_SYNC1, WAIT_SYNC2, READ_TYPE, READ_LENGTH, READ_PAYLOAD, READ_CRC1, READ_CRC2 };
+ParserState parserState = WAIT_SYNC1;
+uint8_t frameBuffer[2 + MAX_PAYLOAD];  // type, length, payload
+uint8_t frameLength = 0;
+uint8_t frameReceived = 0;
+uint16_t frameCrc = 0;
+
+// === TIMING / STATS ===
+unsigned long previousMillis = 0;
+uint16_t expectedSeq = 0;
+bool haveSeq = false;
+uint8_t playedSinceAck = 0;
+
+uint16_t crc16(const uint8_t *data, uint8_t length) {
+  // CRC-16/CCITT-FALSE (same as crc16() in snake_protocol.py)
+  uint16_t crc = 0xFFFF;
+  for (uint8_t i = 0; i < length; i++) {
+    crc ^= (uint16_t)data[i] << 8;
+    for (uint8_t bit = 0; bit < 8; bit++) {
+      crc = (crc & 0x8000) ? (uint16_t)((crc << 1) ^ 0x1021) : (uint16_t)(crc << 1);
+    }
+  }
+  return crc;
+}
+
+void setup() {
+  Serial.begin(serialBaudRate);
+
+  for (int i = 0; i < NUM_SERVOS; i++) {
+    servos[i].attach(servoPins[i]);
+    servos[i].write((int)centerPos);
+  }
+
+  Serial.println("STREAM_READY");
+}
+
+void storeFrame(const uint8_t *payload, uint8_t length, bool pulses) {
+  uint16_t seq = payload[0] | (payload[1] << 8);
+  uint8_t numJoints = payload[2];
+  if (numJoints == 0 || numJoints > NUM_SERVOS || length != 3 + 2 * numJoints) return;
+
+  // Sequence numbers let us detect frames lost on the wire
+  if (haveSeq && seq != expectedSeq) {
+    Serial.print("GAP:");
+    Serial.println(expectedSeq);
+  }
+  expectedSeq = seq + 1;
+  haveSeq = true;
+
+  if (bufferCount >= BUFFER_FRAMES) {
+    // Host ran too far ahead; drop the frame rather than stall playback
+    Serial.print("FULL:");
+    Serial.println(seq);
+    return;
+  }
+
+  uint8_t slot = (bufferHead + bufferCount) % BUFFER_FRAMES;
+  for (uint8_t i = 0; i < numJoints; i++) {
+    bufferAngles[slot][i] = (int16_t)(payload[3 + 2 * i] | (payload[4 + 2 * i] << 8));
+  }
+  bufferJoints[slot] = numJoints;
+  bufferPulses[slot] = pulses;
+  bufferSeq[slot] = seq;
+  bufferCount++;
+}
+
+// Feed one byte to the frame parser; returns true when a valid frame is complete
+bool parseFrameByte(uint8_t b) {
+  switch (parserState) {
+    case WAIT_SYNC1:
+      if (b == 0xAA) parserState = WAIT_SYNC2;
+      break;
+
+    case WAIT_SYNC2:
+      parserState = (b == 0x55) ? READ_TYPE : WAIT_SYNC1;
+      break;
+
+    case READ_TYPE:
+      frameBuffer[0] = b;
+      parserState = READ_LENGTH;
+      break;
+
+    case READ_LENGTH:
+      frameBuffer[1] = b;
+      frameLength = b;
+      frameReceived = 0;
+      if (b > MAX_PAYLOAD) parserState = WAIT_SYNC1;  // Not a real frame, resync
+      else parserState = (b == 0) ? READ_CRC1 : READ_PAYLOAD;
+      break;
+
+    case READ_PAYLOAD:
+      frameBuffer[2 + frameReceived++] = b;
+      if (frameReceived == frameLength) parserState = READ_CRC1;
+      break;
+
+    case READ_CRC1:
+      frameCrc = b;
+      parserState = READ_CRC2;
+      break;
+
+    case READ_CRC2:
+      frameCrc |= (uint16_t)b << 8;
+      parserState = WAIT_SYNC1;
+      if (frameCrc == crc16(frameBuffer, 2 + frameLength)) return true;
+      Serial.println("CRC_ERROR");
+      break;
+  }
+  return false;
+}
+
+void readSerialFrames() {
+  while (Serial.available()) {
+    if (!parseFrameByte(Serial.read())) continue;
+    if (frameBuffer[0] == MSG_GAIT_FRAME || frameBuffer[0] == MSG_GAIT_PULSES) {
+      storeFrame(frameBuffer + 2, frameLength, frameBuffer[0] == MSG_GAIT_PULSES);
+    }
+  }
+}
+
+void playFrame() {
+  uint8_t slot = bufferHead;
+  for (uint8_t i = 0; i < bufferJoints[slot]; i++) {
+    if (bufferPulses[slot]) {
+      // Already calibrated on the host: no per-servo math here
+      servos[i].writeMicroseconds((uint16_t)bufferAngles[slot][i]);
+    } else {
+      float angle = centerPos + bufferAngles[slot][i] / 100.0;
+      servos[i].write(constrain((int)(angle + 0.5), 0, 180));
+    }
+  }
+
+  bufferHead = (bufferHead + 1) % BUFFER_FRAMES;
+  bufferCount--;
+
+  // Tell the host how far playback has got so it can keep the buffer topped up
+  if (++playedSinceAck >= ACK_EVERY) {
+    playedSinceAck = 0;
+    Serial.print("PLAY:");
+    Serial.println(bufferSeq[slot]);
+  }
+}
+
+void loop() {
+  readSerialFrames();
+
+  unsigned long currentMillis = millis();
+  if (currentMillis - previousMillis < playbackPeriodMs) return;
+
+  // Fixed-rate schedule; resync if we fell far behind
+  previousMillis += playbackPeriodMs;
+  if (currentMillis - previousMillis > 5 * playbackPeriodMs) previousMillis = currentMillis;
+
+  if (!playing) {
+    if (bufferCount < PREFILL_FRAMES) return;
+    playing = true;
+  }
+
+  if (bufferCount == 0) {
+    // Underrun: hold the last pose and wait for the buffer to refill
+    playing = false;
+    Serial.println("UNDERRUN");
+    return;
+  }
+
+  playFrame();
+}
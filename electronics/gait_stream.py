@@ -0,0 +1,192 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import serial
+
+from servo_calibration import DEFAULT_FILE as DEFAULT_CALIBRATION, PULSE_LIMITS_US, ServoCalibration
+from snake_protocol import FrameDecoder, encode_gait_frame, encode_gait_pulse_frame
+
+# The gait model lives with the visualizers in Andres_code/
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Andres_code"))
+from gait import angles_at_phase
+
+# Must match gait_stream.ino
+BAUD_RATE = 115200
+MAX_JOINTS = 6
+PLAYBACK_RATE_HZ = 50.0  # the sketch plays one frame per playbackPeriodMs = 20 ms
+
+DEFAULT_LOOKAHEAD = 8  # frames the host may run ahead of playback (sketch buffers 16)
+
+
+def encode_angles(angles):
+    """Pack joint angles (deg from center) as little-endian int16 centidegrees."""
+    centidegrees = np.clip(np.round(np.asarray(angles, dtype=float) * 100), -32768, 32767)
+    return centidegrees.astype("<i2").tobytes()
+
+
+def encode_pulses(pulses):
+    """Pack pulse widths (us) as little-endian uint16, within what the Servo library accepts."""
+    clipped = np.clip(np.round(np.asarray(pulses, dtype=float)), *PULSE_LIMITS_US)
+    return clipped.astype("<u2").tobytes()
+
+
+def waveform_from_gait(amplitude, frequency, phase_shift, joint_factors, direction=1,
+                       rate_hz=PLAYBACK_RATE_HZ):
+    """
+    Sample one cycle of the sinusoidal gait model at the playback rate.
+
+    The cycle is quantized to a whole number of frames so it loops seamlessly;
+    the played frequency is rate_hz / num_frames.
+    """
+    if frequency <= 0:
+        raise ValueError(f"Gait frequency must be positive, got {frequency}")
+    num_frames = max(1, int(round(rate_hz / frequency)))
+    cycle_fractions = np.arange(num_frames) / num_frames
+    return angles_at_phase(cycle_fractions, amplitude, phase_shift, joint_factors, direction)
+
+
+class GaitStreamer:
+    """
+    Stream a precomputed (T, N) joint-angle waveform to gait_stream.ino.
+
+    Frames are sent at the playback rate and never more than `lookahead`
+    frames ahead of what the sketch reports as played, so the per-tick serial
+    bandwidth stays bounded. The waveform loops until stopped.
+
+    With a ServoCalibration the whole waveform is converted to calibrated
+    pulse widths up front and sent as MSG_GAIT_PULSES frames, which the
+    sketch writes straight to the servos.
+    """
+
+    def __init__(self, ser, waveform, rate_hz=PLAYBACK_RATE_HZ, lookahead=DEFAULT_LOOKAHEAD,
+                 calibration=None):
+        waveform = np.atleast_2d(np.asarray(waveform, dtype=float))
+        if waveform.shape[1] > MAX_JOINTS:
+            raise ValueError(f"At most {MAX_JOINTS} joints supported, got {waveform.shape[1]}")
+
+        self.ser = ser
+        self.rate_hz = rate_hz
+        self.lookahead = lookahead
+        self.num_joints = waveform.shape[1]
+
+        # Angles never change while streaming, so convert and pack them once up front
+        if calibration is None:
+            self.payloads = [encode_angles(row) for row in waveform]
+            self.encode_frame = encode_gait_frame
+        else:
+            self.payloads = [encode_pulses(row) for row in calibration.to_pulse(waveform)]
+            self.encode_frame = encode_gait_pulse_frame
+
+        self.frames_sent = 0        # unwrapped sequence number of the next frame
+        self.frames_played = None   # last unwrapped seq reported by the sketch
+        self.gaps = 0
+        self.overflows = 0
+        self.decoder = FrameDecoder()
+
+    def _unwrap(self, seq):
+        # Feedback carries 16-bit sequence numbers; map them back near frames_sent
+        return self.frames_sent - ((self.frames_sent - seq) & 0xFFFF)
+
+    def poll_feedback(self):
+        """Read PLAY/GAP/FULL lines the sketch prints, without blocking."""
+        if not self.ser.in_waiting:
+            return
+
+        self.decoder.feed(self.ser.read(self.ser.in_waiting))
+
+        for line in self.decoder.take_lines():
+            key, _, value = line.partition(":")
+            if key == "PLAY" and value.isdigit():
+                self.frames_played = self._unwrap(int(value))
+            elif key == "GAP":
+                self.gaps += 1
+            elif key == "FULL":
+                self.overflows += 1
+            elif line:
+                print(f"Arduino: {line}")
+
+    def send_next_frame(self):
+        index = self.frames_sent % len(self.payloads)
+        frame = self.encode_frame(self.frames_sent, self.payloads[index], self.num_joints)
+        self.ser.write(frame)
+        self.frames_sent += 1
+
+    def run(self, duration=None):
+        """Stream until duration (seconds) elapses or Ctrl+C."""
+        period = 1.0 / self.rate_hz
+        start = time.monotonic()
+
+        while duration is None or time.monotonic() - start < duration:
+            self.poll_feedback()
+
+            # Playback clock: the sketch consumes one frame per period, so the
+            # host may have sent at most `lookahead` frames beyond that
+            allowed = self.lookahead + int((time.monotonic() - start) / period)
+            if self.frames_played is not None:
+                allowed = min(allowed, self.frames_played + 1 + self.lookahead)
+
+            if self.frames_sent < allowed:
+                self.send_next_frame()
+            else:
+                time.sleep(period / 4)
+
+
+def positive_float(text):
+    value = float(text)
+    if value <= 0:
+        raise argparse.ArgumentTypeError(f"must be positive, got {text}")
+    return value
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream joint-angle waveforms to gait_stream.ino")
+    parser.add_argument("--port", default="COM3")
+    parser.add_argument("--lookahead", type=int, default=DEFAULT_LOOKAHEAD)
+    parser.add_argument("--duration", type=float, default=None, help="seconds to stream")
+    parser.add_argument("--waveform", help=".npy or .csv file with a (T, N) angle table in degrees")
+    parser.add_argument("--amplitude", type=float, default=18.0)
+    parser.add_argument("--frequency", type=positive_float, default=2.0)
+    parser.add_argument("--phase-shift", type=float, default=45.0)
+    parser.add_argument("--joint-factors", type=float, nargs="+", default=[0.6, 0.8, 1.2, 1.3, 1.4])
+    parser.add_argument("--direction", type=int, choices=[1, -1], default=1)
+    parser.add_argument("--calibration", nargs="?", const=DEFAULT_CALIBRATION,
+                        help="send calibrated pulse widths (servo_calibration.json unless a file is given)")
+    args = parser.parse_args()
+
+    if args.waveform:
+        # Arbitrary (non-sinusoidal) gaits: one row per playback frame
+        if args.waveform.endswith(".npy"):
+            waveform = np.load(args.waveform)
+        else:
+            waveform = np.loadtxt(args.waveform, delimiter=",", ndmin=2)
+    else:
+        waveform = waveform_from_gait(args.amplitude, args.frequency, args.phase_shift,
+                                      args.joint_factors, args.direction)
+
+    calibration = ServoCalibration.load(args.calibration) if args.calibration else None
+
+    try:
+        ser = serial.Serial(args.port, BAUD_RATE, timeout=0)
+        time.sleep(2)  # Wait for Arduino reset
+    except serial.SerialException as e:
+        print(f"Error: Could not open serial port {args.port}: {e}")
+        return
+
+    streamer = GaitStreamer(ser, waveform, lookahead=args.lookahead, calibration=calibration)
+    units = "calibrated pulse widths" if calibration else "angles"
+    print(f"Streaming {len(waveform)} frames x {streamer.num_joints} joints ({units}) at {PLAYBACK_RATE_HZ:g} Hz")
+
+    try:
+        streamer.run(args.duration)
+    except KeyboardInterrupt:
+        print("\nStreaming stopped by user")
+    finally:
+        ser.close()
+        print(f"Frames sent: {streamer.frames_sent}, gaps: {streamer.gaps}, overflows: {streamer.overflows}")
+
+
+if __name__ == "__main__":
+    main()
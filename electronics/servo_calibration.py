@@ -0,0 +1,180 @@
+"""
+Per-servo calibration: measured joint angle -> pulse width lookup tables.
+
+Each servo gets its own table of (angle from center in degrees, pulse width
+in microseconds) points. Measure them with servo_calibration.ino (in the
+repository root): set its calibration `angle`, upload, read each horn angle
+off a protractor and note the commanded value, repeat across the range.
+The sketch commands servo.write() angles, so build with --write-angles to
+convert them to the pulse widths the Servo library sends; rows measured
+with writeMicroseconds() are pulse widths already. Angles in between are
+interpolated piecewise-linearly and angles beyond the measured range are
+clamped to its ends, so a calibrated servo is never driven past what was
+measured.
+
+    python servo_calibration.py build measurements.csv --write-angles   # servo,angle_deg,write_deg rows
+    python servo_calibration.py build measurements.csv                  # servo,angle_deg,pulse_us rows
+    python servo_calibration.py show --angles -30 0 30
+
+to_pulse() converts whole (T, N) command batches at once, so gait_stream.py
+can precompute a whole waveform as pulse widths (--calibration).
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+
+DEFAULT_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "servo_calibration.json")
+
+# Uncalibrated mapping the simulators used so far: 1500 us at center, +-500 us at +-90 deg
+LINEAR_CENTER_US = 1500.0
+LINEAR_US_PER_DEG = 500.0 / 90.0
+PULSE_LIMITS_US = (500, 2500)   # what the Servo library will accept
+# Servo.write(angle) sends MIN_PULSE_WIDTH + angle / 180 * (MAX - MIN) (Servo.h defaults)
+WRITE_PULSE_RANGE_US = (544.0, 2400.0)
+
+
+class ServoCalibration:
+    """
+    Angle <-> pulse width tables for a set of servos, indexed in the joint
+    order of the gait frames (joint 0 first).
+    """
+
+    def __init__(self, tables):
+        self.tables = []
+        for angles, pulses in tables:
+            angles = np.asarray(angles, dtype=float)
+            pulses = np.asarray(pulses, dtype=float)
+            if angles.shape != pulses.shape or len(angles) < 2:
+                raise ValueError("Each servo needs at least two (angle, pulse) points")
+            order = np.argsort(angles)
+            angles, pulses = angles[order], pulses[order]
+            if np.any(np.diff(angles) == 0):
+                raise ValueError("Duplicate calibration angle")
+            if not (np.all(np.diff(pulses) > 0) or np.all(np.diff(pulses) < 0)):
+                # A servo mounted mirrored runs backwards, but never back and forth
+                raise ValueError("Pulse widths must be monotonic in angle")
+            self.tables.append((angles, pulses))
+
+    def __len__(self):
+        return len(self.tables)
+
+    @classmethod
+    def linear(cls, num_servos):
+        """The uncalibrated 1500 +- 500 us mapping, for every servo."""
+        angles = [-90.0, 90.0]
+        pulses = [LINEAR_CENTER_US + a * LINEAR_US_PER_DEG for a in angles]
+        return cls([(angles, pulses)] * num_servos)
+
+    @classmethod
+    def from_measurements(cls, servos, angles, pulses):
+        """Build tables from flat (servo index, angle, pulse) measurement columns."""
+        servos = np.asarray(servos, dtype=int)
+        angles = np.asarray(angles, dtype=float)
+        pulses = np.asarray(pulses, dtype=float)
+        return cls([(angles[servos == i], pulses[servos == i]) for i in range(servos.max() + 1)])
+
+    def to_pulse(self, angles):
+        """
+        Pulse widths (us) for a (..., N) array of joint angles in degrees from
+        center; column i uses servo i's table.
+        """
+        angles = np.asarray(angles, dtype=float)
+        num_joints = angles.shape[-1]
+        if num_joints > len(self.tables):
+            raise ValueError(f"Calibration covers {len(self.tables)} servos, got {num_joints} joints")
+        pulses = np.empty_like(angles)
+        for i in range(num_joints):
+            table_angles, table_pulses = self.tables[i]
+            pulses[..., i] = np.interp(angles[..., i], table_angles, table_pulses)
+        return pulses
+
+    def to_angle(self, pulses):
+        """Inverse of to_pulse(): joint angles (deg) for a (..., N) array of pulse widths."""
+        pulses = np.asarray(pulses, dtype=float)
+        angles = np.empty_like(pulses)
+        for i in range(pulses.shape[-1]):
+            table_angles, table_pulses = self.tables[i]
+            if table_pulses[0] > table_pulses[-1]:
+                table_angles, table_pulses = table_angles[::-1], table_pulses[::-1]
+            angles[..., i] = np.interp(pulses[..., i], table_pulses, table_angles)
+        return angles
+
+    def angle_range(self, servo):
+        """Calibrated (min, max) angle of one servo; commands outside it are clamped."""
+        table_angles, _ = self.tables[servo]
+        return float(table_angles[0]), float(table_angles[-1])
+
+    def save(self, path=DEFAULT_FILE):
+        data = {"servos": [{"servo": i, "angle_deg": angles.tolist(), "pulse_us": pulses.tolist()}
+                           for i, (angles, pulses) in enumerate(self.tables)]}
+        with open(path, "w") as f:
+            json.dump(data, f, indent=2)
+
+    @classmethod
+    def load(cls, path=DEFAULT_FILE):
+        with open(path) as f:
+            data = json.load(f)
+        servos = sorted(data["servos"], key=lambda entry: entry["servo"])
+        return cls([(entry["angle_deg"], entry["pulse_us"]) for entry in servos])
+
+    @classmethod
+    def load_or_linear(cls, num_servos, path=DEFAULT_FILE):
+        """The saved calibration if there is one, else the linear mapping."""
+        if path and os.path.exists(path):
+            calibration = cls.load(path)
+            if len(calibration) >= num_servos:
+                return calibration
+            print(f"Warning: {path} covers {len(calibration)} of {num_servos} servos, using linear mapping")
+        return cls.linear(num_servos)
+
+
+def write_angle_to_pulse(write_deg):
+    """Pulse width (us) the Servo library sends for servo.write(write_deg)."""
+    low, high = WRITE_PULSE_RANGE_US
+    return low + np.clip(np.asarray(write_deg, dtype=float), 0.0, 180.0) / 180.0 * (high - low)
+
+
+def _has_header(path):
+    with open(path) as f:
+        first = f.readline()
+    return any(c.isalpha() for c in first)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or inspect per-servo calibration tables")
+    subparsers = parser.add_subparsers(dest="mode", required=True)
+
+    build = subparsers.add_parser("build", help="build the tables from a measurement CSV")
+    build.add_argument("measurements", help="CSV with servo,angle_deg,pulse_us rows (servo 0-based)")
+    build.add_argument("--write-angles", action="store_true",
+                       help="third column is the servo.write() angle (servo_calibration.ino), not pulse_us")
+    build.add_argument("--out", default=DEFAULT_FILE)
+
+    show = subparsers.add_parser("show", help="print the pulse widths for some angles")
+    show.add_argument("--calibration", default=DEFAULT_FILE)
+    show.add_argument("--angles", type=float, nargs="+", default=[-45.0, 0.0, 45.0])
+    args = parser.parse_args()
+
+    if args.mode == "build":
+        rows = np.loadtxt(args.measurements, delimiter=",", ndmin=2, comments="#",
+                          skiprows=1 if _has_header(args.measurements) else 0)
+        pulses = write_angle_to_pulse(rows[:, 2]) if args.write_angles else rows[:, 2]
+        calibration = ServoCalibration.from_measurements(rows[:, 0], rows[:, 1], pulses)
+        calibration.save(args.out)
+        for i in range(len(calibration)):
+            low, high = calibration.angle_range(i)
+            print(f"Servo {i}: {len(calibration.tables[i][0])} points, {low:.1f} to {high:.1f} deg")
+        print(f"Saved {args.out}")
+    else:
+        calibration = ServoCalibration.load(args.calibration)
+        angles = np.tile(args.angles, (len(calibration), 1)).T
+        pulses = calibration.to_pulse(angles)
+        print("angle  " + "  ".join(f"servo{i:<2d}" for i in range(len(calibration))))
+        for angle, row in zip(args.angles, pulses):
+            print(f"{angle:5.1f}  " + "  ".join(f"{p:7.1f}" for p in row))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+Framed binary serial protocol shared by the host tools and the Arduino sketches.
+
+Every packet is
+
+    0xAA 0x55 | type uint8 | length uint8 | payload (length bytes) | crc16 (LE)
+
+with the CRC-16/CCITT-FALSE computed over type, length and payload. All
+multi-byte fields are little-endian. The sync bytes never occur in the
+ASCII commands, so firmware can accept both on the same port.
+"""
+import binascii
+import struct
+
+SYNC = b"\xAA\x55"
+HEADER_SIZE = 4      # sync (2) + type (1) + length (1)
+CRC_SIZE = 2
+MAX_PAYLOAD = 64
+
+# Message types
+MSG_PARAMS = 0x01          # flags uint8 + steer, amplitude, frequency, phase_shift float32
+MSG_SET_SERVO = 0x02       # servo uint8 (1-based, as in the sketches) + angle uint8 (deg)
+MSG_WAVE_MODE = 0x03       # no payload: servos follow the wave again
+MSG_STATUS_REQUEST = 0x04  # no payload: firmware answers with its STATUS lines
+MSG_GAIT_FRAME = 0x10      # seq uint16 + num_joints uint8 + int16 centidegrees per joint
+MSG_GAIT_PULSES = 0x11     # seq uint16 + num_joints uint8 + uint16 pulse width (us) per joint
+
+# Which fields of a MSG_PARAMS packet are valid
+PARAM_FIELDS = ("steer", "amplitude", "frequency", "phase_shift")
+PARAM_FLAGS = {name: 1 << bit for bit, name in enumerate(PARAM_FIELDS)}
+
+_PARAMS_STRUCT = struct.Struct("<B4f")
+_SERVO_STRUCT = struct.Struct("<BB")
+_GAIT_HEADER_STRUCT = struct.Struct("<HB")
+
+
+def crc16(data):
+    """CRC-16/CCITT-FALSE (poly 0x1021, init 0xFFFF), as crc16() in the sketches."""
+    return binascii.crc_hqx(data, 0xFFFF)
+
+
+def encode_frame(msg_type, payload=b""):
+    if len(payload) > MAX_PAYLOAD:
+        raise ValueError(f"Payload too long: {len(payload)} > {MAX_PAYLOAD} bytes")
+    body = bytes((msg_type, len(payload))) + payload
+    return SYNC + body + struct.pack("<H", crc16(body))
+
+
+def encode_params(steer=None, amplitude=None, frequency=None, phase_shift=None):
+    """All wave parameters in one packet; fields left as None are not applied."""
+    values = (steer, amplitude, frequency, phase_shift)
+    flags = 0
+    for name, value in zip(PARAM_FIELDS, values):
+        if value is not None:
+            flags |= PARAM_FLAGS[name]
+    payload = _PARAMS_STRUCT.pack(flags, *(0.0 if v is None else v for v in values))
+    return encode_frame(MSG_PARAMS, payload)
+
+
+def encode_set_servo(servo, angle):
+    return encode_frame(MSG_SET_SERVO, _SERVO_STRUCT.pack(servo, max(0, min(180, int(angle)))))
+
+
+def encode_wave_mode():
+    return encode_frame(MSG_WAVE_MODE)
+
+
+def encode_status_request():
+    return encode_frame(MSG_STATUS_REQUEST)
+
+
+def encode_gait_frame(seq, angle_payload, num_joints):
+    """Gait playback frame; angle_payload is num_joints little-endian int16 centidegrees."""
+    return encode_frame(MSG_GAIT_FRAME, _GAIT_HEADER_STRUCT.pack(seq & 0xFFFF, num_joints) + angle_payload)
+
+
+def encode_gait_pulse_frame(seq, pulse_payload, num_joints):
+    """Calibrated gait frame; pulse_payload is num_joints little-endian uint16 microseconds."""
+    return encode_frame(MSG_GAIT_PULSES, _GAIT_HEADER_STRUCT.pack(seq & 0xFFFF, num_joints) + pulse_payload)
+
+
+def decode_params(payload):
+    """Return a dict with only the parameters flagged as present."""
+    flags, *values = _PARAMS_STRUCT.unpack(payload)
+    return {name: value for name, value in zip(PARAM_FIELDS, values) if flags & PARAM_FLAGS[name]}
+
+
+def decode_set_servo(payload):
+    return _SERVO_STRUCT.unpack(payload)
+
+
+def decode_gait_frame(payload):
+    """Return (seq, angles in degrees)."""
+    seq, num_joints = _GAIT_HEADER_STRUCT.unpack_from(payload)
+    raw = struct.unpack_from(f"<{num_joints}h", payload, _GAIT_HEADER_STRUCT.size)
+    return seq, [value / 100.0 for value in raw]
+
+
+def decode_gait_pulse_frame(payload):
+    """Return (seq, pulse widths in microseconds)."""
+    seq, num_joints = _GAIT_HEADER_STRUCT.unpack_from(payload)
+    return seq, list(struct.unpack_from(f"<{num_joints}H", payload, _GAIT_HEADER_STRUCT.size))
+
+
+class FrameDecoder:
+    """
+    Incremental decoder for a byte stream that may mix frames and ASCII lines.
+
+    feed() returns the (msg_type, payload) frames completed by the new bytes.
+    Bytes outside frames are collected as text lines in `lines`; frames with a
+    bad CRC are counted in `crc_errors` and skipped.
+    """
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._text = b""
+        self.lines = []
+        self.crc_errors = 0
+
+    def _take_text(self, end):
+        # Move bytes before a frame into the text stream, splitting whole lines
+        self._text += bytes(self._buffer[:end])
+        del self._buffer[:end]
+        *complete, self._text = self._text.split(b"\n")
+        self.lines.extend(line.decode("utf-8", errors="ignore").strip() for line in complete)
+
+    def take_lines(self):
+        """Return and clear the text lines received so far."""
+        lines, self.lines = self.lines, []
+        return lines
+
+    def feed(self, data):
+        self._buffer += data
+        frames = []
+
+        while True:
+            start = self._buffer.find(SYNC)
+            if start < 0:
+                # Keep a trailing 0xAA in case it is the first half of a sync
+                keep = 1 if self._buffer.endswith(SYNC[:1]) else 0
+                self._take_text(len(self._buffer) - keep)
+                break
+
+            if start:
+                self._take_text(start)
+
+            if len(self._buffer) < HEADER_SIZE:
+                break
+            length = self._buffer[3]
+            frame_size = HEADER_SIZE + length + CRC_SIZE
+            if length > MAX_PAYLOAD:
+                # Not a real frame; drop the sync byte and rescan
+                del self._buffer[0]
+                continue
+            if len(self._buffer) < frame_size:
+                break
+
+            body = bytes(self._buffer[2:HEADER_SIZE + length])
+            (received_crc,) = struct.unpack_from("<H", self._buffer, HEADER_SIZE + length)
+            if received_crc == crc16(body):
+                frames.append((body[0], body[2:]))
+                del self._buffer[:frame_size]
+            else:
+                self.crc_errors += 1
+                del self._buffer[0]
+
+        return frames
@@ -0,0 +1,175 @@
+"""
+Telemetry channel from the Arduino sketches.
+
+The firmware announces its signals once with
+
+    TEL_FIELDS:t_ms,loop_us,cmd1,...,act1,...
+
+(at startup and with every STATUS reply) and then streams one line per
+sample:
+
+    TEL:<t_ms>,<loop_us>,<cmd1>,...,<act1>,...
+
+The first field is always the firmware millis() timestamp. Every other field
+is kept in its own fixed-size NumPy ring buffer, so appending is O(1) and
+memory stays bounded however long the robot runs.
+"""
+import numpy as np
+
+TELEMETRY_PREFIX = "TEL:"
+FIELDS_PREFIX = "TEL_FIELDS:"
+TIME_FIELD = "t_ms"
+
+DEFAULT_CAPACITY = 6000  # samples per signal (2 minutes at 50 Hz)
+
+
+class SignalRing:
+    """Fixed-capacity ring of (time, value) samples for one signal."""
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.times = np.zeros(capacity)
+        self.values = np.zeros(capacity)
+        self.capacity = capacity
+        self.count = 0  # total samples ever appended
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def append(self, t, value):
+        index = self.count % self.capacity
+        self.times[index] = t
+        self.values[index] = value
+        self.count += 1
+
+    def clear(self):
+        self.count = 0
+
+    def ordered(self):
+        """Return (times, values) oldest first."""
+        if self.count <= self.capacity:
+            return self.times[:self.count], self.values[:self.count]
+        split = self.count % self.capacity
+        return (np.concatenate((self.times[split:], self.times[:split])),
+                np.concatenate((self.values[split:], self.values[:split])))
+
+    def latest(self):
+        if not self.count:
+            return None
+        index = (self.count - 1) % self.capacity
+        return self.times[index], self.values[index]
+
+    def window(self, start=None):
+        """Samples with time >= start (all samples if start is None)."""
+        times, values = self.ordered()
+        if start is not None:
+            first = np.searchsorted(times, start)
+            times, values = times[first:], values[first:]
+        return times, values
+
+
+def downsample(times, values, max_points):
+    """
+    Reduce a series to at most max_points buckets.
+
+    Returns (times, mean, min, max) per bucket so short spikes stay visible
+    in the envelope even though the mean smooths them out.
+    """
+    n = len(times)
+    if not max_points or n <= max_points:
+        return times, values, values, values
+
+    bucket = -(-n // max_points)  # ceil division
+    starts = np.arange(0, n, bucket)
+    counts = np.diff(np.append(starts, n))
+    return (times[starts],
+            np.add.reduceat(values, starts) / counts,
+            np.minimum.reduceat(values, starts),
+            np.maximum.reduceat(values, starts))
+
+
+class TelemetryStore:
+    """Parses TEL lines into one SignalRing per announced field."""
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self.fields = None
+        self.signals = {}
+        self.samples = 0
+        self.malformed = 0
+        self._last_time = None
+
+    def set_fields(self, fields):
+        fields = [name.strip() for name in fields]
+        if fields == self.fields:
+            return
+        if not fields or fields[0] != TIME_FIELD:
+            raise ValueError(f"Telemetry fields must start with {TIME_FIELD}: {fields}")
+        self.fields = fields
+        self.signals = {name: SignalRing(self.capacity) for name in fields[1:]}
+        self._last_time = None
+
+    def clear(self):
+        for ring in self.signals.values():
+            ring.clear()
+        self._last_time = None
+
+    def parse_line(self, line):
+        """Consume a telemetry line; returns False for anything else."""
+        if line.startswith(FIELDS_PREFIX):
+            try:
+                self.set_fields(line[len(FIELDS_PREFIX):].split(","))
+            except ValueError:
+                self.malformed += 1
+            return True
+
+        if not line.startswith(TELEMETRY_PREFIX):
+            return False
+
+        try:
+            values = [float(v) for v in line[len(TELEMETRY_PREFIX):].split(",")]
+        except ValueError:
+            values = None
+        if values is None or self.fields is None or len(values) != len(self.fields):
+            # Garbled line, or samples arriving before the field list
+            self.malformed += 1
+            return True
+
+        self.add_sample(values[0] / 1000.0, values[1:])
+        return True
+
+    def add_sample(self, t, values):
+        """Append one sample (seconds, values in field order after t_ms)."""
+        if self._last_time is not None and t < self._last_time:
+            # millis() went backwards: the Arduino was reset
+            self.clear()
+        self._last_time = t
+
+        for ring, value in zip(self.signals.values(), values):
+            ring.append(t, value)
+        self.samples += 1
+
+    def latest(self):
+        """Most recent value of every signal."""
+        return {name: float(ring.latest()[1]) for name, ring in self.signals.items() if ring.count}
+
+    def window(self, names=None, seconds=None, max_points=None):
+        """
+        Recent samples of the named signals (all by default) as plain lists.
+
+        seconds limits the window to the newest samples; max_points
+        downsamples each signal to at most that many buckets.
+        """
+        names = list(self.signals) if names is None else names
+        start = None
+        if seconds is not None and self._last_time is not None:
+            start = self._last_time - seconds
+
+        result = {}
+        for name in names:
+            ring = self.signals.get(name)
+            if ring is None:
+                continue
+            times, mean, low, high = downsample(*ring.window(start), max_points)
+            result[name] = {"t": times.tolist(), "value": mean.tolist(),
+                            "min": low.tolist(), "max": high.tolist()}
+        return result
@@ -7,6 +7,12 @@ import io
 import time
 from PIL import Image
 import threading
+import os
+import sys
+
+# Stage timing helpers shared with the vision scripts in utilities/
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "utilities"))
+from latency import LatencyRecorder, draw_latency_overlay
 
 app = Flask(__name__)
 CORS(app)  # Allow cross-origin requests
@@ -16,12 +22,19 @@ latest_frame = None
 latest_tag_positions = []
 processing_active = False
 processing_fps = 0
-last_process_time = time.time()
+upload_fps = 0
+last_upload_time = time.perf_counter()
 processed_frame = None
 
+# Each upload gets an id and receive time so the worker only processes new frames
+latest_frame_info = (0, 0.0)
+
+# Per-stage timing: decode, queue (waiting for the worker), detect, total
+latency = LatencyRecorder()
+
 @app.route('/process-frame', methods=['POST'])
 def process_frame():
-    global latest_frame, processing_fps, last_process_time
+    global latest_frame, latest_frame_info, upload_fps, last_upload_time
     
     # Get the base64 image data from the request
     data = request.json
@@ -34,20 +47,23 @@ def process_frame():
         img_data = img_data.split(',')[1]
     
     try:
+        received_at = time.perf_counter()
+        
         # Convert base64 to image
-        img_bytes = base64.b64decode(img_data)
-        img_array = np.frombuffer(img_bytes, np.uint8)
-        img = cv2.imdecode(img_array, cv2.IMREAD_COLOR)
+        with latency.span("decode"):
+            img_bytes = base64.b64decode(img_data)
+            img_array = np.frombuffer(img_bytes, np.uint8)
+            img = cv2.imdecode(img_array, cv2.IMREAD_COLOR)
         
         # Update latest frame
         latest_frame = img
+        latest_frame_info = (latest_frame_info[0] + 1, received_at)
         
-        # Calculate FPS
-        current_time = time.time()
-        time_diff = current_time - last_process_time
+        # Upload rate (how fast frames arrive, not how fast they are processed)
+        time_diff = received_at - last_upload_time
         if time_diff > 0:
-            processing_fps = 1.0 / time_diff
-        last_process_time = current_time
+            upload_fps = 1.0 / time_diff
+        last_upload_time = received_at
         
         # If processing is not active, start it
         if not processing_active:
@@ -205,21 +221,40 @@ def detect_april_tags(frame):
     return detected_tags, display_frame
 
 def process_frames():
-    global latest_frame, latest_tag_positions, processing_active, processed_frame
+    global latest_frame, latest_tag_positions, processing_active, processed_frame, processing_fps
     
     processing_active = True
+    last_frame_id = 0
+    last_done = None
     
     while processing_active:
-        if latest_frame is not None:
+        frame_id, received_at = latest_frame_info
+        if latest_frame is not None and frame_id != last_frame_id:
+            last_frame_id = frame_id
+            trace = latency.trace()
+            latency.record("queue", trace.start - received_at)
+            
             # Make a copy of the frame to avoid race conditions
             frame = latest_frame.copy()
             
             # Detect AprilTags - note we now get back both tags and the processed frame
-            detected_tags, processed_frame = detect_april_tags(frame)
+            detected_tags, result_frame = detect_april_tags(frame)
+            trace.mark("detect")
             
             # Update the latest tag positions
             latest_tag_positions = [{'id': tag['id'], 'x': tag['center'][0], 'y': tag['center'][1]} 
                                    for tag in detected_tags]
+            
+            # Upload-to-result latency for this frame
+            done = time.perf_counter()
+            latency.record("total", done - received_at)
+            processed_frame = draw_latency_overlay(result_frame, latency)
+            
+            # Frames actually processed per second (smoothed)
+            if last_done is not None and done > last_done:
+                instant_fps = 1.0 / (done - last_done)
+                processing_fps = instant_fps if processing_fps == 0 else 0.9 * processing_fps + 0.1 * instant_fps
+            last_done = done
         
         # Sleep to avoid consuming too much CPU
         time.sleep(0.01)
@@ -234,9 +269,19 @@ def get_status():
     return jsonify({
         'processing_active': processing_active,
         'processing_fps': round(processing_fps, 1),
+        'upload_fps': round(upload_fps, 1),
         'num_tags_detected': len(latest_tag_positions),
         'tag_positions': latest_tag_positions
     })
 
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Per-stage latency percentiles over the most recent frames"""
+    return jsonify({
+        'stages': latency.summary(),
+        'processing_fps': round(processing_fps, 1),
+        'upload_fps': round(upload_fps, 1)
+    })
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000, debug=True, threaded=True)
\ No newline at end of file
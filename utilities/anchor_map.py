@@ -0,0 +1,335 @@
+"""
+Map of the fixed anchor tags and camera localization against it.
+
+The anchor tags (0 and 7 for controller-final.py) do not move, so their
+poses only have to be estimated once. Building a map:
+
+    python anchor_map.py --anchors 0 7 --frames 300 --out anchor_map.json
+
+collects the anchor detections of many frames, chains the tag-to-tag
+poses into an initial map and refines it by alternating camera poses
+(one PnP per frame) and tag poses (least-squares reprojection error of
+each tag's corners over all frames). The world frame is the usual one:
+origin at the first anchor, x towards the second, z along the anchors'
+average normal and y = z x x.
+
+At runtime AnchorMap.localize() puts the corners of every visible anchor
+into one solvePnP call, so any single anchor is enough to register a
+frame and more anchors only make it more accurate:
+
+    anchor_map = AnchorMap.load("anchor_map.json")
+    pose = anchor_map.localize(results, camera_params)
+    pose.coord_system()   # same dict controller-final.py builds from tags 0 and 7
+"""
+import argparse
+import json
+
+import cv2
+import numpy as np
+
+DEFAULT_ANCHORS = (0, 7)    # origin tag, x-axis tag, then any other fixed tags
+DEFAULT_MAP_FILE = "anchor_map.json"
+REFINE_ITERATIONS = 5
+MIN_FRAMES = 10
+
+
+def camera_matrix(camera_params):
+    fx, fy, cx, cy = camera_params
+    return np.array([[fx, 0.0, cx], [0.0, fy, cy], [0.0, 0.0, 1.0]])
+
+
+def tag_object_corners(tag_size):
+    """Tag-frame corners in the order pupil_apriltags reports the image corners."""
+    s = tag_size / 2
+    return np.array([[-s, s, 0.0], [s, s, 0.0], [s, -s, 0.0], [-s, -s, 0.0]])
+
+
+def _transform(R, t):
+    T = np.eye(4)
+    T[:3, :3] = R
+    T[:3, 3] = np.reshape(t, 3)
+    return T
+
+
+def _inverse(T):
+    R, t = T[:3, :3], T[:3, 3]
+    return _transform(R.T, -R.T @ t)
+
+
+def _average_transforms(transforms):
+    """Chordal mean of the rotations (projected back onto SO(3)) and mean translation."""
+    stack = np.asarray(transforms)
+    U, _, Vt = np.linalg.svd(stack[:, :3, :3].sum(axis=0))
+    R = U @ np.diag([1.0, 1.0, np.linalg.det(U @ Vt)]) @ Vt
+    return _transform(R, stack[:, :3, 3].mean(axis=0))
+
+
+def _world_from_anchors(poses, origin_id, axis_id):
+    """Transform taking the current frame of poses to the tag 0 / tag 7 world frame."""
+    origin = poses[origin_id][:3, 3]
+    normal = _average_transforms(list(poses.values()))[:3, 2]
+    normal /= np.linalg.norm(normal)
+    x_axis = poses[axis_id][:3, 3] - origin
+    x_axis -= normal * np.dot(x_axis, normal)
+    x_axis /= np.linalg.norm(x_axis)
+    y_axis = np.cross(normal, x_axis)
+    R = np.vstack((x_axis, y_axis, normal))
+    return _transform(R, -R @ origin)
+
+
+class CameraPose:
+    """Camera pose from localize(): p_camera = R @ p_world + t."""
+
+    def __init__(self, R, t, anchors, error):
+        self.R = R
+        self.t = t
+        self.anchors = anchors    # anchor IDs used
+        self.error = error        # RMS reprojection error (px)
+
+    def to_world(self, p_camera):
+        return self.R.T @ (np.reshape(p_camera, 3) - self.t)
+
+    def coord_system(self):
+        """World axes and origin expressed in camera coordinates (the columns of R)."""
+        return {'origin': self.t.copy(), 'x_axis': self.R[:, 0].copy(),
+                'y_axis': self.R[:, 1].copy(), 'z_axis': self.R[:, 2].copy()}
+
+    def round_trip_error(self, p_camera):
+        """Distance between to_world() and the projection onto coord_system(); ~0 if consistent."""
+        axes = self.coord_system()
+        rel = np.reshape(p_camera, 3) - axes['origin']
+        projected = np.array([np.dot(rel, axes['x_axis']), np.dot(rel, axes['y_axis']),
+                              np.dot(rel, axes['z_axis'])])
+        return float(np.linalg.norm(projected - self.to_world(p_camera)))
+
+
+class AnchorMap:
+    def __init__(self, anchors, tag_size, origin_id, axis_id, info=None):
+        self.anchors = anchors          # tag_id -> 4x4 world-from-tag transform
+        self.tag_size = tag_size
+        self.origin_id = origin_id
+        self.axis_id = axis_id
+        self.info = info or {}
+        object_corners = tag_object_corners(tag_size)
+        self.corners = {tag_id: (T[:3, :3] @ object_corners.T).T + T[:3, 3]
+                        for tag_id, T in anchors.items()}
+
+    def localize(self, results, camera_params):
+        """Camera pose from all visible anchors in one solvePnP, or None."""
+        image_points, object_points, used = [], [], []
+        for r in results:
+            world_corners = self.corners.get(r.tag_id)
+            if world_corners is not None:
+                image_points.append(r.corners)
+                object_points.append(world_corners)
+                used.append(r.tag_id)
+        if not used:
+            return None
+
+        image_points = np.concatenate(image_points).astype(np.float64)
+        object_points = np.concatenate(object_points)
+        K = camera_matrix(camera_params)
+        ok, rvec, tvec = cv2.solvePnP(object_points, image_points, K, None, flags=cv2.SOLVEPNP_SQPNP)
+        if not ok:
+            return None
+
+        projected = cv2.projectPoints(object_points, rvec, tvec, K, None)[0].reshape(-1, 2)
+        error = float(np.sqrt(np.mean(np.sum((projected - image_points) ** 2, axis=1))))
+        return CameraPose(cv2.Rodrigues(rvec)[0], tvec.reshape(3), used, error)
+
+    def save(self, path=DEFAULT_MAP_FILE):
+        data = {"tag_size": self.tag_size, "origin_id": self.origin_id, "axis_id": self.axis_id,
+                "anchors": {str(tag_id): {"R": T[:3, :3].tolist(), "t": T[:3, 3].tolist()}
+                            for tag_id, T in self.anchors.items()},
+                "info": self.info}
+        with open(path, "w") as f:
+            json.dump(data, f, indent=2)
+
+    @classmethod
+    def load(cls, path=DEFAULT_MAP_FILE):
+        with open(path) as f:
+            data = json.load(f)
+        anchors = {int(tag_id): _transform(np.array(pose["R"]), pose["t"])
+                   for tag_id, pose in data["anchors"].items()}
+        return cls(anchors, data["tag_size"], data["origin_id"], data["axis_id"], data.get("info"))
+
+
+def _initial_map(frames, origin_id):
+    """Average tag-to-tag poses over all frames and chain them out from the origin tag."""
+    pairs = {}
+    for frame in frames:
+        for i, T_ci in frame.items():
+            for j, T_cj in frame.items():
+                if i != j:
+                    pairs.setdefault((i, j), []).append(_inverse(T_ci) @ T_cj)
+    relative = {pair: _average_transforms(transforms) for pair, transforms in pairs.items()}
+
+    # Breadth-first from the origin over the co-visibility graph
+    poses = {origin_id: np.eye(4)}
+    frontier = [origin_id]
+    while frontier:
+        i = frontier.pop(0)
+        for (a, b), T_ab in relative.items():
+            if a == i and b not in poses:
+                poses[b] = poses[i] @ T_ab
+                frontier.append(b)
+    return poses
+
+
+def _reprojection_residuals(T_cw, T_wk, object_corners, image_corners, K):
+    T = T_cw @ T_wk
+    rvec = cv2.Rodrigues(T[:3, :3])[0]
+    projected = cv2.projectPoints(object_corners, rvec, T[:3, 3], K, None)[0].reshape(-1, 2)
+    return (projected - image_corners).ravel()
+
+
+def _refine_tag(T_wk, observations, object_corners, K, iterations=5):
+    """Gauss-Newton on one tag's world pose over (T_cw, image corners) observations."""
+    rvec = cv2.Rodrigues(T_wk[:3, :3])[0].ravel()
+    tvec = T_wk[:3, 3].copy()
+
+    def residuals(params):
+        T = _transform(cv2.Rodrigues(params[:3])[0], params[3:])
+        return np.concatenate([_reprojection_residuals(T_cw, T, object_corners, corners, K)
+                               for T_cw, corners in observations])
+
+    params = np.concatenate((rvec, tvec))
+    for _ in range(iterations):
+        r = residuals(params)
+        # Numerical Jacobian: 6 parameters, cheap next to the one-off map build
+        J = np.empty((len(r), 6))
+        for k in range(6):
+            step = np.zeros(6)
+            step[k] = 1e-6
+            J[:, k] = (residuals(params + step) - r) / 1e-6
+        delta = np.linalg.lstsq(J, -r, rcond=None)[0]
+        params += delta
+        if np.linalg.norm(delta) < 1e-9:
+            break
+    return _transform(cv2.Rodrigues(params[:3])[0], params[3:])
+
+
+def build_map(observations, tag_size, camera_params, origin_id=DEFAULT_ANCHORS[0],
+              axis_id=DEFAULT_ANCHORS[1], iterations=REFINE_ITERATIONS):
+    """
+    observations: one dict per frame, tag_id -> (image corners (4, 2),
+    pose_R, pose_t) of the anchors seen in that frame. Returns an AnchorMap.
+    """
+    K = camera_matrix(camera_params)
+    object_corners = tag_object_corners(tag_size)
+    frames = [{tag_id: _transform(R, t) for tag_id, (_, R, t) in frame.items()}
+              for frame in observations if len(frame) >= 2]
+    if len(frames) < MIN_FRAMES:
+        raise ValueError(f"Need at least {MIN_FRAMES} frames with two or more anchors, got {len(frames)}")
+
+    poses = _initial_map(frames, origin_id)
+    if axis_id not in poses:
+        raise ValueError(f"Tag {axis_id} was never seen together with the other anchors")
+    world = _world_from_anchors(poses, origin_id, axis_id)
+    poses = {tag_id: world @ T for tag_id, T in poses.items()}
+
+    errors = []
+    for _ in range(iterations):
+        anchor_map = AnchorMap(poses, tag_size, origin_id, axis_id)
+
+        # Camera pose of every frame against the current map
+        camera_poses = []
+        squared = []
+        for frame in observations:
+            detections = [_Corners(tag_id, corners) for tag_id, (corners, _, _) in frame.items()]
+            pose = anchor_map.localize(detections, camera_params)
+            camera_poses.append(None if pose is None else _transform(pose.R, pose.t))
+            if pose is not None:
+                squared.append(pose.error ** 2)
+        errors.append(float(np.sqrt(np.mean(squared))))
+
+        # Each tag's world pose against all the cameras that saw it
+        for tag_id in poses:
+            seen = [(T_cw, frame[tag_id][0]) for T_cw, frame in zip(camera_poses, observations)
+                    if T_cw is not None and tag_id in frame]
+            if seen:
+                poses[tag_id] = _refine_tag(poses[tag_id], seen, object_corners, K)
+
+        # Refinement may drift the gauge: re-anchor to tag 0 / tag 7
+        world = _world_from_anchors(poses, origin_id, axis_id)
+        poses = {tag_id: world @ T for tag_id, T in poses.items()}
+
+    info = {"frames": len(observations), "rms_reprojection_px": errors,
+            "camera_params": list(camera_params)}
+    return AnchorMap(poses, tag_size, origin_id, axis_id, info)
+
+
+class _Corners:
+    """Minimal stand-in for a detection, for localizing against stored corners."""
+
+    def __init__(self, tag_id, corners):
+        self.tag_id = tag_id
+        self.corners = corners
+
+
+def main():
+    # Only the map-building mode needs the camera and the detector
+    from pupil_apriltags import Detector
+    from session_recording import open_capture
+
+    parser = argparse.ArgumentParser(description="Build a map of the fixed anchor tags")
+    parser.add_argument("--source", help="camera index, stream URL or recorded session directory")
+    parser.add_argument("--anchors", type=int, nargs="+", default=list(DEFAULT_ANCHORS),
+                        help="origin tag, x-axis tag, then any other fixed tags")
+    parser.add_argument("--frames", type=int, default=300, help="frames with anchors to collect")
+    parser.add_argument("--tag-size", type=float, default=0.05)
+    parser.add_argument("--camera-params", type=float, nargs=4, default=[1280, 720, 640, 360])
+    parser.add_argument("--out", default=DEFAULT_MAP_FILE)
+    args = parser.parse_args()
+
+    detector = Detector(families='tag36h11', nthreads=1, quad_decimate=1.0, quad_sigma=0.0,
+                        refine_edges=1, decode_sharpening=0.25, debug=0)
+    cap = open_capture(args.source)
+    if not cap.isOpened():
+        print("Failed to open camera. Please check your USB connection.")
+        return
+
+    anchors = set(args.anchors)
+    observations = []
+    while len(observations) < args.frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        results = detector.detect(gray, estimate_tag_pose=True, camera_params=args.camera_params,
+                                  tag_size=args.tag_size)
+        seen = {r.tag_id: (r.corners.copy(), r.pose_R, r.pose_t) for r in results if r.tag_id in anchors}
+        if len(seen) >= 2:
+            observations.append(seen)
+
+        cv2.putText(frame, f"Map frames: {len(observations)}/{args.frames} (q to finish early)",
+                    (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 255), 2)
+        cv2.imshow("Anchor Map", frame)
+        if cv2.waitKey(1) & 0xFF == ord('q'):
+            break
+
+    cap.release()
+    cv2.destroyAllWindows()
+
+    anchor_map = build_map(observations, args.tag_size, args.camera_params, args.anchors[0], args.anchors[1])
+    anchor_map.save(args.out)
+    errors = anchor_map.info["rms_reprojection_px"]
+    print(f"Saved {len(anchor_map.anchors)} anchors to {args.out} "
+          f"(RMS reprojection {errors[0]:.2f} -> {errors[-1]:.2f} px)")
+    for tag_id, T in sorted(anchor_map.anchors.items()):
+        x, y, z = T[:3, 3]
+        print(f"  tag {tag_id}: ({x:.3f}, {y:.3f}, {z:.3f}) m")
+
+    # Round trip: localize the collected frames against the saved map and check
+    # that coord_system() (what controller-final.py uses) agrees with to_world()
+    worst = 0.0
+    for seen in observations:
+        results = [_Corners(tag_id, corners) for tag_id, (corners, _, _) in seen.items()]
+        pose = anchor_map.localize(results, args.camera_params)
+        if pose is not None:
+            worst = max(worst, max(pose.round_trip_error(pose_t) for _, _, pose_t in seen.values()))
+    print(f"Coordinate round trip: max difference {worst:.2e} m")
+
+
+if __name__ == "__main__":
+    main()
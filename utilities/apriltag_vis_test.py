@@ -4,6 +4,7 @@ from pupil_apriltags import Detector
 import matplotlib.pyplot as plt
 from matplotlib.figure import Figure
 from matplotlib.backends.backend_agg import FigureCanvasAgg as FigureCanvas
+from body_shape import BodyShapeEstimator, draw_body_shape, positions_from_detections
 
 # Initialize AprilTag detector
 detector = Detector(families='tag36h11',
@@ -32,8 +33,12 @@ cx, cy = 640, 360   # Half of the resolution values above
 camera_params = [fx, fy, cx, cy]
 tag_size = 0.05  # 5cm - adjust to your actual tag size
 
+# Body shape of the tail tags 1-6: in pixels for the camera view, in metres for the plot
+body_pixels = BodyShapeEstimator()
+body_metres = BodyShapeEstimator()
+
 # Function to create AprilTag position visualization
-def create_apriltag_position_plot(tag_positions, origin_pos=(0, 0)):
+def create_apriltag_position_plot(tag_positions, body_shape=None, origin_pos=(0, 0)):
     # Create figure and axes
     fig = Figure(figsize=(8, 6), dpi=100)  # Larger figure size
     canvas = FigureCanvas(fig)
@@ -56,13 +61,11 @@ def create_apriltag_position_plot(tag_positions, origin_pos=(0, 0)):
             ax.scatter(position[0], position[1], color='b', marker='.', s=80)
             ax.text(position[0]+0.01, position[1]+0.01, f"{tag_id}", fontsize=9)
     
-    # Draw connections between tags if they exist in specific order
-    connection_pairs = [(1, 2), (2, 3), (3, 4), (4, 5), (5, 6)]
-    for start_id, end_id in connection_pairs:
-        if start_id in tag_positions and end_id in tag_positions:
-            start_pos = tag_positions[start_id]
-            end_pos = tag_positions[end_id]
-            ax.plot([start_pos[0], end_pos[0]], [start_pos[1], end_pos[1]], 'k--', alpha=0.5)
+    # Draw the fitted body centerline and the occluded tags placed on it
+    if body_shape is not None and len(body_shape.centerline):
+        ax.plot(body_shape.centerline[:, 0], body_shape.centerline[:, 1], 'k--', alpha=0.5)
+        hidden = body_shape.points[~body_shape.observed]
+        ax.scatter(hidden[:, 0], hidden[:, 1], facecolors='none', edgecolors='r', marker='o', s=80)
     
     # Set labels and grid
     ax.set_xlabel('X Position (m)')
@@ -136,13 +139,9 @@ while True:
             tag_pos = r.pose_t.reshape(3)
             tag_positions[tag_id] = (tag_pos[0], tag_pos[1])  # Store x,y coordinates
     
-    # Draw connections between tags
-    connection_pairs = [(1, 2), (2, 3), (3, 4), (4, 5), (5, 6)]
-    for start_id, end_id in connection_pairs:
-        if start_id in tag_centers and end_id in tag_centers:
-            start_center = tag_centers[start_id]
-            end_center = tag_centers[end_id]
-            cv2.line(frame, tuple(start_center), tuple(end_center), (255, 255, 0), 3)  # Yellow
+    # Fitted tail centerline and joint angles (camera x/y for the plot)
+    draw_body_shape(frame, body_pixels.estimate(positions_from_detections(results)))
+    body_shape = body_metres.estimate(positions_from_detections(results, source="pose")[:, :2])
     
     # Handling coordinate system
     if 0 in target_tags and 7 in target_tags:
@@ -179,7 +178,7 @@ while True:
     
     # Create and display AprilTag position plot if we have any positions
     if tag_positions:
-        plot_img = create_apriltag_position_plot(tag_positions)
+        plot_img = create_apriltag_position_plot(tag_positions, body_shape)
         plot_h, plot_w = plot_img.shape[:2]
         
         # Create a larger plot area - use 40% of the camera frame height
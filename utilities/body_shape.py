@@ -0,0 +1,219 @@
+"""
+Body shape of the eel from the chain of body tags (1 = head ... 6 = tail).
+
+BodyShapeEstimator.estimate() takes the tag positions of one frame as an
+(N, D) array in chain order, NaN where a tag was not detected, and returns
+the filled tag positions, a Catmull-Rom centerline through them and the
+signed joint angles between consecutive links. Everything is array math
+over the whole chain; there is no per-tag Python loop.
+
+Occluded tags are placed from the link lengths: a single hidden tag between
+two visible ones sits where both links reach it (the circle intersection on
+the side it was on in the previous frame), longer gaps are spread along the
+chord in proportion to the link lengths, and a gap at the head or tail end
+continues the last visible link direction. Link lengths can be given,
+otherwise they are learned as a running average of the links seen with
+both ends visible.
+
+Positions can be pixels (for drawing) or metres; angles are measured in
+the plane of the first two coordinates, i.e. the image plane for an
+overhead camera.
+
+    body = BodyShapeEstimator()
+    shape = body.estimate(positions_from_detections(results))
+    shape.joint_angles, shape.centerline
+"""
+import numpy as np
+
+BODY_TAGS = (1, 2, 3, 4, 5, 6)   # head (the robot tag) to tail
+SAMPLES_PER_LINK = 8             # centerline points per link
+LINK_LENGTH_ALPHA = 0.05         # running-average weight of a new link length observation
+
+# Uniform Catmull-Rom basis (rows: t^3, t^2, t, 1)
+_CATMULL_ROM = 0.5 * np.array([[-1.0, 3.0, -3.0, 1.0],
+                               [2.0, -5.0, 4.0, -1.0],
+                               [-1.0, 0.0, 1.0, 0.0],
+                               [0.0, 2.0, 0.0, 0.0]])
+
+
+def positions_from_detections(results, tag_ids=BODY_TAGS, source="center"):
+    """
+    (len(tag_ids), D) array of tag positions in chain order, NaN for tags not
+    detected. source="center" gives pixel centers (D=2), "pose" the
+    camera-frame pose_t (D=3).
+    """
+    dims = 2 if source == "center" else 3
+    positions = np.full((len(tag_ids), dims), np.nan)
+    index = {tag_id: i for i, tag_id in enumerate(tag_ids)}
+    for r in results:
+        i = index.get(r.tag_id)
+        if i is None:
+            continue
+        if source == "center":
+            positions[i] = r.center
+        elif getattr(r, "pose_t", None) is not None:
+            positions[i] = np.reshape(r.pose_t, 3)
+    return positions
+
+
+class BodyShape:
+    """Result of one estimate; all arrays follow the tag chain order."""
+
+    def __init__(self, points, observed, centerline, joint_angles, link_lengths):
+        self.points = points              # (N, D) tag positions, occluded ones filled (NaN if unfillable)
+        self.observed = observed          # (N,) True where the tag was detected
+        self.centerline = centerline      # (M, D) smooth curve through points
+        self.joint_angles = joint_angles  # (N-2,) signed bend at each inner tag (rad)
+        self.link_lengths = link_lengths  # (N-1,) lengths used for filling
+
+    def complete(self):
+        return bool(np.isfinite(self.points).all())
+
+    def heading(self):
+        """Direction of the head link (rad), pointing from tag 2 to the head tag."""
+        head = self.points[0] - self.points[1]
+        return float(np.arctan2(head[1], head[0]))
+
+    def curvature(self):
+        """Mean bend per unit length of each inner joint (rad per position unit)."""
+        half_links = 0.5 * (self.link_lengths[:-1] + self.link_lengths[1:])
+        return self.joint_angles / half_links
+
+
+class BodyShapeEstimator:
+    def __init__(self, link_lengths=None, tag_ids=BODY_TAGS, samples_per_link=SAMPLES_PER_LINK,
+                 alpha=LINK_LENGTH_ALPHA):
+        self.tag_ids = tuple(tag_ids)
+        self.samples_per_link = samples_per_link
+        self.alpha = alpha
+        self.learn_lengths = link_lengths is None
+        links = len(self.tag_ids) - 1
+        self.link_lengths = (np.full(links, np.nan) if link_lengths is None
+                             else np.asarray(link_lengths, dtype=np.float64).reshape(links))
+        self._previous = None  # filled points of the last frame, to pick the bend side
+
+        # Precomputed basis for the centerline samples of one link
+        t = np.linspace(0.0, 1.0, samples_per_link, endpoint=False)
+        self._basis = np.column_stack((t ** 3, t ** 2, t, np.ones_like(t))) @ _CATMULL_ROM
+
+    def update_link_lengths(self, positions, observed):
+        """Fold the links with both ends visible into the running averages."""
+        both = observed[:-1] & observed[1:]
+        if not both.any():
+            return
+        measured = np.linalg.norm(np.diff(positions, axis=0), axis=1)
+        unknown = np.isnan(self.link_lengths)
+        blended = np.where(unknown, measured, (1 - self.alpha) * self.link_lengths + self.alpha * measured)
+        self.link_lengths = np.where(both, blended, self.link_lengths)
+
+    def _lengths_for_fill(self):
+        # Links never seen whole borrow the mean of the known ones
+        lengths = self.link_lengths
+        if np.isnan(lengths).all():
+            return lengths
+        return np.where(np.isnan(lengths), np.nanmean(lengths), lengths)
+
+    def fill(self, positions, observed):
+        """Positions with occluded tags placed from the link lengths."""
+        lengths = self._lengths_for_fill()
+        known = np.flatnonzero(observed)
+        if len(known) == 0 or np.isnan(lengths).any():
+            return positions.copy()
+
+        # Arc length of each tag along the body
+        s = np.concatenate(([0.0], np.cumsum(lengths)))
+        if len(known) == 1:
+            # A single visible tag gives no direction to extend along
+            return positions.copy()
+
+        # Interior gaps: along the chord, spaced by link length
+        s_known = s[known]
+        filled = np.column_stack([np.interp(s, s_known, positions[known, d])
+                                  for d in range(positions.shape[1])])
+
+        # End gaps: continue the direction of the nearest visible link
+        first, second, last, before_last = known[0], known[1], known[-1], known[-2]
+        head_dir = positions[first] - positions[second]
+        head_dir /= np.linalg.norm(head_dir)
+        tail_dir = positions[last] - positions[before_last]
+        tail_dir /= np.linalg.norm(tail_dir)
+
+        head = s < s[first]
+        tail = s > s[last]
+        filled[head] = positions[first] + np.outer(s[first] - s[head], head_dir)
+        filled[tail] = positions[last] + np.outer(s[tail] - s[last], tail_dir)
+        filled[observed] = positions[observed]
+
+        # Single hidden tags with both neighbours visible: intersect the two link circles
+        single = np.zeros_like(observed)
+        single[1:-1] = ~observed[1:-1] & observed[:-2] & observed[2:]
+        if single.any():
+            i = np.flatnonzero(single)
+            filled[i, :2] = self._bend(filled[i - 1, :2], filled[i + 1, :2],
+                                       lengths[i - 1], lengths[i], filled[i, :2], i)
+        return filled
+
+    def _bend(self, before, after, r_before, r_after, chord_points, index):
+        chord = after - before
+        d = np.linalg.norm(chord, axis=1)
+        u = chord / d[:, None]
+        along = (r_before ** 2 - r_after ** 2 + d ** 2) / (2 * d)
+        # Links stretched past the chord length collapse to the chord
+        offset = np.sqrt(np.clip(r_before ** 2 - along ** 2, 0.0, None))
+        normal = np.column_stack((-u[:, 1], u[:, 0]))
+
+        # Bend to the side the tag was on last frame (no history: stay on the chord)
+        side = np.zeros(len(index))
+        if self._previous is not None:
+            previous = self._previous[index, :2]
+            side = np.nan_to_num(np.sign(np.einsum("ij,ij->i", previous - chord_points, normal)))
+        return before + along[:, None] * u + (side * offset)[:, None] * normal
+
+    def centerline(self, points):
+        """Catmull-Rom curve through points (ends padded by reflection)."""
+        if len(points) < 2 or not np.isfinite(points).all():
+            return np.empty((0, points.shape[1]))
+        padded = np.concatenate((2 * points[:1] - points[1:2], points, 2 * points[-1:] - points[-2:-1]))
+
+        # (links, 4, D) control point windows, one per link
+        windows = np.lib.stride_tricks.sliding_window_view(padded, 4, axis=0).transpose(0, 2, 1)
+        curve = np.einsum("sk,lkd->lsd", self._basis, windows).reshape(-1, points.shape[1])
+        return np.concatenate((curve, points[-1:]))
+
+    @staticmethod
+    def joint_angles(points):
+        """Signed angle from each link to the next (positive = counter-clockwise)."""
+        links = np.diff(points[:, :2], axis=0)
+        cross = links[:-1, 0] * links[1:, 1] - links[:-1, 1] * links[1:, 0]
+        dot = np.einsum("ij,ij->i", links[:-1], links[1:])
+        return np.arctan2(cross, dot)
+
+    def estimate(self, positions):
+        """BodyShape for one frame of (N, D) tag positions, NaN where not detected."""
+        positions = np.asarray(positions, dtype=np.float64)
+        observed = np.isfinite(positions).all(axis=1)
+        if self.learn_lengths:
+            self.update_link_lengths(positions, observed)
+
+        points = self.fill(positions, observed)
+        self._previous = points
+        return BodyShape(points, observed, self.centerline(points),
+                         self.joint_angles(points), self._lengths_for_fill())
+
+
+def draw_body_shape(frame, shape, color=(255, 255, 0), filled_color=(0, 0, 255)):
+    """Draw the centerline, the occluded tags placed by the estimator and the joint angles."""
+    import cv2  # only needed by the scripts that display frames
+
+    if len(shape.centerline):
+        cv2.polylines(frame, [np.round(shape.centerline[:, :2]).astype(np.int32).reshape(-1, 1, 2)],
+                      False, color, 3)
+
+    for point in shape.points[~shape.observed & np.isfinite(shape.points).all(axis=1)]:
+        cv2.circle(frame, tuple(np.round(point[:2]).astype(int)), 6, filled_color, 2)
+
+    if np.isfinite(shape.joint_angles).all() and len(shape.joint_angles):
+        angles = " ".join(f"{a:+.0f}" for a in np.rad2deg(shape.joint_angles))
+        cv2.putText(frame, f"Joints (deg): {angles}", (10, frame.shape[0] - 20),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
+    return frame
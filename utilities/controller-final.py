@@ -1,9 +1,17 @@
+import argparse
 import cv2
 import numpy as np
 from pupil_apriltags import Detector
 import matplotlib.pyplot as plt
 from matplotlib.figure import Figure
 from matplotlib.backends.backend_agg import FigureCanvasAgg as FigureCanvas
+from latency import LatencyRecorder, draw_latency_overlay
+from session_recording import SessionRecorder, capture_time, open_capture
+from frame_dedup import FrameChangeDetector
+from body_shape import BodyShapeEstimator, draw_body_shape, positions_from_detections
+from gait_tracking import CONVENTIONS, FIRMWARE_CONVENTION, GaitTracker, draw_gait_health
+from anchor_map import AnchorMap
+from mpc_controller import SamplingMPC
 
 # Initialize AprilTag detector
 detector = Detector(families='tag36h11',
@@ -14,21 +22,34 @@ detector = Detector(families='tag36h11',
                     decode_sharpening=0.25,
                     debug=0)
 
-# Connect to USB camera instead of DroidCam IP
-# Use camera index 0 for built-in webcam, or try index 1 for USB cameras
-# You may need to adjust this index based on your system
-cap = cv2.VideoCapture(1)  # Try index 1 first for USB connection
+# Camera, or a recorded session to replay instead (see session_recording.py)
+parser = argparse.ArgumentParser(description="AprilTag navigation controller")
+parser.add_argument("--source", help="camera index, stream URL or recorded session directory")
+parser.add_argument("--record", help="also save the camera frames to this session directory")
+parser.add_argument("--realtime", action="store_true", help="replay a session at its recorded speed")
+parser.add_argument("--controller", choices=["pid", "mpc"], default="pid",
+                    help="mpc: sampling MPC over the bicycle model, PID whenever it misses its time budget")
+parser.add_argument("--mpc-budget-ms", type=float, default=10.0, help="MPC planning time per control tick")
+parser.add_argument("--anchor-map", help="anchor map from anchor_map.py; registers frames from any visible anchor")
+# Commanded gait, to compare against the measured tail joint angles (see gait_tracking.py)
+parser.add_argument("--gait-frequency", type=float, help="commanded tail-beat frequency (Hz); enables gait tracking")
+parser.add_argument("--gait-amplitude", type=float, default=15.0)
+parser.add_argument("--gait-phase-shift", type=float, default=60.0)
+parser.add_argument("--joint-factors", type=float, nargs="+", default=[1.0, 1.0, 1.0, 1.0])
+parser.add_argument("--gait-convention", choices=CONVENTIONS, default=FIRMWARE_CONVENTION,
+                    help="wave sign convention of the commanded gait (default: the firmware's)")
+args = parser.parse_args()
 
-# If camera index 1 doesn't work, try index 0
-if not cap.isOpened():
-    print("Failed to open camera at index 1, trying index 0...")
-    cap = cv2.VideoCapture(0)
+# Without --source: USB camera at index 1, falling back to index 0
+cap = open_capture(args.source, realtime=args.realtime)
 
 # If both failed, let user know
 if not cap.isOpened():
     print("Failed to open camera. Please check your USB connection.")
     exit()
 
+recorder = SessionRecorder(args.record) if args.record else None
+
 # Camera parameters
 fx, fy = 1280, 720  # These should match your camera's resolution if possible
 cx, cy = 640, 360   # Half of the resolution values above
@@ -38,6 +59,9 @@ tag_size = 0.05  # 5cm - adjust to your actual tag size
 # Define the coordinate system reference (now using tags 0 and 7)
 coordinate_system_pair = (0, 7)
 
+# With a prebuilt map the world frame comes from one PnP over every visible anchor
+anchor_map = AnchorMap.load(args.anchor_map) if args.anchor_map else None
+
 # PID Controller Parameters from the trajectory calculation function
 dt = 0.1
 L = 1.0  # Distance from rudder to tail force
@@ -54,6 +78,13 @@ Kp_speed = 1.2
 Ki_speed = 0.1
 Kd_speed = 0.6
 
+# Sampling MPC (--controller mpc) over the same bicycle model and limits
+mpc = None
+if args.controller == "mpc":
+    mpc = SamplingMPC(dt=dt, L=L, k_t=k_t, max_steering=max_steering,
+                      max_tail_amplitude=max_tail_amplitude, budget_s=args.mpc_budget_ms / 1000)
+controller_mode = "PID"
+
 # PID memory
 integral_theta = 0
 integral_speed = 0
@@ -73,6 +104,22 @@ trajectory_x = []
 trajectory_y = []
 max_trajectory_points = 100  # Maximum number of points to keep in trajectory
 
+# Per-stage timing (capture, detect, world transform, PID), drawn on the frame
+latency = LatencyRecorder()
+
+# Repeated camera frames reuse the previous detections instead of re-detecting
+frame_changes = FrameChangeDetector()
+results = []
+
+# Centerline and joint angles of the tail tags 1-6, link lengths learned in pixels
+body = BodyShapeEstimator()
+
+# Servo health: measured joint angles against the commanded sine wave
+gait_tracker = None
+if args.gait_frequency:
+    gait_tracker = GaitTracker(args.gait_amplitude, args.gait_frequency, args.gait_phase_shift,
+                               args.joint_factors, convention=args.gait_convention)
+
 # Function to calculate control signals
 def calculate_control_step(robot_pos, target_pos, current_state, dt, integral_theta, integral_speed, prev_theta_error, prev_speed_error):
     # Extract positions
@@ -160,15 +207,24 @@ def create_trajectory_plot(robot_pos, target_pos, trajectory_x, trajectory_y, or
 
 # Main loop
 while True:
+    trace = latency.trace()
     ret, frame = cap.read()
     if not ret:
         break
-    
-    # Convert to grayscale
-    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-    
-    # Detect AprilTags
-    results = detector.detect(gray, estimate_tag_pose=True, camera_params=camera_params, tag_size=tag_size)
+    trace.mark("capture")
+    if recorder:
+        recorder.write(frame)
+    
+    new_frame = frame_changes.is_new(frame)
+    if new_frame:
+        # Convert to grayscale
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        
+        # Detect AprilTags (pupil_apriltags also estimates the tag poses here)
+        results = detector.detect(gray, estimate_tag_pose=True, camera_params=camera_params, tag_size=tag_size)
+        trace.mark("detect+pose")
+    else:
+        trace.skip()
     
     # Filter for our tags and organize by ID
     target_tags = {}
@@ -177,6 +233,13 @@ while True:
         if r.tag_id in [0, 1, 2, 3, 4, 5, 6, 7]:
             target_tags[r.tag_id] = r
     
+    # Fit the body shape once per new frame (occluded tail tags are filled in)
+    if new_frame:
+        body_shape = body.estimate(positions_from_detections(results))
+        if gait_tracker:
+            gait_tracker.add(capture_time(cap), np.degrees(body_shape.joint_angles))
+        trace.mark("body shape")
+    
     # Display how many of our target tags were found
     cv2.putText(frame, f"Target tags found: {len(target_tags)}/{8}", 
                 (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 
@@ -211,20 +274,22 @@ while True:
         # Draw center point
         cv2.circle(frame, (center[0], center[1]), 3, color, -1)
     
-    # Draw connecting lines between tags 1-2-3-4-5-6 (the tail)
-    connection_pairs = [(1, 2), (2, 3), (3, 4), (4, 5), (5, 6)]
-    for start_id, end_id in connection_pairs:
-        if start_id in tag_centers and end_id in tag_centers:
-            # Draw the connection line
-            start_center = tag_centers[start_id]
-            end_center = tag_centers[end_id]
-            
-            # Draw a thicker yellow line to represent the connection
-            cv2.line(frame, tuple(start_center), tuple(end_center), (255, 255, 0), 3)  # Yellow
+    # Draw the fitted tail centerline through tags 1-2-3-4-5-6 and the joint angles
+    draw_body_shape(frame, body_shape)
+    
+    # Drawing is not part of any stage
+    trace.skip()
     
     # Check if we have our coordinate system reference tags (now using tags 0 and 7)
     new_coordinate_system = False
-    if 0 in target_tags and 7 in target_tags:
+    camera_pose = anchor_map.localize(results, camera_params) if anchor_map else None
+    if camera_pose is not None:
+        # Same world frame as tags 0 and 7 define, but any subset of anchors will do
+        coord_system = camera_pose.coord_system()
+        new_coordinate_system = True
+        cv2.putText(frame, f"Map: anchors {camera_pose.anchors}, reprojection {camera_pose.error:.1f}px",
+                    (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+    elif anchor_map is None and 0 in target_tags and 7 in target_tags:
         tag0 = target_tags[0]
         tag7 = target_tags[7]
         
@@ -278,6 +343,10 @@ while True:
     if new_coordinate_system:
         # Reference positions
         origin_pos = (0, 0)  # Tag 0 is our origin now
+        if camera_pose is not None:
+            # The axis tag is fixed in the map, so it is the target even when it is out of view
+            axis_T = anchor_map.anchors[anchor_map.axis_id]
+            target_pos = (float(axis_T[0, 3]), float(axis_T[1, 3]))
         
         # Calculate positions of all tags in our new coordinate system
         for tag_id, tag in target_tags.items():
@@ -317,9 +386,10 @@ while True:
                 robot_state['y'] = y_coord
                 robot_state['theta'] = robot_theta
                 
-                # Add point to trajectory
-                trajectory_x.append(x_coord)
-                trajectory_y.append(y_coord)
+                # Add point to trajectory (a repeated frame adds no new sample)
+                if new_frame:
+                    trajectory_x.append(x_coord)
+                    trajectory_y.append(y_coord)
                 
                 # Limit trajectory size
                 if len(trajectory_x) > max_trajectory_points:
@@ -333,21 +403,42 @@ while True:
                 cv2.arrowedLine(frame, tuple(center), (head_x, head_y), (0, 255, 0), 2)
             
             # If it's tag 7, update target position
-            if tag_id == 7:
+            if tag_id == 7 and camera_pose is None:
                 target_pos = (x_coord, y_coord)
     
+    trace.mark("world_transform")
+    
     # Calculate and display control signals if we have robot position
     if robot_pos is not None and new_coordinate_system:
-        # Calculate control step
-        rudder_angle, tail_amplitude, thrust, integral_theta, integral_speed, theta_error, speed_error = calculate_control_step(
-            robot_pos, target_pos, robot_state, dt, integral_theta, integral_speed, prev_theta_error, prev_speed_error)
-        
-        # Update PID memory
-        prev_theta_error = theta_error
-        prev_speed_error = speed_error
+        # Only step the PID on new frames: a repeated frame is a zero-motion
+        # sample that would corrupt the derivative and integral terms
+        if new_frame:
+            # Calculate control step
+            rudder_angle, tail_amplitude, thrust, integral_theta, integral_speed, theta_error, speed_error = calculate_control_step(
+                robot_pos, target_pos, robot_state, dt, integral_theta, integral_speed, prev_theta_error, prev_speed_error)
+            trace.mark("pid")
+            
+            # Update PID memory
+            prev_theta_error = theta_error
+            prev_speed_error = speed_error
+            
+            # The PID above always runs so its memory stays current for the
+            # ticks where the MPC misses its budget and the PID output is used
+            if mpc:
+                plan = mpc.plan(robot_state, target_pos)
+                if plan is not None:
+                    rudder_angle, tail_amplitude = plan.rudder, plan.tail_amplitude
+                    thrust = k_t * tail_amplitude**2
+                    controller_mode = f"MPC ({plan.candidates} rollouts, {plan.elapsed * 1000:.1f} ms)"
+                else:
+                    controller_mode = f"PID fallback (MPC over budget x{mpc.budget_misses})"
+                trace.mark("mpc")
         
         # Display control signals
-        info_y = 390
+        info_y = 370
+        cv2.putText(frame, f"Controller: {controller_mode}", 
+                    (10, info_y), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+        info_y += 20
         cv2.putText(frame, f"Robot: ({robot_pos[0]:.2f}, {robot_pos[1]:.2f})m", 
                     (10, info_y), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
         info_y += 20
@@ -381,6 +472,12 @@ while True:
             h, w = plot_img.shape[:2]
             frame[frame.shape[0]-h:frame.shape[0], frame.shape[1]-w:frame.shape[1]] = plot_img
     
+    # End-to-end time from capture to a finished frame, then per-stage p50/p95/p99
+    trace.finish()
+    draw_latency_overlay(frame, latency)
+    if gait_tracker:
+        draw_gait_health(frame, gait_tracker.report())
+    
     # Display the frame
     cv2.namedWindow('AprilTag Navigation System', cv2.WINDOW_NORMAL)
     cv2.setWindowProperty('AprilTag Navigation System', cv2.WND_PROP_FULLSCREEN, cv2.WINDOW_FULLSCREEN)
@@ -390,4 +487,6 @@ while True:
         break
 
 cap.release()
+if recorder:
+    recorder.close()
 cv2.destroyAllWindows()
\ No newline at end of file
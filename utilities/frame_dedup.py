@@ -0,0 +1,59 @@
+"""
+Cheap check for repeated camera frames.
+
+DroidCam and some USB cameras hand the same image to cv2.VideoCapture
+more than once. Running AprilTag detection and pose again on it costs
+CPU, logs duplicate rows, and feeds zero-motion samples into the PID
+derivative. FrameChangeDetector compares a small area-downsampled copy
+of each frame (and, when available, the capture timestamp) with the
+previous one so the caller can reuse its last results instead.
+"""
+import hashlib
+
+import cv2
+import numpy as np
+
+THUMBNAIL_SIZE = (32, 24)  # (width, height) the frame is reduced to before comparing
+
+
+class FrameChangeDetector:
+    """
+    threshold=0 treats only bit-identical thumbnails as repeats (hash
+    compare); a positive threshold also catches re-encoded copies whose mean
+    absolute thumbnail difference (0-255 scale) is at most that value.
+    """
+
+    def __init__(self, threshold=0.0, size=THUMBNAIL_SIZE):
+        self.threshold = threshold
+        self.size = size
+        self.frames = 0
+        self.duplicates = 0
+        self._last_thumbnail = None
+        self._last_digest = None
+        self._last_timestamp = None
+
+    def is_new(self, frame, timestamp=None):
+        """True if frame differs from the previous one (the first frame is always new)."""
+        self.frames += 1
+
+        if timestamp is not None and timestamp == self._last_timestamp:
+            self.duplicates += 1
+            return False
+        self._last_timestamp = timestamp
+
+        thumbnail = cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA)
+        if self.threshold > 0:
+            repeated = (self._last_thumbnail is not None and
+                        np.mean(cv2.absdiff(thumbnail, self._last_thumbnail)) <= self.threshold)
+            self._last_thumbnail = thumbnail
+        else:
+            digest = hashlib.blake2b(thumbnail.tobytes(), digest_size=16).digest()
+            repeated = digest == self._last_digest
+            self._last_digest = digest
+
+        if repeated:
+            self.duplicates += 1
+        return not repeated
+
+    def duplicate_ratio(self):
+        return self.duplicates / self.frames if self.frames else 0.0
@@ -0,0 +1,294 @@
+"""
+Commanded vs measured gait: how well the tail follows the sine wave.
+
+The commanded gait (amplitude, frequency, phase_shift, joint_factors as
+sent by controller_gui.py / debug/server.py) gives every joint a sinusoid
+at one known frequency. GaitTracker keeps a sliding window of measured
+joint angles (body_shape.py, from the tail tags) and fits
+a*sin(wt) + b*cos(wt) + c to every joint in one least-squares solve, i.e.
+the single DFT bin at the commanded frequency, which also works on the
+uneven frame timestamps of a camera. Per joint it reports the amplitude
+ratio, the phase lag behind the command and the RMS error against the
+commanded waveform.
+
+The host does not know the phase of the Arduino's gait clock, so unless
+the command start time t0 is given the lag is referenced to the first
+joint: its lag is taken as the common delay, and the other joints show
+how much more (or less) they lag. The RMS error is computed after
+removing that common delay.
+
+Live: controller-final.py --gait-frequency 0.8 draws the servo health.
+Offline, over a track_log.py recording:
+
+    python gait_tracking.py apriltag_track_20250427_231212 --frequency 0.8
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+
+from body_shape import BODY_TAGS, BodyShapeEstimator
+from track_log import load_track_log
+
+# The gait model lives with the visualizers in Andres_code/
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Andres_code"))
+from gait import CONVENTIONS, joint_gains_and_phases
+
+# arduino.ino and debug/test.cpp drive joint k with sin(wt + k * phase_shift),
+# which is the "swim_vis" convention with direction 1
+FIRMWARE_CONVENTION = "swim_vis"
+
+DEFAULT_WINDOW_S = 5.0       # sliding window (at least a few tail beats at 0.8 Hz)
+MIN_CYCLES = 1.5             # a fit needs this many cycles in the window
+MIN_SAMPLES = 12
+CAPACITY = 2048              # frames kept (well over a window at camera rate)
+
+# Health limits: a joint outside any of them is flagged
+HEALTHY_RATIO = (0.6, 1.4)
+HEALTHY_LAG_DEG = 45.0
+HEALTHY_RMS_FRACTION = 0.5   # RMS error relative to the commanded amplitude
+
+
+def wrap_degrees(angle):
+    return (np.asarray(angle) + 180.0) % 360.0 - 180.0
+
+
+def fit_sinusoid(t, values, frequency):
+    """
+    Least-squares amplitude and phase (deg) of values (T, J) at frequency,
+    as values ~ amplitude * sin(2 pi f t + phase) + offset. Also returns
+    the offsets. Columns with NaN samples are fitted on their finite rows.
+    """
+    omega = 2 * np.pi * frequency
+    basis = np.column_stack((np.sin(omega * t), np.cos(omega * t), np.ones_like(t)))
+
+    finite = np.isfinite(values)
+    if finite.all():
+        coefficients = np.linalg.lstsq(basis, values, rcond=None)[0]
+    else:
+        # Missing samples differ per joint, so solve joint by joint
+        coefficients = np.full((3, values.shape[1]), np.nan)
+        for j in range(values.shape[1]):
+            rows = finite[:, j]
+            if rows.sum() >= MIN_SAMPLES:
+                coefficients[:, j] = np.linalg.lstsq(basis[rows], values[rows, j], rcond=None)[0]
+
+    a, b, offset = coefficients
+    return np.hypot(a, b), np.degrees(np.arctan2(b, a)), offset
+
+
+class GaitTracker:
+    """
+    Sliding-window tracking error of measured joint angles (deg) against a
+    sinusoidal gait command.
+    """
+
+    def __init__(self, amplitude, frequency, phase_shift, joint_factors, direction=1,
+                 convention=FIRMWARE_CONVENTION, t0=None, window_s=DEFAULT_WINDOW_S, signs=None,
+                 capacity=CAPACITY):
+        self.window_s = window_s
+        self.joints = len(joint_factors)
+        # Measured angle sign per joint (servo mounting may flip it)
+        self.signs = np.ones(self.joints) if signs is None else np.asarray(signs, dtype=float)
+        self._times = np.zeros(capacity)
+        self._angles = np.zeros((capacity, self.joints))
+        self._count = 0
+        self.set_gait(amplitude, frequency, phase_shift, joint_factors, direction, convention, t0)
+
+    def set_gait(self, amplitude, frequency, phase_shift, joint_factors, direction=1,
+                 convention=FIRMWARE_CONVENTION, t0=None):
+        """New command; samples from before the change are dropped."""
+        gains, phases = joint_gains_and_phases(amplitude, phase_shift, joint_factors,
+                                               direction, convention)
+        self.frequency = float(frequency)
+        # Commanded phasors: gain * sin(2 pi f (t - t0) + phase), with negative
+        # gains folded into the phase
+        self.command_amplitude = np.abs(gains)
+        self.command_phase = wrap_degrees(np.degrees(phases) + np.where(gains < 0, 180.0, 0.0))
+        self.t0 = t0
+        self._count = 0
+
+    def add(self, t, angles):
+        """Append one frame of measured joint angles (deg, NaN where unknown)."""
+        capacity = len(self._times)
+        index = self._count % capacity
+        self._times[index] = t
+        values = np.full(self.joints, np.nan)
+        angles = np.asarray(angles, dtype=float)[:self.joints]
+        values[:len(angles)] = angles
+        self._angles[index] = values * self.signs
+        self._count += 1
+
+    def window(self):
+        """(t, angles) of the samples within window_s of the newest, oldest first."""
+        capacity = len(self._times)
+        count = min(self._count, capacity)
+        order = (np.arange(count) + self._count - count) % capacity
+        t, angles = self._times[order], self._angles[order]
+        if count:
+            first = np.searchsorted(t, t[-1] - self.window_s)
+            t, angles = t[first:], angles[first:]
+        return t, angles
+
+    def report(self):
+        """
+        Per-joint tracking error over the current window, or None while the
+        window holds too little data. Angles in deg, lag also in seconds.
+        """
+        t, angles = self.window()
+        if len(t) < MIN_SAMPLES or (t[-1] - t[0]) * self.frequency < MIN_CYCLES:
+            return None
+        return self.compare(t, angles)
+
+    def compare(self, t, angles):
+        """Tracking error of measured angles (T, J) sampled at times t."""
+        # Fit relative to the window start for a well-conditioned basis
+        start = t[0]
+        amplitude, phase, offset = fit_sinusoid(t - start, angles, self.frequency)
+
+        # Commanded phase at the window start (absolute only when t0 is known)
+        elapsed = 0.0 if self.t0 is None else start - self.t0
+        command_phase = wrap_degrees(self.command_phase + 360.0 * self.frequency * elapsed)
+        lag = wrap_degrees(command_phase - phase)
+
+        if self.t0 is None:
+            # Unknown clock offset: take the first joint's lag as the common delay
+            common = lag[0] if np.isfinite(lag[0]) else 0.0
+            reference = "joint1"
+        else:
+            common = 0.0
+            reference = "absolute"
+        relative_lag = wrap_degrees(lag - common)
+
+        # Commanded waveform delayed by the common lag, against the measured one
+        omega = 2 * np.pi * self.frequency
+        cycle = omega * (t - start)[:, None] + np.radians(command_phase - common)
+        expected = self.command_amplitude * np.sin(cycle) + offset
+        rms = np.sqrt(np.nanmean((angles - expected) ** 2, axis=0))
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ratio = amplitude / self.command_amplitude
+            rms_fraction = rms / self.command_amplitude
+        healthy = ((ratio >= HEALTHY_RATIO[0]) & (ratio <= HEALTHY_RATIO[1])
+                   & (np.abs(relative_lag) <= HEALTHY_LAG_DEG) & (rms_fraction <= HEALTHY_RMS_FRACTION))
+
+        return {
+            "t": float(t[-1]),
+            "samples": int(len(t)),
+            "reference": reference,
+            # Delay of the whole wave behind the command, only known with t0
+            "common_lag_s": float(lag[0] / (360.0 * self.frequency)) if self.t0 is not None else None,
+            "command_amplitude": self.command_amplitude.tolist(),
+            "measured_amplitude": amplitude.tolist(),
+            "amplitude_ratio": ratio.tolist(),
+            "phase_lag_deg": relative_lag.tolist(),
+            "phase_lag_s": (relative_lag / (360.0 * self.frequency)).tolist(),
+            "rms_error": rms.tolist(),
+            "healthy": healthy.tolist(),
+        }
+
+
+def draw_gait_health(frame, report, origin=None):
+    """One 'J<n> ratio lag rms' line per joint, green when healthy, red otherwise."""
+    import cv2  # only needed by the scripts that display frames
+
+    # Default: right-hand side, below the latency overlay
+    x, y = origin if origin is not None else (frame.shape[1] - 360, 170)
+    if report is None:
+        cv2.putText(frame, "Gait tracking: collecting...", (x, y), cv2.FONT_HERSHEY_SIMPLEX, 0.5,
+                    (200, 200, 200), 1)
+        return frame
+
+    title = f"Gait tracking (lag vs {report['reference']})"
+    if report["common_lag_s"] is not None:
+        title += f", joint 1 delay {report['common_lag_s'] * 1000:.0f} ms"
+    cv2.putText(frame, title, (x, y), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+    for j, healthy in enumerate(report["healthy"]):
+        y += 18
+        color = (0, 255, 0) if healthy else (0, 0, 255)
+        cv2.putText(frame, f"J{j + 1}: ratio {report['amplitude_ratio'][j]:.2f} "
+                           f"lag {report['phase_lag_deg'][j]:+5.0f} deg "
+                           f"rms {report['rms_error'][j]:4.1f} deg",
+                    (x, y), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1)
+    return frame
+
+
+def joint_angles_from_log(path, tag_ids=BODY_TAGS):
+    """
+    Per-frame (t, joint angles in deg) from a track_log.py recording, using
+    the tag pixel centers and the same body-shape fit as the live view.
+    """
+    log = load_track_log(path)
+    on_body = np.isin(log["tag_id"], tag_ids)
+    frames, frame_row = np.unique(log["frame"][on_body], return_inverse=True)
+    if not len(frames):
+        return np.empty(0), np.empty((0, len(tag_ids) - 2))
+
+    # (frames, tags, 2) pixel centers, NaN where a tag was not detected
+    chain_index = np.searchsorted(tag_ids, log["tag_id"][on_body])
+    positions = np.full((len(frames), len(tag_ids), 2), np.nan)
+    positions[frame_row, chain_index] = np.column_stack((log["u"][on_body], log["v"][on_body]))
+    t = np.full(len(frames), np.nan)
+    t[frame_row] = log["t"][on_body]
+
+    body = BodyShapeEstimator(tag_ids=tag_ids)
+    angles = np.array([body.estimate(frame_positions).joint_angles for frame_positions in positions])
+    return t, np.degrees(angles)
+
+
+def analyze_log(path, tracker, step_s=1.0):
+    """Reports over windows of tracker.window_s, one every step_s seconds."""
+    t, angles = joint_angles_from_log(path)
+    reports = []
+    if not len(t):
+        return reports
+
+    for end in np.arange(t[0] + tracker.window_s, t[-1] + 1e-9, step_s):
+        rows = (t > end - tracker.window_s) & (t <= end)
+        if rows.sum() >= MIN_SAMPLES:
+            reports.append(tracker.compare(t[rows], angles[rows]))
+    return reports
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Commanded vs measured gait tracking error")
+    parser.add_argument("recording", help="track_log.py directory (single-tag-tracker.py output)")
+    parser.add_argument("--amplitude", type=float, default=15.0)
+    parser.add_argument("--frequency", type=float, default=0.8)
+    parser.add_argument("--phase-shift", type=float, default=60.0)
+    parser.add_argument("--joint-factors", type=float, nargs="+", default=[1.0, 1.0, 1.0, 1.0])
+    parser.add_argument("--direction", type=int, default=1)
+    parser.add_argument("--convention", choices=CONVENTIONS, default=FIRMWARE_CONVENTION,
+                        help="wave sign convention of the commanded gait (default: the firmware's)")
+    parser.add_argument("--window", type=float, default=DEFAULT_WINDOW_S)
+    parser.add_argument("--step", type=float, default=1.0)
+    args = parser.parse_args()
+
+    tracker = GaitTracker(args.amplitude, args.frequency, args.phase_shift, args.joint_factors,
+                          args.direction, args.convention, window_s=args.window)
+    reports = analyze_log(args.recording, tracker, args.step)
+    if not reports:
+        print(f"Not enough tail tag data in {args.recording} for a {args.window:.1f} s window")
+        return
+
+    print(f"{'t':>8s}  " + "  ".join(f"{'J' + str(j + 1) + ' ratio/lag/rms':>22s}"
+                                     for j in range(tracker.joints)))
+    for report in reports:
+        cells = [f"{r:5.2f}/{lag:+5.0f}/{rms:5.1f}{' ' if ok else '!'}" for r, lag, rms, ok in
+                 zip(report["amplitude_ratio"], report["phase_lag_deg"], report["rms_error"], report["healthy"])]
+        print(f"{report['t'] - reports[0]['t']:8.1f}  " + "  ".join(f"{cell:>22s}" for cell in cells))
+
+    # Summary over the whole recording
+    ratio = np.nanmedian([r["amplitude_ratio"] for r in reports], axis=0)
+    lag = np.nanmedian([r["phase_lag_deg"] for r in reports], axis=0)
+    rms = np.nanmedian([r["rms_error"] for r in reports], axis=0)
+    healthy = np.mean([r["healthy"] for r in reports], axis=0)
+    print("\nMedian over windows:")
+    for j in range(tracker.joints):
+        print(f"  J{j + 1}: ratio {ratio[j]:.2f}  lag {lag[j]:+.0f} deg  rms {rms[j]:.1f} deg  "
+              f"healthy {100 * healthy[j]:.0f}% of windows")
+
+
+if __name__ == "__main__":
+    main()
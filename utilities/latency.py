@@ -0,0 +1,130 @@
+"""
+Lightweight per-stage latency tracking for the vision -> control -> serial path.
+
+Usage:
+
+    latency = LatencyRecorder()
+
+    trace = latency.trace()          # starts the clock for one frame
+    ret, frame = cap.read()
+    trace.mark("capture")            # time since the previous mark
+    results = detector.detect(...)
+    trace.mark("detect")
+    ...
+    trace.finish()                   # records "total" for the whole frame
+
+or, for a single stage, `with latency.span("serial_write"): ser.write(...)`.
+
+Each stage keeps its last WINDOW_SIZE durations in a NumPy ring, so
+summary() reports p50/p95/p99 over recent load rather than all time.
+All timestamps come from time.perf_counter() (monotonic).
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+WINDOW_SIZE = 1000  # recent samples kept per stage
+PERCENTILES = (50, 95, 99)
+
+
+class StageStats:
+    def __init__(self, window=WINDOW_SIZE):
+        self.samples = np.zeros(window)
+        self.count = 0  # total samples ever recorded
+        self.max = 0.0
+
+    def add(self, seconds):
+        self.samples[self.count % len(self.samples)] = seconds
+        self.count += 1
+        self.max = max(self.max, seconds)
+
+    def recent(self):
+        return self.samples[:min(self.count, len(self.samples))]
+
+
+class FrameTrace:
+    """Marks the end of each stage for one frame; see LatencyRecorder.trace()."""
+
+    def __init__(self, recorder):
+        self.recorder = recorder
+        self.start = time.perf_counter()
+        self.last = self.start
+
+    def mark(self, stage):
+        now = time.perf_counter()
+        self.recorder.record(stage, now - self.last)
+        self.last = now
+
+    def skip(self):
+        # Restart the stage clock without recording (e.g. after drawing)
+        self.last = time.perf_counter()
+
+    def finish(self, stage="total"):
+        self.recorder.record(stage, time.perf_counter() - self.start)
+
+
+class LatencyRecorder:
+    """Thread-safe collection of per-stage duration windows."""
+
+    def __init__(self, window=WINDOW_SIZE):
+        self.window = window
+        self.stages = {}  # insertion order = pipeline order
+        self._lock = threading.Lock()
+
+    def record(self, stage, seconds):
+        with self._lock:
+            stats = self.stages.get(stage)
+            if stats is None:
+                stats = self.stages[stage] = StageStats(self.window)
+            stats.add(seconds)
+
+    @contextmanager
+    def span(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start)
+
+    def trace(self):
+        return FrameTrace(self)
+
+    def summary(self):
+        """{stage: {count, mean_ms, p50_ms, p95_ms, p99_ms, max_ms}}"""
+        with self._lock:
+            snapshot = {stage: (stats.recent().copy(), stats.count, stats.max)
+                        for stage, stats in self.stages.items()}
+
+        result = {}
+        for stage, (recent, count, worst) in snapshot.items():
+            if not len(recent):
+                continue
+            percentiles = np.percentile(recent, PERCENTILES) * 1000
+            entry = {"count": count, "mean_ms": round(float(recent.mean()) * 1000, 3)}
+            for p, value in zip(PERCENTILES, percentiles):
+                entry[f"p{p}_ms"] = round(float(value), 3)
+            entry["max_ms"] = round(worst * 1000, 3)
+            result[stage] = entry
+        return result
+
+    def reset(self):
+        with self._lock:
+            self.stages = {}
+
+
+def draw_latency_overlay(frame, recorder, origin=None, color=(0, 255, 255)):
+    """Draw one 'stage p50/p95/p99' line per stage in the top-right corner."""
+    import cv2  # only needed by the scripts that display frames
+
+    summary = recorder.summary()
+    if not summary:
+        return frame
+
+    x, y = origin if origin is not None else (frame.shape[1] - 330, 30)
+    for stage, entry in summary.items():
+        text = f"{stage:>15}: {entry['p50_ms']:6.1f} {entry['p95_ms']:6.1f} {entry['p99_ms']:6.1f} ms"
+        cv2.putText(frame, text, (x, y), cv2.FONT_HERSHEY_PLAIN, 1.0, color, 1)
+        y += 16
+    return frame
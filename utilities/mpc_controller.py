@@ -0,0 +1,131 @@
+"""
+Sampling-based model predictive control for the fish robot.
+
+Each control tick SamplingMPC.plan() draws a few hundred candidate
+(rudder, tail amplitude) sequences around the previous plan, rolls them
+all out at once through the bicycle model of update_state() in
+Andres_code/improved_andres.py, and returns the first action of the
+cheapest one. Candidates are evaluated in batches until the time budget
+runs out; if not even the first batch fits in the budget, plan() returns
+None and the caller uses its PID step instead.
+
+    mpc = SamplingMPC(dt=dt)
+    plan = mpc.plan(robot_state, target_pos)
+    if plan is None:
+        ...  # calculate_control_step() as before
+"""
+import collections
+import time
+
+import numpy as np
+
+DEFAULT_HORIZON = 15        # steps of dt looked ahead
+DEFAULT_SAMPLES = 256       # candidate sequences per tick
+DEFAULT_BATCH = 64          # candidates rolled out between budget checks
+DEFAULT_BUDGET_S = 0.01     # planning time per tick
+MAX_SPEED = 1.5             # speed clip of the bicycle model
+
+MPCPlan = collections.namedtuple("MPCPlan", "rudder tail_amplitude cost candidates elapsed predicted")
+
+
+class SamplingMPC:
+    def __init__(self, dt=0.1, L=1.0, k_t=1.0, max_steering=np.deg2rad(30), max_tail_amplitude=1.5,
+                 horizon=DEFAULT_HORIZON, samples=DEFAULT_SAMPLES, batch=DEFAULT_BATCH,
+                 budget_s=DEFAULT_BUDGET_S, rudder_sigma=None, amplitude_sigma=None,
+                 distance_weight=1.0, terminal_weight=5.0, rudder_weight=0.1, rate_weight=1.0, seed=None):
+        self.dt = dt
+        self.L = L
+        self.k_t = k_t
+        self.max_steering = max_steering
+        self.max_tail_amplitude = max_tail_amplitude
+        self.horizon = horizon
+        self.samples = samples
+        self.batch = batch
+        self.budget_s = budget_s
+        self.rudder_sigma = max_steering / 2 if rudder_sigma is None else rudder_sigma
+        self.amplitude_sigma = max_tail_amplitude / 4 if amplitude_sigma is None else amplitude_sigma
+        self.distance_weight = distance_weight
+        self.terminal_weight = terminal_weight
+        self.rudder_weight = rudder_weight
+        self.rate_weight = rate_weight
+        self.rng = np.random.default_rng(seed)
+        self.budget_misses = 0
+        self.reset()
+
+    def reset(self):
+        """Forget the warm start (e.g. after the robot was lost or moved)."""
+        self._nominal = np.zeros((self.horizon, 2))
+        self._nominal[:, 1] = self.max_tail_amplitude / 2
+
+    def rollout(self, state, controls):
+        """
+        Positions and headings (K, H) of K control sequences (K, H, 2) from
+        one state, stepping all candidates together through update_state().
+        """
+        count = len(controls)
+        x = np.full(count, float(state['x']))
+        y = np.full(count, float(state['y']))
+        theta = np.full(count, float(state['theta']))
+        xs = np.empty((count, self.horizon))
+        ys = np.empty((count, self.horizon))
+        thetas = np.empty((count, self.horizon))
+
+        speed = np.clip(self.k_t * controls[:, :, 1] ** 2, 0, MAX_SPEED)
+        turn = speed / self.L * np.tan(controls[:, :, 0])
+        for step in range(self.horizon):
+            x = x + speed[:, step] * np.cos(theta) * self.dt
+            y = y + speed[:, step] * np.sin(theta) * self.dt
+            theta = theta + turn[:, step] * self.dt
+            xs[:, step], ys[:, step], thetas[:, step] = x, y, theta
+        return xs, ys, thetas
+
+    def cost(self, xs, ys, controls, target):
+        distance = np.hypot(xs - target[0], ys - target[1])
+        rudder = controls[:, :, 0]
+        # Rate term includes the step from the rudder currently applied
+        rate = np.diff(rudder, axis=1, prepend=self._nominal[0, 0])
+        return (self.distance_weight * distance.mean(axis=1)
+                + self.terminal_weight * distance[:, -1]
+                + self.rudder_weight * np.mean(rudder ** 2, axis=1)
+                + self.rate_weight * np.mean(rate ** 2, axis=1))
+
+    def _candidates(self, count):
+        noise = self.rng.normal(size=(count, self.horizon, 2)) * [self.rudder_sigma, self.amplitude_sigma]
+        controls = self._nominal + noise
+        # Keep the unperturbed warm start and a straight full-ahead option in the set
+        controls[0] = self._nominal
+        if count > 1:
+            controls[1] = [0.0, self.max_tail_amplitude]
+        np.clip(controls[:, :, 0], -self.max_steering, self.max_steering, out=controls[:, :, 0])
+        np.clip(controls[:, :, 1], 0, self.max_tail_amplitude, out=controls[:, :, 1])
+        return controls
+
+    def plan(self, state, target):
+        """Best first (rudder, tail_amplitude) within the time budget, or None if over budget."""
+        start = time.perf_counter()
+        best_cost, best_controls, best_path = np.inf, None, None
+        evaluated = 0
+
+        while evaluated < self.samples:
+            controls = self._candidates(min(self.batch, self.samples - evaluated))
+            xs, ys, _ = self.rollout(state, controls)
+            costs = self.cost(xs, ys, controls, target)
+            evaluated += len(controls)
+
+            elapsed = time.perf_counter() - start
+            if best_controls is None and elapsed > self.budget_s:
+                # Not even one batch fits: let the caller fall back to PID
+                self.budget_misses += 1
+                return None
+
+            i = int(np.argmin(costs))
+            if costs[i] < best_cost:
+                best_cost, best_controls = costs[i], controls[i].copy()
+                best_path = np.column_stack((xs[i], ys[i]))
+            if elapsed > self.budget_s:
+                break
+
+        # Warm start for the next tick: shift the plan by one step
+        self._nominal = np.vstack((best_controls[1:], best_controls[-1:]))
+        return MPCPlan(float(best_controls[0, 0]), float(best_controls[0, 1]), float(best_cost),
+                       evaluated, time.perf_counter() - start, best_path)
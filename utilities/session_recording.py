@@ -0,0 +1,251 @@
+"""
+Record camera sessions to disk and replay them in place of cv2.VideoCapture.
+
+A session is a directory:
+
+    meta.json   encoding ("jpeg", "png" or "raw") and frame shape
+    frames.bin  encoded frames back to back
+    index.bin   one record per frame: capture time (float64, time.time()),
+                byte offset (uint64) and length (uint32) in frames.bin
+
+Both data files are append-only, so a session cut short by a crash still
+replays up to the last complete frame. ReplayCapture memory-maps frames.bin
+and can seek by frame or by time, and by default runs as fast as the
+pipeline consumes frames.
+
+    cap = open_capture("recordings/tank_run1")   # or a camera index / URL
+    ret, frame = cap.read()
+"""
+import json
+import mmap
+import os
+import struct
+import time
+
+import cv2
+import numpy as np
+
+INDEX_DTYPE = np.dtype([("t", "<f8"), ("offset", "<u8"), ("length", "<u4")])
+_INDEX_STRUCT = struct.Struct("<dQI")
+ENCODINGS = ("jpeg", "png", "raw")
+
+
+class SessionRecorder:
+    def __init__(self, path, encoding="jpeg", jpeg_quality=90):
+        if encoding not in ENCODINGS:
+            raise ValueError(f"Unknown encoding {encoding}, expected one of {ENCODINGS}")
+        os.makedirs(path, exist_ok=True)
+        if os.path.exists(os.path.join(path, "index.bin")):
+            raise FileExistsError(f"{path} already contains a recording")
+
+        self.path = path
+        self.encoding = encoding
+        self.jpeg_quality = jpeg_quality
+        self.shape = None
+        self.frame_count = 0
+        self._offset = 0
+        self._frames = open(os.path.join(path, "frames.bin"), "wb")
+        self._index = open(os.path.join(path, "index.bin"), "wb")
+
+    def _encode(self, frame):
+        if self.encoding == "raw":
+            return np.ascontiguousarray(frame).tobytes()
+        if self.encoding == "jpeg":
+            ok, data = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+        else:
+            ok, data = cv2.imencode(".png", frame)
+        if not ok:
+            raise ValueError("Could not encode frame")
+        return data.tobytes()
+
+    def _write_meta(self):
+        meta = {"version": 1, "encoding": self.encoding, "shape": list(self.shape),
+                "dtype": "uint8", "created": time.strftime("%Y-%m-%d %H:%M:%S")}
+        with open(os.path.join(self.path, "meta.json"), "w") as f:
+            json.dump(meta, f, indent=2)
+
+    def write(self, frame, timestamp=None):
+        """Append a frame; timestamp defaults to now (time.time())."""
+        if timestamp is None:
+            timestamp = time.time()
+        if self.shape is None:
+            self.shape = frame.shape
+            self._write_meta()
+        elif self.encoding == "raw" and frame.shape != self.shape:
+            raise ValueError(f"Raw sessions need a fixed frame shape {self.shape}, got {frame.shape}")
+
+        data = self._encode(frame)
+        self._frames.write(data)
+        self._index.write(_INDEX_STRUCT.pack(timestamp, self._offset, len(data)))
+        self._offset += len(data)
+        self.frame_count += 1
+
+        # Make every frame durable, like the CSV logs
+        self._frames.flush()
+        self._index.flush()
+
+    def close(self):
+        self._frames.close()
+        self._index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ReplayCapture:
+    """
+    cv2.VideoCapture stand-in that reads a recorded session.
+
+    realtime=True paces frames by their recorded timestamps (divided by
+    speed); otherwise read() returns frames as fast as they are decoded.
+    After a read, `timestamp` holds the frame's original capture time.
+    """
+
+    def __init__(self, path, realtime=False, speed=1.0, loop=False):
+        self.path = path
+        self.realtime = realtime
+        self.speed = speed
+        self.loop = loop
+        self.position = 0
+        self.timestamp = None
+        self._pace_anchor = None  # (wall time, recorded time) at the last seek/start
+
+        with open(os.path.join(path, "meta.json")) as f:
+            self.meta = json.load(f)
+        self.shape = tuple(self.meta["shape"])
+
+        self._frames_file = open(os.path.join(path, "frames.bin"), "rb")
+        size = os.fstat(self._frames_file.fileno()).st_size
+        self._data = mmap.mmap(self._frames_file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+        # Ignore a partly written last record (recording interrupted)
+        raw_index = np.fromfile(os.path.join(path, "index.bin"), dtype=np.uint8)
+        usable = len(raw_index) - len(raw_index) % INDEX_DTYPE.itemsize
+        index = raw_index[:usable].view(INDEX_DTYPE)
+        self.index = index[index["offset"] + index["length"] <= size]
+        self.times = self.index["t"]
+
+    def __len__(self):
+        return len(self.index)
+
+    def isOpened(self):
+        return self._data is not None and len(self.index) > 0
+
+    def _decode(self, record):
+        start = int(record["offset"])
+        data = self._data[start:start + int(record["length"])]
+        if self.meta["encoding"] == "raw":
+            return np.frombuffer(data, dtype=np.uint8).reshape(self.shape).copy()
+        return cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_UNCHANGED)
+
+    def _wait_for(self, recorded_time):
+        if self._pace_anchor is None:
+            self._pace_anchor = (time.monotonic(), recorded_time)
+            return
+        wall_start, recorded_start = self._pace_anchor
+        delay = wall_start + (recorded_time - recorded_start) / self.speed - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def grab(self):
+        if self.position >= len(self.index):
+            if not self.loop or not len(self.index):
+                return False
+            self.set_frame(0)
+        return True
+
+    def read(self):
+        if not self.grab():
+            return False, None
+        record = self.index[self.position]
+        if self.realtime:
+            self._wait_for(record["t"])
+        frame = self._decode(record)
+        self.timestamp = float(record["t"])
+        self.position += 1
+        return frame is not None, frame
+
+    def set_frame(self, position):
+        self.position = int(np.clip(position, 0, len(self.index)))
+        self._pace_anchor = None
+
+    def seek_time(self, seconds):
+        """Jump to the first frame at or after `seconds` from the session start."""
+        if len(self.index):
+            self.set_frame(np.searchsorted(self.times, self.times[0] + seconds))
+
+    def duration(self):
+        return float(self.times[-1] - self.times[0]) if len(self.index) else 0.0
+
+    def fps(self):
+        if len(self.index) < 2:
+            return 0.0
+        return 1.0 / float(np.median(np.diff(self.times)))
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FRAME_COUNT:
+            return float(len(self.index))
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            return float(self.position)
+        if prop == cv2.CAP_PROP_POS_MSEC:
+            if not len(self.index):
+                return 0.0
+            current = self.times[min(self.position, len(self.index) - 1)]
+            return float(current - self.times[0]) * 1000.0
+        if prop == cv2.CAP_PROP_FPS:
+            return self.fps()
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return float(self.shape[1])
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return float(self.shape[0])
+        return 0.0  # same as VideoCapture for unsupported properties
+
+    def set(self, prop, value):
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            self.set_frame(value)
+            return True
+        if prop == cv2.CAP_PROP_POS_MSEC:
+            self.seek_time(value / 1000.0)
+            return True
+        return False
+
+    def release(self):
+        if self._data:
+            self._data.close()
+        self._data = None
+        self._frames_file.close()
+
+
+def is_session(path):
+    """A recorded session directory with at least one frame written (meta.json comes with the first)."""
+    return isinstance(path, str) and all(os.path.isfile(os.path.join(path, name))
+                                         for name in ("meta.json", "index.bin", "frames.bin"))
+
+
+def open_capture(source=None, realtime=False, speed=1.0):
+    """
+    Open a recorded session directory, a camera index, or a stream URL.
+
+    With no source, try USB camera index 1 and then the built-in camera 0,
+    like the tracking scripts always have.
+    """
+    if is_session(source):
+        return ReplayCapture(source, realtime=realtime, speed=speed)
+    if source is None:
+        cap = cv2.VideoCapture(1)  # Try index 1 first for USB connection
+        if not cap.isOpened():
+            print("Failed to open camera at index 1, trying index 0...")
+            cap = cv2.VideoCapture(0)
+        return cap
+    if isinstance(source, str) and source.isdigit():
+        source = int(source)
+    return cv2.VideoCapture(source)
+
+
+def capture_time(cap):
+    """Capture time of the frame just read: recorded for replays, now for cameras."""
+    timestamp = getattr(cap, "timestamp", None)
+    return timestamp if timestamp is not None else time.time()
@@ -0,0 +1,331 @@
+"""
+Multi-process capture -> detection pipeline over a shared-memory frame ring.
+
+The capture process writes every camera frame into a SharedFrameRing, a
+fixed number of frame slots in one multiprocessing.shared_memory block.
+Detection workers read the newest frame as a NumPy view straight out of
+that block (no pickling, no copy), and only small Detection records go
+back through a multiprocessing.Queue. Each slot carries a sequence number
+that is odd while the writer fills it (a seqlock), so a reader can check
+afterwards that the frame was not overwritten while it used it.
+
+Several workers can share one ring: each claims the newest unclaimed
+frame, so with N workers detection runs on N cores and stale frames are
+skipped rather than queued.
+
+    python shm_pipeline.py --source 1 --workers 3
+"""
+import argparse
+import collections
+import multiprocessing as mp
+import queue
+import sys
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+DEFAULT_SLOTS = 8          # frames kept; a reader must finish within slots - 1 frame times
+DEFAULT_WORKERS = 2
+POLL_INTERVAL = 0.001      # s between checks for a new frame
+_ALIGN = 64
+
+# Picklable stand-in for a pupil_apriltags detection, so results work with
+# track_log.log_detections, body_shape.positions_from_detections and anchor_map
+Detection = collections.namedtuple(
+    "Detection", "tag_id center corners pose_R pose_t pose_err decision_margin hamming")
+
+# One frame's result record: frame_id, capture time, detections, worker latency
+FrameResult = collections.namedtuple("FrameResult", "frame_id timestamp detections detect_s")
+
+FrameSlot = collections.namedtuple("FrameSlot", "frame_id timestamp image slot seq")
+
+
+class SharedFrameRing:
+    """
+    Ring of fixed-shape frames in shared memory. One process writes (create=True),
+    any number attach by name and read.
+    """
+
+    def __init__(self, shape, dtype=np.uint8, slots=DEFAULT_SLOTS, name=None, create=True):
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.slots = slots
+        self.frame_bytes = int(np.prod(self.shape)) * self.dtype.itemsize
+
+        # Header: write count, then per-slot sequence number, frame id and timestamp
+        header = 8 * (1 + 3 * slots)
+        self._data_offset = -(-header // _ALIGN) * _ALIGN
+        size = self._data_offset + slots * self.frame_bytes
+
+        self.owner = create
+        # Readers must not unlink the block when they exit. Before Python 3.13
+        # attaching registers it with the resource tracker, but the pipeline's
+        # processes share their parent's tracker, which only counts it once
+        options = {"track": False} if not create and sys.version_info >= (3, 13) else {}
+        self.shm = shared_memory.SharedMemory(name=name, create=create, size=size if create else 0,
+                                              **options)
+
+        buf = self.shm.buf
+        self._count = np.ndarray((1,), np.int64, buf, 0)
+        self._seq = np.ndarray((slots,), np.int64, buf, 8)
+        self._frame_ids = np.ndarray((slots,), np.int64, buf, 8 + 8 * slots)
+        self._stamps = np.ndarray((slots,), np.float64, buf, 8 + 16 * slots)
+        self._frames = np.ndarray((slots,) + self.shape, self.dtype, buf, self._data_offset)
+        if create:
+            self._count[0] = 0
+            self._seq[:] = 0
+            self._frame_ids[:] = -1
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def spec(self):
+        """Everything another process needs to attach()."""
+        return {"name": self.name, "shape": self.shape, "dtype": self.dtype.str, "slots": self.slots}
+
+    @classmethod
+    def attach(cls, spec):
+        return cls(spec["shape"], spec["dtype"], spec["slots"], name=spec["name"], create=False)
+
+    def count(self):
+        """Frames written so far; the newest has frame_id count() - 1."""
+        return int(self._count[0])
+
+    def write(self, frame, timestamp=None):
+        """Copy one frame into the next slot (writer process only)."""
+        frame_id = int(self._count[0])
+        slot = frame_id % self.slots
+        self._seq[slot] += 1              # odd: slot being written
+        self._frames[slot] = frame
+        self._frame_ids[slot] = frame_id
+        self._stamps[slot] = time.time() if timestamp is None else timestamp
+        self._seq[slot] += 1              # even: slot complete
+        self._count[0] = frame_id + 1
+        return frame_id
+
+    def read(self, frame_id=None):
+        """
+        FrameSlot with a zero-copy view of frame_id (the newest if None), or
+        None if it is not written yet or already overwritten. Check
+        valid(slot) after using the view.
+        """
+        count = self.count()
+        if frame_id is None:
+            frame_id = count - 1
+        if frame_id < 0 or frame_id >= count or frame_id < count - self.slots:
+            return None
+
+        slot = frame_id % self.slots
+        seq = int(self._seq[slot])
+        if seq % 2 or self._frame_ids[slot] != frame_id:
+            return None
+        return FrameSlot(frame_id, float(self._stamps[slot]), self._frames[slot], slot, seq)
+
+    def valid(self, frame_slot):
+        """True if the slot was not rewritten since read() returned it."""
+        return int(self._seq[frame_slot.slot]) == frame_slot.seq
+
+    def read_copy(self, frame_id=None):
+        """Like read(), but returns a private copy (for drawing), or None if torn."""
+        frame_slot = self.read(frame_id)
+        if frame_slot is None:
+            return None
+        image = frame_slot.image.copy()
+        if not self.valid(frame_slot):
+            return None
+        return frame_slot._replace(image=image)
+
+    def close(self, unlink=None):
+        """Detach; the creator also removes the block unless unlink=False."""
+        # Drop the views before closing, or the mapping stays exported
+        del self._count, self._seq, self._frame_ids, self._stamps, self._frames
+        self.shm.close()
+        if self.owner if unlink is None else unlink:
+            self.shm.unlink()
+
+
+def _capture_process(source, slots, spec_queue, stop):
+    from session_recording import capture_time, open_capture
+
+    cap = open_capture(source)
+    ret, frame = cap.read() if cap.isOpened() else (False, None)
+    if not ret:
+        spec_queue.put(None)
+        return
+
+    ring = SharedFrameRing(frame.shape, frame.dtype, slots)
+    spec_queue.put(ring.spec())
+    try:
+        while not stop.is_set():
+            ring.write(frame, capture_time(cap))
+            ret, frame = cap.read()
+            if not ret:
+                break
+    finally:
+        stop.set()
+        cap.release()
+        # FramePipeline.stop() unlinks once every reader has exited
+        ring.close(unlink=False)
+
+
+def _claim_newest(ring, next_claim):
+    """Take the newest frame no other worker has claimed, or None."""
+    with next_claim.get_lock():
+        newest = ring.count() - 1
+        if newest < next_claim.value:
+            return None
+        next_claim.value = newest + 1
+        return newest
+
+
+def _detection_process(spec, next_claim, results, stop, camera_params, tag_size, detector_kwargs):
+    import cv2
+    from pupil_apriltags import Detector
+
+    detector = Detector(**detector_kwargs)
+    ring = SharedFrameRing.attach(spec)
+    try:
+        while not stop.is_set():
+            frame_id = _claim_newest(ring, next_claim)
+            frame_slot = None if frame_id is None else ring.read(frame_id)
+            if frame_slot is None:
+                time.sleep(POLL_INTERVAL)
+                continue
+
+            start = time.perf_counter()
+            gray = cv2.cvtColor(frame_slot.image, cv2.COLOR_BGR2GRAY)
+            if not ring.valid(frame_slot):
+                # Overwritten while converting: this worker fell a whole ring behind
+                continue
+            detected = detector.detect(gray, estimate_tag_pose=True, camera_params=camera_params,
+                                       tag_size=tag_size)
+            detections = [Detection(r.tag_id, r.center, r.corners, r.pose_R, r.pose_t, r.pose_err,
+                                    r.decision_margin, r.hamming) for r in detected]
+            results.put(FrameResult(frame_id, frame_slot.timestamp, detections,
+                                    time.perf_counter() - start))
+    finally:
+        # The ring cannot be closed while a view into it is still referenced
+        frame_slot = None
+        ring.close()
+
+
+class FramePipeline:
+    """
+    Capture process + detection worker processes. Iterate results() in the
+    main process and fetch frames for display with ring.read_copy().
+    """
+
+    def __init__(self, source=None, camera_params=(1280, 720, 640, 360), tag_size=0.05,
+                 workers=DEFAULT_WORKERS, slots=DEFAULT_SLOTS, detector_kwargs=None):
+        self.source = source
+        self.camera_params = list(camera_params)
+        self.tag_size = tag_size
+        self.workers = workers
+        self.slots = slots
+        self.detector_kwargs = detector_kwargs or dict(
+            families='tag36h11', nthreads=1, quad_decimate=1.0, quad_sigma=0.0,
+            refine_edges=1, decode_sharpening=0.25, debug=0)
+        self.ring = None
+        self._processes = []
+
+    def start(self, timeout=10.0):
+        if sys.platform != "win32":
+            # Start the tracker here so every child shares it; a forked child
+            # would otherwise start its own and unlink the ring when it exits
+            resource_tracker.ensure_running()
+        self._stop = mp.Event()
+        spec_queue = mp.Queue()
+        self._results = mp.Queue()
+        capture = mp.Process(target=_capture_process, daemon=True,
+                             args=(self.source, self.slots, spec_queue, self._stop))
+        capture.start()
+        self._processes = [capture]
+
+        spec = spec_queue.get(timeout=timeout)
+        if spec is None:
+            raise RuntimeError(f"Could not open video source {self.source!r}")
+        self.ring = SharedFrameRing.attach(spec)
+
+        next_claim = mp.Value("q", 0)
+        for _ in range(self.workers):
+            worker = mp.Process(target=_detection_process, daemon=True,
+                                args=(spec, next_claim, self._results, self._stop, self.camera_params,
+                                      self.tag_size, self.detector_kwargs))
+            worker.start()
+            self._processes.append(worker)
+        return self
+
+    def running(self):
+        return not self._stop.is_set()
+
+    def results(self, timeout=0.1):
+        """Yield FrameResults in frame order as far as the workers allow, until stopped."""
+        last_frame = -1
+        while self.running() or not self._results.empty():
+            try:
+                result = self._results.get(timeout=timeout)
+            except queue.Empty:
+                continue
+            # A slower worker may finish an older frame after a newer one
+            if result.frame_id > last_frame:
+                last_frame = result.frame_id
+                yield result
+
+    def stop(self):
+        self._stop.set()
+        for process in self._processes:
+            process.join(timeout=2.0)
+            if process.is_alive():
+                process.terminate()
+        self._processes = []
+        if self.ring is not None:
+            self.ring.close(unlink=True)
+            self.ring = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    import cv2
+
+    parser = argparse.ArgumentParser(description="Multi-process AprilTag detection over shared memory")
+    parser.add_argument("--source", help="camera index, stream URL or recorded session directory")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--slots", type=int, default=DEFAULT_SLOTS)
+    args = parser.parse_args()
+
+    with FramePipeline(args.source, workers=args.workers, slots=args.slots) as pipeline:
+        shown = 0
+        started = time.perf_counter()
+        for result in pipeline.results():
+            frame_slot = pipeline.ring.read_copy(result.frame_id)
+            if frame_slot is None:
+                # Already overwritten: the display is behind, wait for a newer result
+                continue
+            frame = frame_slot.image
+            for r in result.detections:
+                pts = r.corners.astype(np.int32).reshape((-1, 1, 2))
+                cv2.polylines(frame, [pts], True, (0, 255, 0), 2)
+                cv2.putText(frame, f"ID: {r.tag_id}", tuple(r.center.astype(int)),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
+
+            shown += 1
+            fps = shown / (time.perf_counter() - started)
+            latency_ms = (time.time() - result.timestamp) * 1000
+            cv2.putText(frame, f"{fps:.1f} fps, {args.workers} workers, detect {result.detect_s * 1000:.1f} ms, "
+                               f"capture-to-display {latency_ms:.0f} ms",
+                        (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 255), 2)
+            cv2.imshow("Shared-memory pipeline", frame)
+            if cv2.waitKey(1) & 0xFF == ord('q'):
+                break
+    cv2.destroyAllWindows()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,11 @@
+import argparse
 import cv2
 import numpy as np
 from pupil_apriltags import Detector
-import csv
 import datetime
+from session_recording import SessionRecorder, capture_time, open_capture
+from track_log import TrackLogger
+from frame_dedup import FrameChangeDetector
 
 # Initialize AprilTag detector
 detector = Detector(families='tag36h11',
@@ -13,104 +16,105 @@ detector = Detector(families='tag36h11',
                     decode_sharpening=0.25,
                     debug=0)
 
-# Connect to USB camera
-cap = cv2.VideoCapture(1)  # Try index 1 first for USB connection
+# Camera, or a recorded session to replay instead (see session_recording.py)
+parser = argparse.ArgumentParser(description="Log the positions of all AprilTags (tag 1 is the robot)")
+parser.add_argument("--source", help="camera index, stream URL or recorded session directory")
+parser.add_argument("--record", help="also save the camera frames to this session directory")
+parser.add_argument("--realtime", action="store_true", help="replay a session at its recorded speed")
+args = parser.parse_args()
 
-# If camera index 1 doesn't work, try index 0
-if not cap.isOpened():
-    print("Failed to open camera at index 1, trying index 0...")
-    cap = cv2.VideoCapture(0)
+# Without --source: USB camera at index 1, falling back to index 0
+cap = open_capture(args.source, realtime=args.realtime)
 
 # If both failed, let user know
 if not cap.isOpened():
     print("Failed to open camera. Please check your USB connection.")
     exit()
 
+recorder = SessionRecorder(args.record) if args.record else None
+
 # Camera parameters - using the same as in the original script
 fx, fy = 1280, 720
 cx, cy = 640, 360
 camera_params = [fx, fy, cx, cy]
 tag_size = 0.05  # 5cm - adjust to your actual tag size
 
-# Create CSV file with timestamp in filename
+# Columnar log directory with timestamp in its name (see track_log.py)
 timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-csv_filename = f"apriltag1_track_{timestamp}.csv"
+log_dirname = f"apriltag_track_{timestamp}"
 
-with open(csv_filename, 'w', newline='') as csvfile:
-    # Create CSV writer
-    csv_writer = csv.writer(csvfile)
-    
-    # Write header
-    csv_writer.writerow(['Timestamp', 'Tag_ID', 'u', 'v', 'x', 'y', 'z'])
+# Tag 1 is the robot; the other tags are logged too but only tag 1 is highlighted
+highlight_tag = 1
+
+# Rows are buffered and written by a background thread, so logging never stalls capture
+track_log = TrackLogger(log_dirname)
+frame_index = 0
+
+# Repeated camera frames are not detected or logged again
+frame_changes = FrameChangeDetector()
+results = []
+
+# Main loop
+while True:
+    ret, frame = cap.read()
+    if not ret:
+        break
+    if recorder:
+        recorder.write(frame)
     
-    # Main loop
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
-        
+    if frame_changes.is_new(frame):
         # Convert to grayscale
         gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
         
         # Detect AprilTags
         results = detector.detect(gray, estimate_tag_pose=True, camera_params=camera_params, tag_size=tag_size)
         
-        # Current timestamp for this frame
-        current_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
-        
-        # Flag to track if we found tag 1
-        tag1_found = False
-        
-        # Look specifically for tag ID 1
-        for r in results:
-            if r.tag_id == 1:
-                tag1_found = True
-                
-                # Extract tag center (u,v coordinates in the image)
-                center = np.mean(r.corners, axis=0)
-                u, v = center
-                
-                # Get 3D position if available
-                x, y, z = 0, 0, 0
-                if hasattr(r, 'pose_t') and r.pose_t is not None:
-                    x, y, z = r.pose_t.reshape(3)
-                
-                # Write to CSV
-                csv_writer.writerow([current_time, r.tag_id, u, v, x, y, z])
-                csvfile.flush()  # Make sure data is written immediately
-                
-                # Display that we found and saved tag 1
-                print(f"Tag 1 detected at ({u:.2f}, {v:.2f}) - Data saved to {csv_filename}")
-                
-                # Draw detection on frame
-                pts = r.corners.astype(np.int32).reshape((-1, 1, 2))
-                cv2.polylines(frame, [pts], True, (0, 255, 0), 2)
-                center_point = tuple(center.astype(int))
-                cv2.circle(frame, center_point, 5, (0, 255, 0), -1)
-                cv2.putText(frame, f"ID: 1 ({u:.1f}, {v:.1f})", 
-                           (center_point[0] + 10, center_point[1]), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
-                break  # Found tag 1, no need to process others
-        
-        # Display status on frame
-        if tag1_found:
-            status_text = "Tag 1 DETECTED - Saving data"
-            status_color = (0, 255, 0)  # Green
-        else:
-            status_text = "Waiting for Tag 1..."
-            status_color = (0, 0, 255)  # Red
-        
-        cv2.putText(frame, status_text, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 
-                   0.7, status_color, 2)
-        cv2.putText(frame, f"Recording to: {csv_filename}", 
-                   (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
-        
-        # Display the frame
-        cv2.imshow('AprilTag 1 Tracker', frame)
+        # Log every detection with its full pose, stamped with the capture time
+        track_log.log_detections(capture_time(cap), frame_index, results)
+    frame_index += 1
+    
+    # Flag to track if we found tag 1
+    tag1_found = False
+    
+    for r in results:
+        # Extract tag center (u,v coordinates in the image)
+        center = np.mean(r.corners, axis=0)
+        u, v = center
+        color = (0, 255, 0) if r.tag_id == highlight_tag else (255, 255, 0)
+        tag1_found = tag1_found or r.tag_id == highlight_tag
         
-        if cv2.waitKey(1) & 0xFF == ord('q'):
-            break
+        # Draw detection on frame
+        pts = r.corners.astype(np.int32).reshape((-1, 1, 2))
+        cv2.polylines(frame, [pts], True, color, 2)
+        center_point = tuple(center.astype(int))
+        cv2.circle(frame, center_point, 5, color, -1)
+        cv2.putText(frame, f"ID: {r.tag_id} ({u:.1f}, {v:.1f})", 
+                   (center_point[0] + 10, center_point[1]), 
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+    
+    # Display status on frame
+    if tag1_found:
+        status_text = f"Tag 1 DETECTED - {len(results)} tags logged"
+        status_color = (0, 255, 0)  # Green
+    else:
+        status_text = f"Waiting for Tag 1... ({len(results)} tags logged)"
+        status_color = (0, 0, 255)  # Red
+    
+    cv2.putText(frame, status_text, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 
+               0.7, status_color, 2)
+    cv2.putText(frame, f"Recording to: {log_dirname} ({track_log.rows_logged} rows)", 
+               (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+    
+    # Display the frame
+    cv2.imshow('AprilTag Tracker', frame)
+    
+    if cv2.waitKey(1) & 0xFF == ord('q'):
+        break
 
 cap.release()
+if recorder:
+    recorder.close()
+track_log.close()
 cv2.destroyAllWindows()
-print(f"Tracking complete. Data saved to {csv_filename}")
\ No newline at end of file
+print(f"Tracking complete. {track_log.rows_logged} detections saved to {log_dirname}")
+print(f"Skipped {frame_changes.duplicates} repeated frames out of {frame_changes.frames}")
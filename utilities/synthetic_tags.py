@@ -0,0 +1,444 @@
+"""
+Synthetic AprilTag scenes with exact ground truth, for offline benchmarks.
+
+SyntheticScene renders tag36h11 or tag25h9 tags (bit patterns from
+cv2.aruco's AprilTag dictionaries) at given 6-DoF camera-frame poses,
+then applies water-surface refraction, blur, uneven lighting and sensor
+noise. Every rendered tag comes with its true corners, center and pose as
+Detection records (the same fields pupil_apriltags reports), so a
+detector's output can be scored directly against them.
+
+Frames are rendered in batches: tags are warped only inside their
+bounding box, the random lighting of a batch is drawn at once, and noise
+is cut from a pre-drawn noise bank instead of sampled per pixel, so small
+frames render at thousands per second.
+
+    python synthetic_tags.py --out recordings/synthetic_swim --frames 600
+    python controller-final.py --source recordings/synthetic_swim
+
+writes a recorded session (session_recording.py) of the robot's body tags
+swimming past the anchor tags 0 and 7, plus ground_truth.npz next to it.
+--benchmark renders without writing and, if pupil_apriltags is installed,
+reports the detection rate and corner error against the ground truth.
+"""
+import argparse
+import collections
+import os
+import time
+
+import cv2
+import numpy as np
+
+from anchor_map import camera_matrix, tag_object_corners
+from shm_pipeline import Detection
+
+FAMILIES = {
+    "tag36h11": cv2.aruco.DICT_APRILTAG_36h11,
+    "tag25h9": cv2.aruco.DICT_APRILTAG_25h9,
+}
+
+CELL_PIXELS = 10                # texture resolution per tag bit
+INK_LEVELS = (25, 225)          # gray of printed black and white (a laminated tag under water)
+NOISE_BANK_MARGIN = 64          # random offset range into the noise bank
+WATER_ITERATIONS = 4            # fixed-point steps to place ground truth under refraction
+GROUND_TRUTH_FILE = "ground_truth.npz"
+
+# Scene settings; all effects are off at zero
+SceneEffects = collections.namedtuple(
+    "SceneEffects", "noise_std blur_sigma gain_range gradient water_amplitude water_wavelength water_speed")
+DEFAULT_EFFECTS = SceneEffects(noise_std=3.0, blur_sigma=0.7, gain_range=(0.8, 1.1), gradient=0.2,
+                               water_amplitude=1.5, water_wavelength=200.0, water_speed=2.0)
+NO_EFFECTS = SceneEffects(0.0, 0.0, (1.0, 1.0), 0.0, 0.0, 1.0, 0.0)
+
+
+def tag_texture(family, tag_id, cell_pixels=CELL_PIXELS):
+    """
+    Grayscale tag image including the white quiet zone, and the fraction of
+    its width covered by the black border square (what tag_size measures).
+    """
+    dictionary = cv2.aruco.getPredefinedDictionary(FAMILIES[family])
+    cells = dictionary.markerSize + 2
+    marker = cv2.aruco.generateImageMarker(dictionary, tag_id, cells * cell_pixels, borderBits=1)
+    # cv2.aruco draws the AprilTag codes turned 180 degrees from how the
+    # AprilTag detectors define the tag frame (and its first corner)
+    marker = cv2.rotate(marker, cv2.ROTATE_180)
+    texture = cv2.copyMakeBorder(marker, cell_pixels, cell_pixels, cell_pixels, cell_pixels,
+                                 cv2.BORDER_CONSTANT, value=255)
+    black, white = INK_LEVELS
+    texture = (black + texture.astype(np.float32) * ((white - black) / 255.0)).astype(np.uint8)
+    return texture, cells / (cells + 2)
+
+
+def rotation(roll=0.0, pitch=0.0, yaw=0.0):
+    """Rotation matrix from angles in radians about x, y and z (applied in that order)."""
+    cr, sr, cp, sp, cy, sy = np.cos(roll), np.sin(roll), np.cos(pitch), np.sin(pitch), np.cos(yaw), np.sin(yaw)
+    Rx = np.array([[1, 0, 0], [0, cr, -sr], [0, sr, cr]])
+    Ry = np.array([[cp, 0, sp], [0, 1, 0], [-sp, 0, cp]])
+    Rz = np.array([[cy, -sy, 0], [sy, cy, 0], [0, 0, 1]])
+    return Rz @ Ry @ Rx
+
+
+class SyntheticScene:
+    """
+    Renders tags at camera-frame poses {tag_id: (R, t)}. R and t follow
+    pupil_apriltags: a tag squarely facing the camera has R = I, and its
+    image corners are ordered as tag_object_corners().
+    """
+
+    def __init__(self, width=640, height=360, camera_params=None, tag_size=0.05, family="tag36h11",
+                 effects=DEFAULT_EFFECTS, background=170, seed=None):
+        if family not in FAMILIES:
+            raise ValueError(f"Unknown tag family {family}, expected one of {tuple(FAMILIES)}")
+        self.width = width
+        self.height = height
+        # Same convention as the trackers: fx, fy = resolution, principal point at the center
+        self.camera_params = list(camera_params or (width, height, width / 2, height / 2))
+        self.K = camera_matrix(self.camera_params)
+        self.tag_size = tag_size
+        self.family = family
+        self.effects = effects
+        self.background = np.full((height, width), background, dtype=np.uint8)
+        self.rng = np.random.default_rng(seed)
+        self._textures = {}
+
+        # Texture corners in the tag frame: x right, y down, the quiet zone included
+        texture, border_fraction = tag_texture(family, 0)
+        half = tag_size / 2 / border_fraction
+        self._texture_size = texture.shape[0]
+        self._outer_corners = np.array([[-half, -half, 0.0], [half, -half, 0.0], [half, half, 0.0],
+                                        [-half, half, 0.0]])
+        # Outer edges of the texture, with pixel centers at integer coordinates
+        low, high = -0.5, self._texture_size - 0.5
+        self._texture_pixels = np.float32([[low, low], [high, low], [high, high], [low, high]])
+        # Everything projected per tag: texture corners, tag corners, center
+        self._key_points = np.vstack((self._outer_corners, tag_object_corners(tag_size), np.zeros((1, 3))))
+
+        # Lighting gradient and noise bank are drawn once and reused
+        ys, xs = np.mgrid[0:height, 0:width].astype(np.float32)
+        self._ramp_x = (xs / width - 0.5)
+        self._ramp_y = (ys / height - 0.5)
+        self._noise_bank = self.rng.standard_normal(
+            (height + NOISE_BANK_MARGIN, width + NOISE_BANK_MARGIN), dtype=np.float32)
+        self._grid_x = np.arange(width, dtype=np.float32)
+        self._grid_y = np.arange(height, dtype=np.float32)
+
+    def texture(self, tag_id):
+        if tag_id not in self._textures:
+            self._textures[tag_id] = tag_texture(self.family, tag_id)[0]
+        return self._textures[tag_id]
+
+    def project(self, R, t, points):
+        """
+        Pixel coordinates (..., M, 2) of tag-frame points (M, 3) for one pose
+        or a stack of poses R (..., 3, 3), t (..., 3), and whether all M
+        points of each pose are in front of the camera.
+        """
+        R = np.asarray(R, dtype=float)
+        t = np.reshape(t, R.shape[:-2] + (3,))
+        camera = np.einsum("...ij,mj->...mi", R, points) + t[..., None, :]
+        in_front = np.all(camera[..., 2] > 1e-6, axis=-1)
+        pixels = camera @ self.K.T
+        return pixels[..., :2] / pixels[..., 2:3], in_front
+
+    def _boxes(self, outer):
+        """Pixel bounding boxes (x0, y0, x1, y1) of outer corners (..., 4, 2), clipped to the frame."""
+        low = np.maximum(np.floor(outer.min(axis=-2)).astype(int), 0)
+        high = np.minimum(np.ceil(outer.max(axis=-2)).astype(int) + 1, (self.width, self.height))
+        return np.concatenate((low, high), axis=-1)
+
+    def _draw_tag(self, frame, tag_id, outer, box):
+        """Warp one tag into frame in place, given its outer image corners and bounding box."""
+        x0, y0, x1, y1 = box
+        # Warp straight into the tag's bounding box; the transparent border
+        # leaves the background (and other tags) outside the tag untouched
+        # (OpenCV puts pixel centers at integers, AprilTag at +0.5, and the
+        # ground truth is in the AprilTag convention the detectors report)
+        target = (outer - [x0 + 0.5, y0 + 0.5]).astype(np.float32)
+        H = cv2.getPerspectiveTransform(self._texture_pixels, target)
+        roi = frame[y0:y1, x0:x1].copy()
+        cv2.warpPerspective(self.texture(tag_id), H, (x1 - x0, y1 - y0), dst=roi,
+                            flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_TRANSPARENT)
+        frame[y0:y1, x0:x1] = roi
+
+    def _water_shifts(self, phase):
+        """Ripple displacement (px) of a travelling wave: x shift per row, y shift per column."""
+        e = self.effects
+        k = 2 * np.pi / e.water_wavelength
+        shift_x = e.water_amplitude * np.sin(k * self._grid_y + phase)
+        shift_y = e.water_amplitude * np.sin(k * self._grid_x + 1.3 * phase)
+        return shift_x.astype(np.float32), shift_y.astype(np.float32)
+
+    def _distort(self, frame, boxes, shift_x, shift_y):
+        """
+        Water-surface refraction. The background is flat, so only the tag
+        boxes (grown by the ripple amplitude) need remapping.
+        """
+        margin = int(np.ceil(self.effects.water_amplitude)) + 2
+        distorted = frame.copy()
+        for x0, y0, x1, y1 in boxes:
+            x0, y0 = max(x0 - margin, 0), max(y0 - margin, 0)
+            x1, y1 = min(x1 + margin, self.width), min(y1 + margin, self.height)
+            map_x = self._grid_x[None, x0:x1] + shift_x[y0:y1, None]
+            map_y = self._grid_y[y0:y1, None] + shift_y[None, x0:x1]
+            distorted[y0:y1, x0:x1] = cv2.remap(frame, map_x, map_y, cv2.INTER_LINEAR,
+                                                borderMode=cv2.BORDER_REFLECT)
+        return distorted
+
+    def _refract(self, points, shift_x, shift_y):
+        # remap shows the source point p at x where x + d(x) = p; solve by fixed-point iteration
+        x = points.copy()
+        for _ in range(WATER_ITERATIONS):
+            rows = np.clip(np.rint(x[:, 1]).astype(int), 0, self.height - 1)
+            cols = np.clip(np.rint(x[:, 0]).astype(int), 0, self.width - 1)
+            x = points - np.column_stack((shift_x[rows], shift_y[cols]))
+        return x
+
+    def render_batch(self, poses_batch, times=None, color=True):
+        """
+        Render one frame per {tag_id: (R, t)} dict. Returns the frames as a
+        (B, H, W, 3) BGR (or (B, H, W) gray) uint8 array and, per frame, the
+        list of true Detections of the tags fully inside the image.
+        """
+        e = self.effects
+        count = len(poses_batch)
+        times = np.zeros(count) if times is None else np.asarray(times, dtype=float)
+        frames = np.empty((count, self.height, self.width) + ((3,) if color else ()), dtype=np.uint8)
+        truths = []
+
+        # Random lighting and noise placement for the whole batch in one draw
+        gains = self.rng.uniform(*e.gain_range, size=count)
+        slopes = self.rng.uniform(-e.gradient, e.gradient, size=(count, 2)) * gains[:, None]
+        offsets = self.rng.integers(0, NOISE_BANK_MARGIN, size=(count, 2))
+        shaded = np.empty((self.height, self.width), dtype=np.float32)
+
+        # Project every tag of the batch in one go: texture corners, tag corners and center
+        tags = [(i, tag_id, R, t) for i, poses in enumerate(poses_batch) for tag_id, (R, t) in poses.items()]
+        if tags:
+            Rs = np.array([R for _, _, R, _ in tags], dtype=float)
+            ts = np.array([np.reshape(t, 3) for _, _, _, t in tags], dtype=float)
+            pixels, in_front = self.project(Rs, ts, self._key_points)
+            boxes = self._boxes(pixels[:, :4])
+            visible = in_front & np.all(boxes[:, 2:] > boxes[:, :2], axis=1)
+        frame_of = np.array([i for i, _, _, _ in tags], dtype=int)
+        first = np.searchsorted(frame_of, np.arange(count + 1))
+
+        for i in range(count):
+            frame = self.background.copy()
+            drawn = [k for k in range(first[i], first[i + 1]) if visible[k]]
+            detections = []
+            for k in drawn:
+                tag_id = tags[k][1]
+                self._draw_tag(frame, tag_id, pixels[k, :4], boxes[k])
+                detections.append(Detection(tag_id, pixels[k, 8], pixels[k, 4:8], Rs[k], ts[k].reshape(3, 1),
+                                            0.0, np.nan, 0))
+
+            if e.water_amplitude > 0 and detections:
+                shift_x, shift_y = self._water_shifts(2 * np.pi * e.water_speed * times[i])
+                frame = self._distort(frame, boxes[drawn], shift_x, shift_y)
+                # Move all corners and centers of the frame in one go: 5 points per tag
+                points = np.concatenate([np.vstack((d.corners, d.center)) for d in detections])
+                points = self._refract(points, shift_x, shift_y).reshape(-1, 5, 2)
+                detections = [d._replace(corners=p[:4], center=p[4]) for d, p in zip(detections, points)]
+            if e.blur_sigma > 0:
+                frame = cv2.GaussianBlur(frame, (0, 0), e.blur_sigma)
+
+            # Lighting: gain with a linear gradient across the frame, then sensor noise
+            light = cv2.addWeighted(self._ramp_x, slopes[i, 0], self._ramp_y, slopes[i, 1], gains[i])
+            cv2.multiply(frame, light, dst=shaded, dtype=cv2.CV_32F)
+            if e.noise_std > 0:
+                dy, dx = offsets[i]
+                cv2.scaleAdd(self._noise_bank[dy:dy + self.height, dx:dx + self.width], e.noise_std,
+                             shaded, dst=shaded)
+            # Saturating cast; the ink never gets dark enough for noise to go below 0
+            gray = cv2.convertScaleAbs(shaded)
+            if color:
+                cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR, dst=frames[i])
+            else:
+                frames[i] = gray
+
+            # Only tags entirely in the image count as ground truth
+            if detections:
+                corners = np.array([d.corners for d in detections])
+                inside = np.all((corners >= 0) & (corners < (self.width, self.height)), axis=(1, 2))
+                detections = [d for d, keep in zip(detections, inside) if keep]
+            truths.append(detections)
+        return frames, truths
+
+    def render(self, poses, timestamp=0.0, color=True):
+        frames, truths = self.render_batch([poses], [timestamp], color)
+        return frames[0], truths[0]
+
+
+def swimming_poses(frames, fps=30.0, anchors=(0, 7), body_tags=(1, 2, 3, 4, 5, 6), height=1.0,
+                   tag_spacing=0.08, wave_amplitude=0.03, wave_frequency=1.0, swim_speed=0.04,
+                   camera_tilt_deg=5.0):
+    """
+    Overhead-camera sequence: anchors on the tank floor and the body tags
+    (head first) riding a travelling wave that swims along +x.
+
+    Returns one {tag_id: (R, t)} dict per frame and the frame times (s).
+    """
+    times = np.arange(frames) / fps
+    # Camera looks straight down at the floor, tilted a little so the tags are not fronto-parallel
+    tilt = rotation(np.radians(camera_tilt_deg), np.radians(0.5 * camera_tilt_deg))
+    floor_depth = np.array([0.0, 0.0, height])
+
+    def place(x, y, yaw):
+        return tilt @ rotation(yaw=yaw), tilt @ (np.array([x, y, 0.0]) + floor_depth)
+
+    anchor_poses = {tag_id: place(-0.25 + 0.5 * i / max(1, len(anchors) - 1), 0.12, 0.0)
+                    for i, tag_id in enumerate(anchors)}
+
+    sequence = []
+    k = 2 * np.pi / (len(body_tags) * tag_spacing)    # one wavelength along the body
+    for t in times:
+        head_x = 0.1 + swim_speed * t
+        poses = dict(anchor_poses)
+        for i, tag_id in enumerate(body_tags):
+            s = i * tag_spacing
+            phase = 2 * np.pi * wave_frequency * t - k * s
+            # Lateral wave grows towards the tail, as with the gait's joint factors
+            scale = 0.4 + 0.6 * i / max(1, len(body_tags) - 1)
+            y = -0.05 + scale * wave_amplitude * np.sin(phase)
+            slope = -scale * wave_amplitude * k * np.cos(phase)
+            poses[tag_id] = place(head_x - s, y, np.pi + np.arctan(slope))
+        sequence.append(poses)
+    return sequence, times
+
+
+def save_ground_truth(path, truths, times):
+    """Ground truth of a session as flat per-detection columns in one .npz."""
+    rows = [(frame, times[frame], d) for frame, detections in enumerate(truths) for d in detections]
+    np.savez_compressed(
+        path,
+        frame_count=len(truths),
+        frame=np.array([r[0] for r in rows], dtype=np.int64),
+        t=np.array([r[1] for r in rows], dtype=np.float64),
+        tag_id=np.array([r[2].tag_id for r in rows], dtype=np.int32),
+        center=np.array([r[2].center for r in rows], dtype=np.float64).reshape(-1, 2),
+        corners=np.array([r[2].corners for r in rows], dtype=np.float64).reshape(-1, 4, 2),
+        pose_R=np.array([r[2].pose_R for r in rows], dtype=np.float64).reshape(-1, 3, 3),
+        pose_t=np.array([r[2].pose_t for r in rows], dtype=np.float64).reshape(-1, 3))
+
+
+def load_ground_truth(path):
+    """Per-frame lists of true Detections from save_ground_truth()."""
+    if os.path.isdir(path):
+        path = os.path.join(path, GROUND_TRUTH_FILE)
+    data = np.load(path)
+    truths = [[] for _ in range(int(data["frame_count"]))]
+    for i, frame in enumerate(data["frame"]):
+        truths[frame].append(Detection(int(data["tag_id"][i]), data["center"][i], data["corners"][i],
+                                       data["pose_R"][i], data["pose_t"][i].reshape(3, 1), 0.0, np.nan, 0))
+    return truths
+
+
+def release_detector(detector):
+    """
+    Detach the tag families from a pupil_apriltags Detector before it is
+    freed. Its __del__ frees the family first and then the detector, whose
+    destructor writes into the freed family; with the small tag25h9 family
+    that corrupts the heap and aborts the interpreter later on.
+    """
+    detector.libc.apriltag_detector_clear_families(detector.tag_detector_ptr)
+
+
+def score_detections(detections, truths):
+    """
+    Number of true tags found and their corner errors (pixels) for one
+    frame. Each true tag is matched to the closest detection with its ID,
+    so a duplicate (false) detection cannot count twice.
+    """
+    errors = []
+    for truth in truths:
+        candidates = [np.linalg.norm(np.asarray(d.corners) - truth.corners, axis=1)
+                      for d in detections if d.tag_id == truth.tag_id]
+        if candidates:
+            errors.append(min(candidates, key=lambda e: e.mean()))
+    return len(errors), np.concatenate(errors) if errors else np.empty(0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render synthetic AprilTag sessions with ground truth")
+    parser.add_argument("--out", help="session directory to write (replayable with --source)")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--fps", type=float, default=30.0)
+    parser.add_argument("--resolution", type=int, nargs=2, default=[1280, 720], metavar=("W", "H"))
+    parser.add_argument("--family", choices=sorted(FAMILIES), default="tag36h11")
+    parser.add_argument("--tag-size", type=float, default=0.05)
+    parser.add_argument("--noise", type=float, default=DEFAULT_EFFECTS.noise_std, help="noise std (gray levels)")
+    parser.add_argument("--blur", type=float, default=DEFAULT_EFFECTS.blur_sigma, help="Gaussian blur sigma (px)")
+    parser.add_argument("--water", type=float, default=DEFAULT_EFFECTS.water_amplitude,
+                        help="water-surface distortion amplitude (px)")
+    parser.add_argument("--gradient", type=float, default=DEFAULT_EFFECTS.gradient,
+                        help="max lighting change across the frame (fraction)")
+    parser.add_argument("--batch", type=int, default=64)
+    parser.add_argument("--encoding", choices=["jpeg", "png", "raw"], default="jpeg")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--benchmark", action="store_true",
+                        help="only time the rendering (and detection, if pupil_apriltags is installed)")
+    args = parser.parse_args()
+
+    if not args.out and not args.benchmark:
+        parser.error("give --out to write a session, or --benchmark")
+
+    width, height = args.resolution
+    effects = DEFAULT_EFFECTS._replace(noise_std=args.noise, blur_sigma=args.blur,
+                                       water_amplitude=args.water, gradient=args.gradient)
+    scene = SyntheticScene(width, height, tag_size=args.tag_size, family=args.family, effects=effects,
+                           seed=args.seed)
+    sequence, times = swimming_poses(args.frames, args.fps)
+
+    recorder = None
+    if args.out:
+        from session_recording import SessionRecorder
+        recorder = SessionRecorder(args.out, encoding=args.encoding)
+
+    detector = None
+    if args.benchmark:
+        try:
+            from pupil_apriltags import Detector
+            detector = Detector(families=args.family, nthreads=1, quad_decimate=1.0)
+        except ImportError:
+            print("pupil_apriltags not installed: timing the rendering only")
+
+    start_time = time.time()
+    all_truths, render_s = [], 0.0
+    found, expected, corner_errors = 0, 0, []
+    try:
+        for start in range(0, args.frames, args.batch):
+            stop = min(start + args.batch, args.frames)
+            started = time.perf_counter()
+            frames, truths = scene.render_batch(sequence[start:stop], times[start:stop])
+            render_s += time.perf_counter() - started
+            all_truths.extend(truths)
+
+            for frame, truth, t in zip(frames, truths, times[start:stop]):
+                if recorder:
+                    recorder.write(frame, start_time + t)
+                if detector:
+                    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+                    detected = detector.detect(gray, estimate_tag_pose=True, camera_params=scene.camera_params,
+                                               tag_size=args.tag_size)
+                    matched, errors = score_detections(detected, truth)
+                    found += matched
+                    expected += len(truth)
+                    corner_errors.append(errors)
+    finally:
+        if detector:
+            release_detector(detector)
+
+    print(f"Rendered {args.frames} frames ({width}x{height}) in {render_s:.2f} s: "
+          f"{args.frames / max(render_s, 1e-9):.0f} frames/s")
+    if recorder:
+        recorder.close()
+        save_ground_truth(os.path.join(args.out, GROUND_TRUTH_FILE), all_truths, start_time + times)
+        print(f"Wrote session {args.out} with {GROUND_TRUTH_FILE}")
+    if detector and expected:
+        errors = np.concatenate(corner_errors)
+        rms = np.sqrt(np.mean(errors ** 2)) if len(errors) else float("nan")
+        print(f"Detected {found}/{expected} tags ({100 * found / expected:.1f}%), corner RMS error {rms:.2f} px")
+
+
+if __name__ == "__main__":
+    main()
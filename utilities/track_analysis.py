@@ -0,0 +1,175 @@
+"""
+Swim metrics from recorded tag tracks (see track_data.py).
+
+Positions are put in the world frame of controller-final.py when the
+recording has the reference tags: tag 0 is the origin, x points at tag 7
+and y = z_camera x x. Cross-track error is then the y coordinate, i.e.
+the signed distance from the tag 0 -> tag 7 line. Recordings of the robot
+tag only (the single-tag-tracker CSVs) fall back to the camera x/y plane
+with the straight line from the first to the last position as reference.
+
+    python track_analysis.py ..            # every apriltag*_track_* in ..
+"""
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from track_data import find_sessions, load_track
+
+ROBOT_TAG = 1
+ORIGIN_TAG, AXIS_TAG = 0, 7      # same reference pair as controller-final.py
+STROKE_BAND = (0.2, 5.0)         # Hz searched for the tail beat
+MIN_SAMPLES = 8
+
+
+def world_frame(track):
+    """(origin, x_axis, y_axis) from the median poses of tags 0 and 7, or None."""
+    origin_xyz = track.tag(ORIGIN_TAG).xyz
+    axis_xyz = track.tag(AXIS_TAG).xyz
+    if not len(origin_xyz) or not len(axis_xyz):
+        return None
+
+    origin = np.nanmedian(origin_xyz, axis=0)
+    x_axis = np.nanmedian(axis_xyz, axis=0) - origin
+    x_axis /= np.linalg.norm(x_axis)
+    y_axis = np.cross([0.0, 0.0, 1.0], x_axis)
+    y_axis /= np.linalg.norm(y_axis)
+    return origin, x_axis, y_axis
+
+
+def to_world(xyz, frame):
+    """Project camera-frame positions (N, 3) into world (N, 2) coordinates."""
+    origin, x_axis, y_axis = frame
+    relative = xyz - origin
+    return np.column_stack((relative @ x_axis, relative @ y_axis))
+
+
+def path_frame(xy):
+    """Fallback reference: x along the straight line from first to last point."""
+    direction = xy[-1] - xy[0]
+    norm = np.linalg.norm(direction)
+    x_axis = direction / norm if norm > 0 else np.array([1.0, 0.0])
+    y_axis = np.array([-x_axis[1], x_axis[0]])
+    relative = xy - xy[0]
+    return np.column_stack((relative @ x_axis, relative @ y_axis))
+
+
+def kinematics(t, xy):
+    """Per-sample speed (m/s), heading (rad) and heading rate (rad/s)."""
+    vx = np.gradient(xy[:, 0], t)
+    vy = np.gradient(xy[:, 1], t)
+    heading = np.unwrap(np.arctan2(vy, vx))
+    return np.hypot(vx, vy), heading, np.gradient(heading, t)
+
+
+def stroke_frequency(t, lateral, band=STROKE_BAND):
+    """
+    Dominant tail-beat frequency (Hz) and peak-to-peak amplitude of the
+    lateral position, from an FFT on a uniform resampling of the track.
+    """
+    dt = np.median(np.diff(t))
+    if not dt > 0:
+        return np.nan, np.nan
+
+    uniform_t = np.arange(t[0], t[-1], dt)
+    if len(uniform_t) < MIN_SAMPLES:
+        return np.nan, np.nan
+    signal = np.interp(uniform_t, t, lateral)
+
+    # Remove the slow drift so the body wave dominates the spectrum
+    signal = signal - np.polyval(np.polyfit(uniform_t - uniform_t[0], signal, 1), uniform_t - uniform_t[0])
+    spectrum = np.abs(np.fft.rfft(signal * np.hanning(len(signal))))
+    freqs = np.fft.rfftfreq(len(signal), dt)
+
+    in_band = (freqs >= band[0]) & (freqs <= min(band[1], 0.5 / dt))
+    if not in_band.any():
+        return np.nan, np.nan
+    peak = np.flatnonzero(in_band)[np.argmax(spectrum[in_band])]
+    return float(freqs[peak]), float(np.ptp(signal))
+
+
+def analyze_track(track, robot_tag=ROBOT_TAG):
+    """Summary swim metrics for one recording (NaN where there is too little data)."""
+    robot = track.tag(robot_tag)
+    valid = np.all(np.isfinite(robot.xyz), axis=1)
+    t, xyz = robot.t[valid], robot.xyz[valid]
+
+    summary = {"source": track.source, "samples": int(len(t)), "reference": None,
+               "duration_s": float(t[-1] - t[0]) if len(t) else 0.0}
+    if len(t) < MIN_SAMPLES or not np.all(np.diff(t) > 0):
+        return summary
+
+    frame = world_frame(track)
+    if frame is not None:
+        xy = to_world(xyz, frame)
+        summary["reference"] = "tag0->tag7"
+    else:
+        xy = path_frame(xyz[:, :2])
+        summary["reference"] = "start->end"
+
+    speed, heading, heading_rate = kinematics(t, xy)
+    cross_track = xy[:, 1]
+    step_lengths = np.hypot(*np.diff(xy, axis=0).T)
+    path_length = float(step_lengths.sum())
+    net_displacement = float(np.linalg.norm(xy[-1] - xy[0]))
+    forward_speed = (xy[-1, 0] - xy[0, 0]) / (t[-1] - t[0])
+    frequency, amplitude = stroke_frequency(t, cross_track)
+
+    summary.update({
+        "mean_speed": float(np.mean(speed)),
+        "max_speed": float(np.max(speed)),
+        "forward_speed": float(forward_speed),
+        "mean_abs_heading_rate": float(np.mean(np.abs(heading_rate))),
+        "cross_track_rms": float(np.sqrt(np.mean(cross_track ** 2))),
+        "cross_track_max": float(np.max(np.abs(cross_track))),
+        "stroke_frequency_hz": frequency,
+        "lateral_amplitude": amplitude,
+        "path_length": path_length,
+        "net_displacement": net_displacement,
+        # Gait efficiency: straightness of the path, distance per tail beat,
+        # and Strouhal number St = f * A / U (efficient swimmers sit near 0.2-0.4)
+        "straightness": net_displacement / path_length if path_length > 0 else np.nan,
+        "stride_length": float(forward_speed / frequency) if frequency > 0 else np.nan,
+        "strouhal": float(frequency * amplitude / abs(forward_speed)) if forward_speed else np.nan,
+    })
+    return summary
+
+
+def analyze_session(path, robot_tag=ROBOT_TAG):
+    # Runs in a worker process: load there so only the path and summary are pickled
+    return analyze_track(load_track(path), robot_tag)
+
+
+def analyze_sessions(paths, robot_tag=ROBOT_TAG, workers=None):
+    """Analyze many recordings in parallel; results are in the order of paths."""
+    if len(paths) <= 1 or workers == 1:
+        return [analyze_session(path, robot_tag) for path in paths]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(analyze_session, paths, [robot_tag] * len(paths)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Swim metrics for recorded tag tracks")
+    parser.add_argument("directory", nargs="?", default=".")
+    parser.add_argument("--pattern", default="apriltag*_track_*")
+    parser.add_argument("--tag", type=int, default=ROBOT_TAG, help="robot tag ID")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    paths = find_sessions(args.directory, args.pattern)
+    if not paths:
+        print(f"No recordings matching {args.pattern} in {args.directory}")
+        return
+
+    columns = ["samples", "duration_s", "mean_speed", "cross_track_rms",
+               "stroke_frequency_hz", "straightness", "strouhal"]
+    print(f"{'session':40s}" + "".join(f"{name:>20s}" for name in columns))
+    for result in analyze_sessions(paths, args.tag, args.workers):
+        values = "".join(f"{result.get(name, np.nan):20.3f}" for name in columns)
+        print(f"{os.path.basename(result['source']):40s}{values}")
+
+
+if __name__ == "__main__":
+    main()
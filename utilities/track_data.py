@@ -0,0 +1,166 @@
+"""
+Load tag tracking recordings into NumPy columns, with a binary cache.
+
+Reads the CSV logs written by single-tag-tracker.py
+(apriltag1_track_*.csv: Timestamp,Tag_ID,u,v,x,y,z) and the columnar
+track_log.py directories. The first CSV load is parsed in bulk (timestamps
+included) and saved as a .npz next to the CSV; later loads read the .npz
+unless the CSV has changed since.
+
+    track = load_track("apriltag1_track_20250427_231336.csv")
+    tag1 = track.tag(1).window(start=track.t[0] + 5, end=track.t[0] + 10)
+    tag1.xyz, tag1.t
+"""
+import glob
+import os
+
+import numpy as np
+
+from track_log import load_track_log
+
+CSV_HEADER = ["Timestamp", "Tag_ID", "u", "v", "x", "y", "z"]
+CACHE_VERSION = 1
+
+
+class Track:
+    """
+    Time-sorted tag detections: t (seconds), tag_id, u, v (pixels) and
+    xyz (camera-frame position in m, shape (N, 3)).
+
+    For CSV logs t comes from the naive local timestamps, for track_log
+    directories it is time.time(); only differences are meaningful across
+    the two.
+    """
+
+    def __init__(self, t, tag_id, u, v, xyz, source=None):
+        self.t = t
+        self.tag_id = tag_id
+        self.u = u
+        self.v = v
+        self.xyz = xyz
+        self.source = source
+
+    def __len__(self):
+        return len(self.t)
+
+    def _select(self, mask_or_slice):
+        return Track(self.t[mask_or_slice], self.tag_id[mask_or_slice], self.u[mask_or_slice],
+                     self.v[mask_or_slice], self.xyz[mask_or_slice], self.source)
+
+    def tags(self):
+        return np.unique(self.tag_id)
+
+    def tag(self, tag_id):
+        """Detections of one tag."""
+        return self._select(self.tag_id == tag_id)
+
+    def window(self, start=None, end=None):
+        """Detections with start <= t < end (either bound may be None)."""
+        first = 0 if start is None else np.searchsorted(self.t, start, side="left")
+        last = len(self.t) if end is None else np.searchsorted(self.t, end, side="left")
+        return self._select(slice(first, last))
+
+    def relative_time(self):
+        """Seconds since the first detection."""
+        return self.t - self.t[0] if len(self.t) else self.t
+
+    def duration(self):
+        return float(self.t[-1] - self.t[0]) if len(self.t) else 0.0
+
+
+def dedupe_consecutive(tag_id, values):
+    """
+    Mask that drops a row when the previous detection of the same tag had
+    identical values, i.e. the same frame was logged twice.
+    """
+    keep = np.ones(len(tag_id), dtype=bool)
+    if len(tag_id) < 2:
+        return keep
+
+    # Stable sort by tag keeps each tag's rows in time order
+    order = np.argsort(tag_id, kind="stable")
+    sorted_values = values[order]
+    same_tag = tag_id[order][1:] == tag_id[order][:-1]
+    same_values = np.all(sorted_values[1:] == sorted_values[:-1], axis=1)
+    keep[order[1:][same_tag & same_values]] = False
+    return keep
+
+
+def parse_track_csv(path):
+    """Parse a tracker CSV into Track columns (no caching, no dedupe)."""
+    raw = np.loadtxt(path, delimiter=",", dtype=str, skiprows=1, ndmin=2)
+    if not len(raw):
+        empty = np.empty(0)
+        return empty, empty.astype(np.int32), empty, empty, np.empty((0, 3))
+
+    # "2025-04-27 23:12:34.019" -> datetime64 in one call, then seconds
+    stamps = np.char.replace(raw[:, 0], " ", "T").astype("datetime64[us]")
+    t = stamps.astype(np.int64) / 1e6
+    tag_id = raw[:, 1].astype(np.int32)
+    numbers = raw[:, 2:7].astype(np.float64)
+    return t, tag_id, numbers[:, 0], numbers[:, 1], numbers[:, 2:5]
+
+
+def _cache_path(csv_path):
+    return os.path.splitext(csv_path)[0] + ".npz"
+
+
+def _load_cache(cache_path, csv_path):
+    try:
+        with np.load(cache_path) as data:
+            stat = os.stat(csv_path)
+            if (int(data["version"]) != CACHE_VERSION or int(data["source_size"]) != stat.st_size
+                    or float(data["source_mtime"]) != stat.st_mtime):
+                return None
+            return {name: data[name] for name in ("t", "tag_id", "u", "v", "xyz")}
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def load_track_csv(path, use_cache=True, dedupe=True):
+    # The cache holds the deduplicated columns, so it only stands in for dedupe=True
+    use_cache = use_cache and dedupe
+    columns = _load_cache(_cache_path(path), path) if use_cache else None
+
+    if columns is None:
+        t, tag_id, u, v, xyz = parse_track_csv(path)
+        order = np.argsort(t, kind="stable")
+        t, tag_id, u, v, xyz = t[order], tag_id[order], u[order], v[order], xyz[order]
+
+        if dedupe:
+            keep = dedupe_consecutive(tag_id, np.column_stack((u, v, xyz)))
+            t, tag_id, u, v, xyz = t[keep], tag_id[keep], u[keep], v[keep], xyz[keep]
+
+        columns = {"t": t, "tag_id": tag_id, "u": u, "v": v, "xyz": xyz}
+        if use_cache:
+            stat = os.stat(path)
+            try:
+                np.savez(_cache_path(path), version=CACHE_VERSION, source_size=stat.st_size,
+                         source_mtime=stat.st_mtime, **columns)
+            except OSError as e:
+                print(f"Could not write cache for {path}: {e}")
+
+    return Track(source=path, **columns)
+
+
+def load_track(path, use_cache=True):
+    """Load a tracker CSV or a track_log.py directory."""
+    if os.path.isdir(path):
+        log = load_track_log(path)
+        keep = dedupe_consecutive(log["tag_id"], np.column_stack((log["u"], log["v"], log["pose_t"])))
+        return Track(log["t"][keep], log["tag_id"][keep], log["u"][keep].astype(np.float64),
+                     log["v"][keep].astype(np.float64), log["pose_t"][keep], source=path)
+    return load_track_csv(path, use_cache=use_cache)
+
+
+def find_sessions(directory=".", pattern="apriltag*_track_*"):
+    """CSV logs and track_log directories matching pattern, oldest first."""
+    paths = []
+    for path in sorted(glob.glob(os.path.join(directory, pattern))):
+        if os.path.isdir(path) or path.endswith(".csv"):
+            paths.append(path)
+    return paths
+
+
+def load_sessions(directory=".", pattern="apriltag*_track_*", use_cache=True):
+    return [load_track(path, use_cache=use_cache) for path in find_sessions(directory, pattern)]
@@ -0,0 +1,200 @@
+"""
+Buffered, columnar log of AprilTag detections.
+
+Rows are appended to preallocated NumPy chunks, one per tag ID. Full chunks
+(and, every flush_interval seconds, partly filled ones) are handed to a
+background thread that writes each as its own .npz file in the log
+directory. The flush timer runs in that thread, so rows are written on
+time even while no tags are being detected. Files are written under a
+temporary name and renamed into place, so after a crash every chunk file
+on disk is complete; at most the last flush_interval seconds are lost.
+The capture loop never waits on the disk.
+
+    log = TrackLogger("tag_track_20250427_231212")
+    log.log_detections(capture_time, frame_index, results)
+    ...
+    log.close()
+
+    columns = load_track_log("tag_track_20250427_231212")   # dict of arrays
+"""
+import glob
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+
+# Column name -> (dtype, per-row shape)
+COLUMNS = {
+    "t": (np.float64, ()),            # capture time, seconds since the epoch
+    "frame": (np.int64, ()),          # frame index within the session
+    "tag_id": (np.int32, ()),
+    "u": (np.float32, ()),            # tag center in the image (pixels)
+    "v": (np.float32, ()),
+    "pose_t": (np.float64, (3,)),     # camera-frame translation (m), NaN if no pose
+    "pose_R": (np.float64, (3, 3)),   # camera-frame rotation, NaN if no pose
+    "pose_err": (np.float32, ()),
+    "decision_margin": (np.float32, ()),
+    "hamming": (np.int8, ()),
+}
+
+DEFAULT_CHUNK_ROWS = 1024
+DEFAULT_FLUSH_INTERVAL = 5.0  # seconds
+
+
+class _Chunk:
+    def __init__(self, rows):
+        self.columns = {name: np.empty((rows,) + shape, dtype=dtype)
+                        for name, (dtype, shape) in COLUMNS.items()}
+        self.rows = 0
+        self.capacity = rows
+
+    def full(self):
+        return self.rows == self.capacity
+
+
+class TrackLogger:
+    def __init__(self, path, chunk_rows=DEFAULT_CHUNK_ROWS, flush_interval=DEFAULT_FLUSH_INTERVAL):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.chunk_rows = chunk_rows
+        self.flush_interval = flush_interval
+        self.rows_logged = 0
+        self.chunks_written = 0
+        self.write_errors = 0
+
+        self._chunks = {}  # tag_id -> _Chunk being filled
+        self._flushed_rows = {}  # tag_id -> rows of the current chunk already on disk
+        self._sequence = len(glob.glob(os.path.join(path, "chunk_*.npz")))
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()  # chunks are filled by the caller, flushed by the writer too
+        self._closed = False
+        self._queue = queue.Queue()
+        self._writer = threading.Thread(target=self._write_loop, daemon=True)
+        self._writer.start()
+
+    def log(self, t, frame, tag_id, u, v, pose_t=None, pose_R=None,
+            pose_err=np.nan, decision_margin=np.nan, hamming=0):
+        with self._lock:
+            self._append(t, frame, tag_id, u, v, pose_t, pose_R, pose_err, decision_margin, hamming)
+
+    def _append(self, t, frame, tag_id, u, v, pose_t, pose_R, pose_err, decision_margin, hamming):
+        chunk = self._chunks.get(tag_id)
+        if chunk is None:
+            chunk = self._chunks[tag_id] = _Chunk(self.chunk_rows)
+            self._flushed_rows[tag_id] = 0
+
+        i = chunk.rows
+        c = chunk.columns
+        c["t"][i] = t
+        c["frame"][i] = frame
+        c["tag_id"][i] = tag_id
+        c["u"][i] = u
+        c["v"][i] = v
+        c["pose_t"][i] = np.nan if pose_t is None else np.reshape(pose_t, 3)
+        c["pose_R"][i] = np.nan if pose_R is None else pose_R
+        c["pose_err"][i] = np.nan if pose_err is None else pose_err
+        c["decision_margin"][i] = decision_margin
+        c["hamming"][i] = hamming
+        chunk.rows += 1
+        self.rows_logged += 1
+
+        if chunk.full():
+            self._submit(tag_id, final=True)
+
+    def log_detections(self, t, frame, results):
+        """Log every pupil_apriltags detection of one frame."""
+        for r in results:
+            u, v = r.center
+            self.log(t, frame, r.tag_id, u, v,
+                     getattr(r, "pose_t", None), getattr(r, "pose_R", None),
+                     getattr(r, "pose_err", np.nan), r.decision_margin, r.hamming)
+
+    def _submit(self, tag_id, final):
+        chunk = self._chunks[tag_id]
+        start = self._flushed_rows[tag_id]
+        if chunk.rows > start:
+            # Rows before `start` are already on disk from an earlier partial flush.
+            # Copy, so a partly filled chunk can keep filling after the flush
+            data = {name: values[start:chunk.rows].copy() for name, values in chunk.columns.items()}
+            self._queue.put((self._sequence, tag_id, data))
+            self._sequence += 1
+        if final:
+            del self._chunks[tag_id]
+            del self._flushed_rows[tag_id]
+        else:
+            self._flushed_rows[tag_id] = chunk.rows
+
+    def flush(self):
+        """Queue the rows not yet on disk for every tag."""
+        with self._lock:
+            if not self._closed:
+                self._flush()
+
+    def _flush(self):
+        for tag_id in list(self._chunks):
+            self._submit(tag_id, final=False)
+        self._last_flush = time.monotonic()
+
+    def _write_loop(self):
+        while True:
+            # After close() everything is queued: just drain up to the sentinel
+            wait = None if self._closed else self._last_flush + self.flush_interval - time.monotonic()
+            if wait is not None and wait <= 0:
+                self.flush()
+                continue
+            try:
+                item = self._queue.get(timeout=wait)
+            except queue.Empty:
+                continue
+            if item is None:
+                break
+            sequence, tag_id, data = item
+            name = os.path.join(self.path, f"chunk_{sequence:06d}_tag{tag_id:03d}.npz")
+            tmp_name = name + ".tmp"
+            try:
+                with open(tmp_name, "wb") as f:
+                    np.savez(f, **data)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_name, name)
+                self.chunks_written += 1
+            except OSError as e:
+                self.write_errors += 1
+                print(f"Track log write failed for {name}: {e}")
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._flush()
+            self._closed = True
+            # Nothing can be queued after this, so the writer stops with everything written
+            self._queue.put(None)
+        self._writer.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def load_track_log(path, tag_id=None):
+    """
+    Concatenate all chunk files of a log into one dict of columns, sorted by
+    time (then tag). Leftover .tmp files from a crash are ignored.
+    """
+    pattern = "chunk_*.npz" if tag_id is None else f"chunk_*_tag{tag_id:03d}.npz"
+    parts = []
+    for name in sorted(glob.glob(os.path.join(path, pattern))):
+        with np.load(name) as data:
+            parts.append({column: data[column] for column in data.files})
+
+    if not parts:
+        return {name: np.empty((0,) + shape, dtype=dtype) for name, (dtype, shape) in COLUMNS.items()}
+
+    columns = {name: np.concatenate([part[name] for part in parts]) for name in COLUMNS}
+    order = np.lexsort((columns["tag_id"], columns["t"]))
+    return {name: values[order] for name, values in columns.items()}